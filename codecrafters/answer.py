@@ -1,21 +1,24 @@
 import json
-import boto3
-import uuid
-from datetime import datetime
-from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.conditions import Attr
-from attempt import convert_decimal
+from botocore.exceptions import ClientError
+from attempt import next_step, question_body, record_leaderboard_entry
+from batch import BATCH_GET_LIMIT, batch_get_items
+import question_cache
+import stats
+from projection import projection
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import dynamodb, table, client
+import codec
 
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
-
-table = dynamodb.Table('QuizTable')
+# Attributes each read needs, see projection.py. Only the question fields
+# shown next to an answer on the results page are read.
+QUESTION_DETAILS_ATTRIBUTES = ('SK', 'questionText', 'correctAnswer')
+ANSWER_AND_ADVANCE_ATTRIBUTES = (
+    'currentQuestionId', 'progress', 'questionOrder', 'score', 'dateStarted', 'dateFinished')
 
 
+@instrumented
+@encoded
 def create_user_answer(event, context):
     data = json.loads(event['body'])
     user_id = data['userId']
@@ -24,36 +27,107 @@ def create_user_answer(event, context):
     question_id = data['questionId']
     user_answer = data['userAnswer']
 
-    # Fetch the user attempt
-    response = table.get_item(
-        Key={
-            'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
-            'SK': f"ATTEMPT#{attempt_id}"
-        }
-    )
-    attempt = response.get('Item')
+    # Fetch the correct answer for the question
+    question = question_cache.get_question(table, quiz_id, question_id)
 
-    if not attempt:
+    if not question:
         return {
             'statusCode': 404,
-            'body': json.dumps({'message': 'User attempt not found'})
+            'body': json.dumps({'message': 'Question not found'})
         }
 
-    # Ensure the answer corresponds to the current question
-    if question_id != attempt['currentQuestionId']:
+    # Check if the user's answer is correct
+    correct_answer = question['correctAnswer']
+    status = 'pass' if user_answer == correct_answer else 'fail'
+
+    attempt_key = {
+        'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+        'SK': f"ATTEMPT#{attempt_id}"
+    }
+    # The attempt must exist and still be on this question. A passing answer
+    # also updates the score in the same step.
+    attempt_condition = {
+        'TableName': table.name,
+        'Key': attempt_key,
+        'ConditionExpression': 'currentQuestionId = :questionId',
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    }
+    if status == 'pass':
+        attempt_condition.update({
+            'UpdateExpression': 'SET score = if_not_exists(score, :start) + :increment',
+            'ExpressionAttributeValues': {
+                ':questionId': question_id,
+                ':start': 0,  # Initialize score if it doesn't exist
+                ':increment': 100
+            }
+        })
+        attempt_operation = {'Update': attempt_condition}
+    else:
+        attempt_condition['ExpressionAttributeValues'] = {':questionId': question_id}
+        attempt_operation = {'ConditionCheck': attempt_condition}
+
+    # Store the answer and score it in one transaction. The answer is only
+    # written once, so a double-click or retry cannot score a question twice.
+    try:
+        dynamodb.meta.client.transact_write_items(
+            TransactItems=[
+                answer_put(user_id, quiz_id, attempt_id, question_id, user_answer, status),
+                attempt_operation
+            ]
+        )
+    except ClientError as e:
+        response = cancelled_answer_response(e, status, correct_answer)
+        if not response:
+            raise
+        return response
+
+    record_answer_stats(quiz_id, question_id, question.get('options'), user_answer, status)
+
+    return {
+        'statusCode': 201,
+        'body': json.dumps({'message': 'User answer created successfully', 'status': status, 'correctAnswers': correct_answer})
+    }
+
+
+@instrumented
+@encoded
+def answer_and_advance(event, context):
+    # Grade and record an answer, then move the attempt to the next question
+    # and return it, replacing a POST /answers + POST /quiz/progress/next pair
+    data = json.loads(event['body'])
+    user_id = data.get('userId')
+    quiz_id = data.get('quizId')
+    attempt_id = data.get('attemptId')
+    question_id = data.get('questionId')
+    user_answer = data.get('userAnswer')
+
+    if not user_id or not quiz_id or not attempt_id or not question_id or user_answer is None:
         return {
             'statusCode': 400,
-            'body': json.dumps({'message': 'Answer is for an invalid question'})
+            'body': json.dumps({'message': 'Missing required parameters: userId, quizId, attemptId, questionId, or userAnswer'})
         }
 
-    # Fetch the correct answer for the question
-    question_response = table.get_item(
-        Key={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': f"QUESTION#{question_id}"
+    # Fetch the user attempt
+    attempt_key = {
+        'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+        'SK': f"ATTEMPT#{attempt_id}"
+    }
+    attempt = table.get_item(
+        Key=attempt_key,
+        **projection(*ANSWER_AND_ADVANCE_ATTRIBUTES)
+    ).get('Item')
+
+    if not attempt:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'User attempt not found'})
         }
-    )
-    question = question_response.get('Item')
+
+    # Ensure the answer corresponds to the current question
+    if question_id != attempt.get('currentQuestionId') or attempt.get('dateFinished'):
+        return recorded_answer_response(user_id, quiz_id, attempt_id, question_id, attempt)
+
+    question = question_cache.get_question(table, quiz_id, question_id)
 
     if not question:
         return {
@@ -61,76 +135,256 @@ def create_user_answer(event, context):
             'body': json.dumps({'message': 'Question not found'})
         }
 
-    # Check if the user's answer is correct
     correct_answer = question['correctAnswer']
     status = 'pass' if user_answer == correct_answer else 'fail'
 
-    # Update the score if the answer is correct
+    # Score the answer and advance the attempt in a single update. The
+    # condition on progress stops two concurrent submissions from both advancing.
+    next_question_id, set_clauses, expression_attribute_values = next_step(attempt, user_id)
+    expression_attribute_values.update({
+        ':questionId': question_id,
+        ':currentProgress': attempt.get('progress', 0)
+    })
     if status == 'pass':
-        table.update_item(
-            Key={
-                'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
-                'SK': f"ATTEMPT#{attempt_id}"
-            },
-            UpdateExpression="SET score = if_not_exists(score, :start) + :increment",
-            ExpressionAttributeValues={
-                ':start': 0,  # Initialize score if it doesn't exist
-                ':increment': 100
+        set_clauses.insert(0, 'score = if_not_exists(score, :start) + :increment')
+        expression_attribute_values.update({':start': 0, ':increment': 100})
+
+    try:
+        dynamodb.meta.client.transact_write_items(
+            TransactItems=[
+                answer_put(user_id, quiz_id, attempt_id, question_id, user_answer, status),
+                {
+                    'Update': {
+                        'TableName': table.name,
+                        'Key': attempt_key,
+                        'UpdateExpression': f"SET {', '.join(set_clauses)}",
+                        'ConditionExpression': 'currentQuestionId = :questionId AND progress = :currentProgress',
+                        'ExpressionAttributeValues': expression_attribute_values,
+                        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                    }
+                }
+            ]
+        )
+    except ClientError as e:
+        response = cancelled_answer_response(e, status, correct_answer)
+        if not response:
+            raise
+        return response
+
+    record_answer_stats(quiz_id, question_id, question.get('options'), user_answer, status)
+
+    if not next_question_id:
+        score = attempt.get('score', 0) + (100 if status == 'pass' else 0)
+        record_leaderboard_entry(
+            quiz_id, user_id, attempt_id, score, attempt.get('dateStarted'),
+            expression_attribute_values[':dateFinished'])
+
+    next_question = None
+    if next_question_id:
+        question = question_cache.get_question(table, quiz_id, next_question_id)
+
+        if not question:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'message': 'Next question not found'})
             }
+
+        # progress + 2 is the 1-based index of the next question
+        next_question = question_body(
+            next_question_id,
+            question,
+            int(attempt.get('progress', 0)) + 2,
+            len(attempt.get('questionOrder', []))
         )
 
-    # Store the answer in the database
-    table.put_item(
-        Item={
+    return {
+        'statusCode': 201,
+        'body': json.dumps({
+            'message': 'User answer created successfully' if next_question else 'Quiz completed',
+            'status': status,
+            'correctAnswers': correct_answer,
+            'nextQuestion': next_question
+        })
+    }
+
+
+def recorded_answer_response(user_id, quiz_id, attempt_id, question_id, attempt):
+    # The attempt has moved past the question. When this is a retry of an
+    # answer that went through, report the stored result like a retry that
+    # reaches the transaction. nextQuestion is only sent once the quiz is
+    # completed, otherwise the client reloads the current question.
+    existing_answer = table.get_item(
+        Key={
             'PK': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}",
-            'SK': f"QUESTION#{question_id}",
-            'userAnswer': user_answer,
-            'status': status
+            'SK': f"QUESTION#{question_id}"
+        },
+        **projection('status')
+    ).get('Item')
+
+    if not existing_answer:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Answer is for an invalid question'})
         }
-    )
+
+    question = question_cache.get_question(table, quiz_id, question_id) or {}
+    body = {
+        'message': 'User answer already recorded',
+        'status': existing_answer.get('status'),
+        'correctAnswers': question.get('correctAnswer')
+    }
+    if attempt.get('dateFinished'):
+        body['nextQuestion'] = None
 
     return {
-        'statusCode': 201,
-        'body': json.dumps({'message': 'User answer created successfully', 'status': status, 'correctAnswers': correct_answer})
+        'statusCode': 200,
+        'body': json.dumps(body)
+    }
+
+
+def record_answer_stats(quiz_id, question_id, question_options, user_answer, status):
+    # The answer is already stored at this point, so a failed statistics update
+    # must not fail the request. The rebuild routine can repair the counters.
+    try:
+        stats.record_answer(quiz_id, question_id, question_options, user_answer, status)
+    except Exception as e:
+        print(f"Error recording answer stats: {str(e)}")
+
+
+def answer_put(user_id, quiz_id, attempt_id, question_id, user_answer, status):
+    # Conditional put of an answer item, it fails if the question was already answered
+    return {
+        'Put': {
+            'TableName': table.name,
+            'Item': {
+                'PK': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}",
+                'SK': f"QUESTION#{question_id}",
+                'userAnswer': user_answer,
+                'status': status
+            },
+            'ConditionExpression': 'attribute_not_exists(PK)',
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
     }
 
 
+def cancelled_answer_response(error, status, correct_answer):
+    # Map a cancelled answer transaction to a response. The answer put is the
+    # first item and the attempt update or check is the second one.
+    # Returns None for errors the caller should re-raise.
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        return None
+
+    answer_reason, attempt_reason = error.response['CancellationReasons'][:2]
+
+    if answer_reason.get('Code') == 'ConditionalCheckFailed':
+        # Already answered: report the stored result instead of grading again
+        # Items attached to transaction errors are in wire format
+        existing_answer = codec.deserialize_item(answer_reason.get('Item', {}))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'User answer already recorded',
+                'status': existing_answer.get('status', status),
+                'correctAnswers': correct_answer
+            })
+        }
+
+    if attempt_reason.get('Code') == 'ConditionalCheckFailed':
+        if not attempt_reason.get('Item'):
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'message': 'User attempt not found'})
+            }
+
+        # Ensure the answer corresponds to the current question
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Answer is for an invalid question'})
+        }
+
+    return None
+
+
+@instrumented
+@encoded
 def get_user_answers(event, context):
     data = event['pathParameters']
     user_id = data['userId']
     quiz_id = data['quizId']
     attempt_id = data['attemptId']
 
-    # Query all answers for the given attempt
-    response = table.query(
-        KeyConditionExpression=Key('PK').eq(f"USER#{user_id}#QUIZ#{
-            quiz_id}#ATTEMPT#{attempt_id}")
-    )
+    # Query all answers for the given attempt. The low-level client and codec
+    # return JSON-ready values, so no Decimal conversion is needed afterwards.
+    answers = []
+    query_kwargs = {
+        'TableName': table.name,
+        'KeyConditionExpression': 'PK = :pk',
+        'ExpressionAttributeValues': codec.serialize_values({
+            ':pk': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}"
+        })
+    }
+    while True:
+        response = client.query(**query_kwargs)
+        answers.extend(codec.deserialize_items(response.get('Items', [])))
 
-    answers = response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-    # Fetch question details for each answer
-    for answer in answers:
-        question_id = answer['SK'].split('#')[1]
+    # Fetch question details for all answers at once instead of one get_item per answer
+    question_ids = [answer['SK'].split('#')[1] for answer in answers]
+    questions = get_question_details(quiz_id, question_ids)
 
-        # Fetch the question from the database
-        question_response = table.get_item(
-            Key={
-                'PK': f"QUIZ#{quiz_id}",
-                'SK': f"QUESTION#{question_id}"
-            }
-        )
-        question = question_response.get('Item')
+    for answer in answers:
+        question = questions.get(answer['SK'].split('#')[1])
 
         # Include question text and correct answer in the response
         if question:
             answer['questionText'] = question['questionText']
             answer['correctAnswer'] = question['correctAnswer']
 
-    # Convert Decimals to JSON-serializable types
-    answers = convert_decimal(answers)
-
     return {
         'statusCode': 200,
         'body': json.dumps({'answers': answers})
     }
+
+
+def get_question_details(quiz_id, question_ids):
+    # Returns {questionId: question item}. Up to one BatchGetItem worth of
+    # answers is read by key; anything larger already covers most of the quiz,
+    # so reading the quiz's questions with one paginated query is cheaper.
+    if not question_ids:
+        return {}
+
+    projected = projection(*QUESTION_DETAILS_ATTRIBUTES)
+    if len(question_ids) <= BATCH_GET_LIMIT:
+        items = batch_get_items(
+            client,
+            table.name,
+            [codec.serialize_item({'PK': f"QUIZ#{quiz_id}", 'SK': f"QUESTION#{question_id}"})
+             for question_id in question_ids],
+            projection_expression=projected.get('ProjectionExpression'),
+            expression_attribute_names=projected.get('ExpressionAttributeNames')
+        )
+    else:
+        items = []
+        query_kwargs = {
+            'TableName': table.name,
+            'KeyConditionExpression': 'PK = :pk AND begins_with(SK, :prefix)',
+            'ExpressionAttributeValues': codec.serialize_values({
+                ':pk': f"QUIZ#{quiz_id}",
+                ':prefix': "QUESTION#"
+            }),
+            **projected
+        }
+        while True:
+            response = client.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    items = codec.deserialize_items(items)
+    return {item['SK'].split('#')[1]: item for item in items}
@@ -1,38 +1,45 @@
 import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import random
-from decimal import Decimal
-import boto3
 from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.conditions import Attr
-
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
-
-table = dynamodb.Table('QuizTable')
-
-# DynamoDB often returns numeric fields as Decimal objects when using Python's boto3 library.
-# These Decimal objects are not directly serializable into JSON.
-# We use a helper function to convert Decimal to int/float.
-
-
-def convert_decimal(obj):
-    if isinstance(obj, list):
-        return [convert_decimal(item) for item in obj]
-    if isinstance(obj, dict):
-        return {key: convert_decimal(value) for key, value in obj.items()}
-    if isinstance(obj, Decimal):
-        # Convert Decimal to int if it's an integer value, otherwise float
-        return int(obj) if obj % 1 == 0 else float(obj)
-    else:
-        return obj
-
-
+from botocore.exceptions import ClientError
+import question_cache
+from pagination import (
+    InvalidPaginationParameter, get_limit, get_query_parameters, get_start_key,
+    encode_token, query_page)
+from projection import projection
+from quiz_summaries import get_quiz_summaries
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table, client, convert_decimal
+import codec
+
+# Sparse GSI over the attemptId attribute, which only attempt items carry
+ATTEMPT_ID_INDEX = 'AttemptIdIndex'
+# Sparse GSI of completed attempts per user, sorted by finish time. An attempt
+# joins it when it is completed and gets completedBy (the user ID),
+# completedAt (dateFinished) and its duration in timeTakenSeconds.
+# dateFinished itself cannot be the sort key, unfinished attempts store it as null.
+COMPLETED_ATTEMPTS_INDEX = 'CompletedAttemptsIndex'
+COMPLETED_ATTEMPTS_INDEX_KEY = ('PK', 'SK', 'completedBy', 'completedAt')
+
+# Upper bound for the prefetch query parameter of get_current_question
+MAX_PREFETCH = 10
+
+# Attributes each read needs, see projection.py. Attempt listings leave out
+# questionOrder, which grows with the quiz and is never shown.
+ATTEMPT_ATTRIBUTES = (
+    'score', 'dateStarted', 'dateFinished', 'questionOrder', 'currentQuestionId', 'progress')
+ATTEMPT_SUMMARY_ATTRIBUTES = (
+    'PK', 'SK', 'userId', 'quizId', 'score', 'progress', 'dateStarted',
+    'dateFinished', 'currentQuestionId', 'timeTakenSeconds')
+ATTEMPT_DETAILS_ATTRIBUTES = ('userId', 'quizId', 'dateStarted', 'dateFinished', 'score')
+CURRENT_QUESTION_ATTRIBUTES = ('currentQuestionId', 'progress', 'questionOrder')
+NEXT_STEP_ATTRIBUTES = ('progress', 'questionOrder', 'dateStarted')
+
+@instrumented
+@encoded
 def create_user_attempt(event, context):
     data = json.loads(event['body'])
     user_attempt_id = str(uuid.uuid4())
@@ -40,20 +47,16 @@ def create_user_attempt(event, context):
     user_id = data['userId']
 
     # Fetch all questions for the quiz
-    response = table.query(
-        KeyConditionExpression=Key('PK').eq(
-            f"QUIZ#{quiz_id}") & Key('SK').begins_with("QUESTION#")
-    )
-    items = response.get('Items', [])
+    questions = question_cache.get_question_bank(table, quiz_id)
 
-    if not items:
+    if not questions:
         return {
             'statusCode': 404,
             'body': json.dumps({'message': 'No questions found for the quiz'})
         }
 
     # Generate question order
-    question_order = [item['SK'].split('#')[1] for item in items]
+    question_order = list(questions)
     random.shuffle(question_order)
 
     # Create UserAttempt with question order
@@ -66,6 +69,7 @@ def create_user_attempt(event, context):
             "dateFinished": None,
             'userId': user_id,  # Add for GSI
             'quizId': quiz_id,  # Add for GSI
+            'attemptId': user_attempt_id,  # Add for AttemptIdIndex
             "questionOrder": question_order,
             "currentQuestionId": question_order[0],
             "progress": 0
@@ -80,6 +84,8 @@ def create_user_attempt(event, context):
     }
 
 
+@instrumented
+@encoded
 def get_user_attempt(event, context):
     data = event['pathParameters']
     user_id = data['userId']
@@ -91,7 +97,8 @@ def get_user_attempt(event, context):
         Key={
             'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
             'SK': f"ATTEMPT#{attempt_id}"
-        }
+        },
+        **projection(*ATTEMPT_ATTRIBUTES)
     )
 
     attempt = response.get('Item')
@@ -136,50 +143,141 @@ def get_user_attempt(event, context):
     }
 
 
+@instrumented
+@encoded
 def list_user_attempts(event, context):
+    # One page of the user's completed attempts, most recently finished first.
+    # ?from= and ?to= (ISO dates or times, inclusive) limit the finish time.
     user_id = event['pathParameters']['userId']
 
-    # Query all quiz attempts for the user using the GSI
-    response = table.query(
-        IndexName='UserAttemptsIndex',
-        KeyConditionExpression=Key('userId').eq(user_id)
-    )
+    try:
+        limit = get_limit(event)
+        start_key = get_start_key(event, COMPLETED_ATTEMPTS_INDEX_KEY)
+        if start_key and start_key['completedBy'] != {'S': user_id}:
+            raise InvalidPaginationParameter('nextToken is invalid')
+        finished_from, finished_to = get_finished_range(event)
+    except InvalidPaginationParameter as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
 
-    attempts = response.get('Items', [])
+    key_condition = 'completedBy = :userId'
+    expression_attribute_values = {':userId': user_id}
+    if finished_from and finished_to:
+        key_condition += ' AND completedAt BETWEEN :from AND :to'
+        expression_attribute_values.update({':from': finished_from, ':to': finished_to})
+    elif finished_from:
+        key_condition += ' AND completedAt >= :from'
+        expression_attribute_values[':from'] = finished_from
+    elif finished_to:
+        key_condition += ' AND completedAt <= :to'
+        expression_attribute_values[':to'] = finished_to
+
+    # The low-level client and codec return JSON-ready values, so no Decimal
+    # conversion is needed. The token is a key in wire format.
+    try:
+        response = query_page(
+            client.query,
+            start_key,
+            TableName=table.name,
+            IndexName=COMPLETED_ATTEMPTS_INDEX,
+            KeyConditionExpression=key_condition,
+            ExpressionAttributeValues=codec.serialize_values(expression_attribute_values),
+            ScanIndexForward=False,
+            Limit=limit,
+            **projection(*ATTEMPT_SUMMARY_ATTRIBUTES)
+        )
+    except InvalidPaginationParameter as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
 
-    # Filter out attempts where 'dateFinished' is missing or invalid
-    completed_attempts = [
-        attempt for attempt in attempts
-        if isinstance(attempt.get('dateFinished'), str)
-    ]
+    completed_attempts = codec.deserialize_items(response.get('Items', []))
 
-    # Convert Decimals and calculate time taken
-    completed_attempts = convert_decimal(completed_attempts)
     for attempt in completed_attempts:
-        date_started = datetime.fromisoformat(attempt['dateStarted'])
-        date_finished = datetime.fromisoformat(attempt['dateFinished'])
-
-        time_delta = date_finished - date_started
+        seconds = attempt.pop('timeTakenSeconds', None)
+        if seconds is None:
+            # Set by update_user_attempt, which does not read dateStarted
+            seconds = time_taken_seconds(attempt.get('dateStarted'), attempt['dateFinished'])
         attempt['timeTaken'] = {
-            'minutes': time_delta.seconds // 60,
-            'seconds': time_delta.seconds % 60
-        }
+            'minutes': seconds // 60,
+            'seconds': seconds % 60
+        } if seconds is not None else None
 
         # Extract attemptId from SK and add it to the response
         if 'SK' in attempt and attempt['SK'].startswith('ATTEMPT#'):
             attempt['attemptId'] = attempt['SK'].split('#')[1]
 
+    # Quiz titles for every attempt in one batch read, so the dashboard does
+    # not fetch each quiz on its own
+    quizzes = get_quiz_summaries(attempt.get('quizId') for attempt in completed_attempts)
+    for attempt in completed_attempts:
+        quiz = quizzes.get(attempt.get('quizId'), {})
+        attempt['quizTitle'] = quiz.get('title')
+        attempt['quizDescription'] = quiz.get('description')
+
     return {
         'statusCode': 200,
-        'body': json.dumps({'attempts': completed_attempts})
+        'body': json.dumps({
+            'attempts': completed_attempts,
+            'nextToken': encode_token(response.get('LastEvaluatedKey'))
+        })
     }
 
 
+def get_finished_range(event):
+    # completedAt bounds from ?from= and ?to=, in the str(datetime) format
+    # attempts are stored with. A date alone in ?to= includes that whole day.
+    parameters = get_query_parameters(event)
+    bounds = []
+    for name in ('from', 'to'):
+        value = parameters.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+
+        try:
+            moment = parse_timestamp(value)
+        except ValueError:
+            raise InvalidPaginationParameter(f"{name} must be an ISO 8601 date or time")
+
+        if name == 'to' and len(value) == 10:
+            moment += timedelta(days=1, microseconds=-1)
+        bounds.append(str(moment))
+
+    if bounds[0] and bounds[1] and bounds[0] > bounds[1]:
+        raise InvalidPaginationParameter('from must not be later than to')
+    return bounds
+
+
+def parse_timestamp(value):
+    # Attempts store times as str(datetime) in UTC without an offset, so that
+    # completedAt sorts by time. ISO 8601 times with an offset or Z (as sent
+    # by the frontend) are converted to that.
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def time_taken_seconds(date_started, date_finished):
+    if not date_started or not date_finished:
+        return None
+    time_delta = parse_timestamp(date_finished) - parse_timestamp(date_started)
+    return max(int(time_delta.total_seconds()), 0)
+
+
+@instrumented
+@encoded
 def get_user_attempt_details(event, context):
     attempt_id = event['pathParameters']['attemptId']
 
-    response = table.scan(
-        FilterExpression=Key('SK').eq(f"ATTEMPT#{attempt_id}")
+    response = table.query(
+        IndexName=ATTEMPT_ID_INDEX,
+        KeyConditionExpression=Key('attemptId').eq(attempt_id),
+        **projection(*ATTEMPT_DETAILS_ATTRIBUTES)
     )
     items = response.get('Items', [])
     if not items:
@@ -202,6 +300,8 @@ def get_user_attempt_details(event, context):
     }
 
 
+@instrumented
+@encoded
 def update_user_attempt(event, context):
     data = json.loads(event['body'])
     user_id = event['pathParameters']['userId']
@@ -218,11 +318,31 @@ def update_user_attempt(event, context):
         expression_attribute_values[':score'] = data['score']
         expression_attribute_names['#score'] = 'score'
 
+    remove_attributes = []
     if 'dateFinished' in data:
+        date_finished = data['dateFinished']
+        if isinstance(date_finished, str):
+            try:
+                date_finished = str(parse_timestamp(date_finished))
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'message': 'dateFinished must be an ISO 8601 date or time'})
+                }
+
         update_expression.append('#dateFinished = :dateFinished')
-        expression_attribute_values[':dateFinished'] = data['dateFinished']
+        expression_attribute_values[':dateFinished'] = date_finished
         expression_attribute_names['#dateFinished'] = 'dateFinished'
 
+        # Keep the completed attempts index in step. The duration is worked
+        # out from the dates when the attempt is listed.
+        remove_attributes.append('timeTakenSeconds')
+        if isinstance(date_finished, str):
+            update_expression.extend(['completedBy = :userId', 'completedAt = :dateFinished'])
+            expression_attribute_values[':userId'] = user_id
+        else:
+            remove_attributes.extend(['completedBy', 'completedAt'])
+
     if 'currentQuestionId' in data:
         update_expression.append('#currentQuestionId = :currentQuestionId')
         expression_attribute_values[':currentQuestionId'] = data['currentQuestionId']
@@ -250,7 +370,8 @@ def update_user_attempt(event, context):
             'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
             'SK': f"ATTEMPT#{attempt_id}"
         },
-        UpdateExpression=f"SET {', '.join(update_expression)}",
+        UpdateExpression=f"SET {', '.join(update_expression)}"
+        + (f" REMOVE {', '.join(remove_attributes)}" if remove_attributes else ''),
         ExpressionAttributeValues=expression_attribute_values,
         ExpressionAttributeNames=expression_attribute_names
     )
@@ -261,6 +382,8 @@ def update_user_attempt(event, context):
     }
 
 
+@instrumented
+@encoded
 def get_current_question(event, context):
     data = event['pathParameters']
     user_id = data['userId']
@@ -272,7 +395,8 @@ def get_current_question(event, context):
         Key={
             'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
             'SK': f"ATTEMPT#{attempt_id}"
-        }
+        },
+        **projection(*CURRENT_QUESTION_ATTRIBUTES)
     )
     attempt = response.get('Item')
 
@@ -282,19 +406,26 @@ def get_current_question(event, context):
             'body': json.dumps({'message': 'User attempt not found'})
         }
 
+    # Optionally return the next N questions as well, so the client can render
+    # them without waiting for another round trip
+    raw_prefetch = get_query_parameters(event).get('prefetch', 0)
+    try:
+        prefetch = min(max(int(raw_prefetch), 0), MAX_PREFETCH)
+    except (TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'prefetch must be an integer'})
+        }
+
     current_question_id = attempt.get('currentQuestionId')
     progress = int(attempt.get('progress', 0))
     question_order = attempt.get('questionOrder', [])
     total_questions = len(question_order)
 
-    # Fetch the current question
-    question_response = table.get_item(
-        Key={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': f"QUESTION#{current_question_id}"
-        }
-    )
-    question = question_response.get('Item')
+    # Fetch the current question. The whole question bank is read in one go
+    # (and cached), so prefetched questions cost no extra reads.
+    questions = question_cache.get_question_bank(table, quiz_id)
+    question = questions.get(current_question_id)
 
     if not question:
         return {
@@ -302,19 +433,27 @@ def get_current_question(event, context):
             'body': json.dumps({'message': 'Current question not found'})
         }
 
+    body = question_body(current_question_id, question, progress + 1, total_questions)
+
+    if prefetch:
+        body['prefetched'] = []
+        upcoming = question_order[progress + 1:progress + 1 + prefetch]
+        for offset, question_id in enumerate(upcoming):
+            upcoming_question = questions.get(question_id)
+            if not upcoming_question:
+                break
+            body['prefetched'].append(question_body(
+                question_id, upcoming_question, progress + 2 + offset, total_questions))
+
     # Return unified response
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'questionId': current_question_id,
-            'questionText': question.get('questionText', 'No text available'),
-            'options': question.get('options', []),
-            'currentNumber': progress + 1,  # 1-based index
-            'totalQuestions': total_questions
-        })
+        'body': json.dumps(body)
     }
 
 
+@instrumented
+@encoded
 def move_to_next_question(event, context):
     try:
         data = json.loads(event['body'])
@@ -333,7 +472,8 @@ def move_to_next_question(event, context):
             Key={
                 'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
                 'SK': f"ATTEMPT#{attempt_id}"
-            }
+            },
+            **projection(*NEXT_STEP_ATTRIBUTES)
         )
         attempt = response.get('Item')
 
@@ -353,31 +493,28 @@ def move_to_next_question(event, context):
                 'body': json.dumps({'message': 'Question order is empty or not defined'})
             }
 
-        if progress + 1 < len(question_order):
-            next_question_id = question_order[progress + 1]
-            table.update_item(
-                Key={
-                    'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
-                    'SK': f"ATTEMPT#{attempt_id}"
-                },
-                UpdateExpression="SET progress = :progress, currentQuestionId = :currentQuestionId",
-                ExpressionAttributeValues={
-                    ':progress': progress + 1,
-                    ':currentQuestionId': next_question_id
-                }
-            )
-        else:
-            next_question_id = None
-            table.update_item(
+        next_question_id, set_clauses, expression_attribute_values = next_step(attempt, user_id)
+        update_kwargs = {}
+        if not next_question_id:
+            # Only the call that finishes the attempt records it, a repeated
+            # call on a finished attempt gets the same answer without a write
+            update_kwargs['ConditionExpression'] = 'attribute_not_exists(dateFinished) OR dateFinished = :null'
+            expression_attribute_values[':null'] = None
+
+        try:
+            updated = table.update_item(
                 Key={
                     'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
                     'SK': f"ATTEMPT#{attempt_id}"
                 },
-                UpdateExpression="SET dateFinished = :dateFinished",
-                ExpressionAttributeValues={
-                    ':dateFinished': str(datetime.now())
-                }
-            )
+                UpdateExpression=f"SET {', '.join(set_clauses)}",
+                ExpressionAttributeValues=expression_attribute_values,
+                ReturnValues='ALL_NEW',
+                **update_kwargs
+            )['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
             return {
                 'statusCode': 200,
                 'body': json.dumps({
@@ -386,14 +523,20 @@ def move_to_next_question(event, context):
                 })
             }
 
-        # Fetch the next question details
-        question_response = table.get_item(
-            Key={
-                'PK': f"QUIZ#{quiz_id}",
-                'SK': f"QUESTION#{next_question_id}"
+        if not next_question_id:
+            record_leaderboard_entry(
+                quiz_id, user_id, attempt_id, updated.get('score', 0),
+                updated.get('dateStarted'), updated['dateFinished'])
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'message': 'Quiz completed',
+                    'nextQuestionId': None
+                })
             }
-        )
-        question = question_response.get('Item')
+
+        # Fetch the next question details
+        question = question_cache.get_question(table, quiz_id, next_question_id)
 
         if not question:
             return {
@@ -401,18 +544,11 @@ def move_to_next_question(event, context):
                 'body': json.dumps({'message': 'Next question not found'})
             }
 
-        print(f"Progress: {progress}, Question Order: {question_order}")
-        print(f"Next Question ID: {next_question_id}")
-
+        # Increment progress for 1-based index
         return {
             'statusCode': 200,
-            'body': json.dumps({
-                'questionId': next_question_id,
-                'questionText': question.get('questionText', 'No text available'),
-                'options': question.get('options', []),
-                'currentNumber': progress + 2,  # Increment progress for 1-based index
-                'totalQuestions': total_questions
-            })
+            'body': json.dumps(question_body(
+                next_question_id, question, progress + 2, total_questions))
         }
     except Exception as e:
         print(f"Error in move_to_next_question: {str(e)}")
@@ -420,3 +556,63 @@ def move_to_next_question(event, context):
             'statusCode': 500,
             'body': json.dumps({'message': 'Internal server error'})
         }
+
+
+def question_body(question_id, question, current_number, total_questions):
+    # Question payload shown to students, never including the correct answer
+    return {
+        'questionId': question_id,
+        'questionText': question.get('questionText', 'No text available'),
+        'options': question.get('options', []),
+        'currentNumber': current_number,  # 1-based index
+        'totalQuestions': total_questions
+    }
+
+
+def next_step(attempt, user_id):
+    # Work out how an attempt moves past its current question. Returns the next
+    # question ID (None when the quiz is finished) and the SET clauses with
+    # their values for the attempt update. Finishing the quiz also adds the
+    # attempt to the completed attempts index.
+    progress = int(attempt.get('progress', 0))
+    question_order = attempt.get('questionOrder', [])
+
+    if progress + 1 < len(question_order):
+        next_question_id = question_order[progress + 1]
+        return next_question_id, [
+            'progress = :progress',
+            'currentQuestionId = :currentQuestionId'
+        ], {
+            ':progress': progress + 1,
+            ':currentQuestionId': next_question_id
+        }
+
+    date_finished = str(datetime.now())
+    set_clauses = [
+        'dateFinished = :dateFinished',
+        'completedBy = :userId',
+        'completedAt = :dateFinished'
+    ]
+    expression_attribute_values = {
+        ':dateFinished': date_finished,
+        ':userId': user_id
+    }
+
+    seconds = time_taken_seconds(attempt.get('dateStarted'), date_finished)
+    if seconds is not None:
+        set_clauses.append('timeTakenSeconds = :timeTakenSeconds')
+        expression_attribute_values[':timeTakenSeconds'] = seconds
+    return None, set_clauses, expression_attribute_values
+
+
+def record_leaderboard_entry(quiz_id, user_id, attempt_id, score, date_started, date_finished):
+    # Imported here because the leaderboard module builds on this one
+    import leaderboard
+
+    # The attempt is already completed, so a failed leaderboard write must not
+    # fail the request. The rebuild routine can restore missing entries.
+    try:
+        leaderboard.record_completion(
+            quiz_id, user_id, attempt_id, score, date_started, date_finished)
+    except Exception as e:
+        print(f"Error recording leaderboard entry: {str(e)}")
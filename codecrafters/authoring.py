@@ -0,0 +1,335 @@
+import os
+import re
+import csv
+import sys
+import json
+import uuid
+import argparse
+from botocore.exceptions import ClientError
+from batch import batch_write_items
+from question import question_item, validate_question, write_transaction
+from quiz import CATALOG_PARTITION, quiz_metadata_item
+from http_cache import bump_catalog_version
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import dynamodb, table
+
+# Bulk quiz authoring: create a quiz together with all of its questions, or add
+# many questions to an existing quiz, in one request instead of one request
+# per question. The whole payload is validated before anything is written.
+# Payloads that fit in one transaction are written atomically; larger ones go
+# through BatchWriteItem and report the questions that could not be written.
+# A new quiz written that way is stored first, hidden and without questions,
+# and is listed once its questions are written.
+#
+# Question banks can also be imported from the command line (run in the
+# codecrafters directory):
+#   python authoring.py bank.json
+#   python authoring.py bank.csv --title "Python Basics" --description "..."
+#   python authoring.py bank.csv --quiz-id <quizId>
+
+MAX_BULK_QUESTIONS = 500
+# TransactWriteItems accepts at most 100 actions, the metadata write is one of
+# them, and 4 MB
+TRANSACTION_LIMIT = 100
+TRANSACTION_MAX_BYTES = 4 * 1024 * 1024
+OPTION_COLUMN = re.compile(r'option(\d+)$')
+
+
+@instrumented
+@encoded
+def bulk_create_quiz(event, context):
+    data = json.loads(event['body'])
+    title = data.get('title')
+    description = data.get('description')
+    questions = data.get('questions')
+
+    if not title or not description:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Missing required parameters: title or description'})
+        }
+
+    invalid_response = check_questions(questions)
+    if invalid_response:
+        return invalid_response
+
+    result = write_new_quiz(title, description, questions)
+    return bulk_response('Quiz created successfully', result)
+
+
+@instrumented
+@encoded
+def bulk_create_questions(event, context):
+    quiz_id = event['pathParameters']['quizId']
+    data = json.loads(event['body'])
+    questions = data.get('questions')
+
+    invalid_response = check_questions(questions)
+    if invalid_response:
+        return invalid_response
+
+    result = write_questions(quiz_id, questions)
+    if result is None:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'Quiz not found'})
+        }
+
+    return bulk_response('Questions created successfully', result)
+
+
+def check_questions(questions):
+    # Returns a 400 response when the questions cannot be written, else None
+    if not isinstance(questions, list) or not questions:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'questions must be a non-empty list'})
+        }
+
+    if len(questions) > MAX_BULK_QUESTIONS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f"At most {MAX_BULK_QUESTIONS} questions can be created at once"})
+        }
+
+    errors = validate_questions(questions)
+    if errors:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Invalid questions', 'errors': errors})
+        }
+
+    return None
+
+
+def validate_questions(questions):
+    errors = []
+    for index, question in enumerate(questions):
+        message = validate_question(question)
+        if message:
+            errors.append({'index': index, 'message': message})
+    return errors
+
+
+def bulk_response(message, result):
+    # 207 tells the client that some questions were not written
+    if result['failed']:
+        return {
+            'statusCode': 207,
+            'body': json.dumps({'message': 'Some questions were not created', **result})
+        }
+
+    return {
+        'statusCode': 201,
+        'body': json.dumps({'message': message, **result})
+    }
+
+
+def new_question_items(quiz_id, questions):
+    question_ids = [str(uuid.uuid4()) for _ in questions]
+    items = [
+        question_item(quiz_id, question_id, question)
+        for question_id, question in zip(question_ids, questions)
+    ]
+    return question_ids, items
+
+
+def fits_in_transaction(items):
+    # The JSON length of the items is above their DynamoDB size
+    return (len(items) + 1 <= TRANSACTION_LIMIT
+            and len(json.dumps(items, default=str).encode('utf-8')) < TRANSACTION_MAX_BYTES)
+
+
+def is_rejected_transaction(error):
+    # A transaction DynamoDB refuses as a whole, e.g. for its size. Writing the
+    # items one by one either works or reports the item at fault.
+    return error.response['Error']['Code'] == 'ValidationException'
+
+
+def write_new_quiz(title, description, questions):
+    quiz_id = str(uuid.uuid4())
+    question_ids, items = new_question_items(quiz_id, questions)
+
+    if fits_in_transaction(items):
+        try:
+            dynamodb.meta.client.transact_write_items(
+                TransactItems=[
+                    {'Put': {'TableName': table.name, 'Item': item}}
+                    for item in [quiz_metadata_item(quiz_id, title, description, len(items))] + items
+                ]
+            )
+        except ClientError as e:
+            if not is_rejected_transaction(e):
+                raise
+        else:
+            bump_catalog_version()
+            return write_result(quiz_id, question_ids, [], atomic=True)
+
+    # The quiz is stored first, hidden and out of the catalog, so questions
+    # written before a failure still belong to a quiz that can be deleted
+    metadata = quiz_metadata_item(quiz_id, title, description)
+    metadata['visible'] = False
+    del metadata['quizCatalog']
+    table.put_item(Item=metadata)
+
+    failed = failed_indexes(items, batch_write_items(dynamodb, table.name, items))
+    # Then it is listed with the count of questions that were actually written
+    table.update_item(
+        Key={
+            'PK': metadata['PK'],
+            'SK': metadata['SK']
+        },
+        UpdateExpression='SET visible = :visible, quizCatalog = :catalog, questionCount = :count ADD version :one',
+        ExpressionAttributeValues={
+            ':visible': True,
+            ':catalog': CATALOG_PARTITION,
+            ':count': len(items) - len(failed),
+            ':one': 1
+        }
+    )
+    bump_catalog_version()
+    return write_result(quiz_id, question_ids, failed, atomic=False)
+
+
+def write_questions(quiz_id, questions):
+    # Returns None when the quiz does not exist
+    question_ids, items = new_question_items(quiz_id, questions)
+    metadata_key = {
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': 'METADATA'
+    }
+
+    if fits_in_transaction(items):
+        try:
+            # Concurrent writes to the quiz are retried, a failed condition
+            # means the quiz does not exist
+            written = write_transaction([
+                {
+                    'Update': {
+                        'TableName': table.name,
+                        'Key': metadata_key,
+                        'UpdateExpression': 'ADD questionCount :count, version :one',
+                        'ConditionExpression': 'attribute_exists(PK)',
+                        'ExpressionAttributeValues': {':count': len(items), ':one': 1}
+                    }
+                }
+            ] + [
+                {'Put': {'TableName': table.name, 'Item': item}}
+                for item in items
+            ])
+        except ClientError as e:
+            if not is_rejected_transaction(e):
+                raise
+        else:
+            if not written:
+                return None
+            return write_result(quiz_id, question_ids, [], atomic=True)
+
+    if 'Item' not in table.get_item(Key=metadata_key, ProjectionExpression='PK'):
+        return None
+
+    failed = failed_indexes(items, batch_write_items(dynamodb, table.name, items))
+    # Bumping version invalidates cached question banks of the quiz
+    table.update_item(
+        Key=metadata_key,
+        UpdateExpression='ADD questionCount :count, version :one',
+        ExpressionAttributeValues={':count': len(items) - len(failed), ':one': 1}
+    )
+    return write_result(quiz_id, question_ids, failed, atomic=False)
+
+
+def failed_indexes(items, unprocessed_items):
+    unprocessed_keys = {item['SK'] for item in unprocessed_items}
+    return [index for index, item in enumerate(items) if item['SK'] in unprocessed_keys]
+
+
+def write_result(quiz_id, question_ids, failed, atomic):
+    failed = set(failed)
+    return {
+        'quizId': quiz_id,
+        'atomic': atomic,
+        'created': len(question_ids) - len(failed),
+        # In the order of the submitted questions, None where writing failed
+        'questionIds': [
+            None if index in failed else question_id
+            for index, question_id in enumerate(question_ids)
+        ],
+        'failed': [
+            {'index': index, 'message': 'Question could not be written, please retry'}
+            for index in sorted(failed)
+        ]
+    }
+
+
+def load_question_bank(path):
+    # Returns (quiz fields, questions). JSON files hold a list of questions or
+    # an object with title, description and questions. CSV files have a
+    # questionText column, one column per option (option1, option2, ...) and a
+    # correctAnswer column where several correct options are separated by |.
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, newline='', encoding='utf-8') as bank_file:
+            return {}, [csv_question(row) for row in csv.DictReader(bank_file)]
+
+    with open(path, encoding='utf-8') as bank_file:
+        bank = json.load(bank_file)
+
+    if isinstance(bank, list):
+        return {}, bank
+    return {'title': bank.get('title'), 'description': bank.get('description')}, bank.get('questions')
+
+
+def csv_question(row):
+    option_columns = sorted(
+        (column for column in row if column and OPTION_COLUMN.match(column)),
+        key=lambda column: int(OPTION_COLUMN.match(column).group(1))
+    )
+    correct_answer = (row.get('correctAnswer') or '').strip()
+    correct_answers = [answer.strip() for answer in correct_answer.split('|')]
+
+    return {
+        'questionText': (row.get('questionText') or '').strip(),
+        'options': [row[column].strip() for column in option_columns if (row[column] or '').strip()],
+        'correctAnswer': correct_answers if len(correct_answers) > 1 else correct_answer
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import a JSON or CSV question bank')
+    parser.add_argument('path')
+    parser.add_argument('--quiz-id', help='add the questions to this existing quiz')
+    parser.add_argument('--title', help='title of the new quiz, overrides the file')
+    parser.add_argument('--description', help='description of the new quiz, overrides the file')
+    args = parser.parse_args(argv)
+
+    quiz_fields, questions = load_question_bank(args.path)
+
+    if not isinstance(questions, list) or not questions:
+        sys.exit('The question bank has no questions')
+    if len(questions) > MAX_BULK_QUESTIONS:
+        sys.exit(f"At most {MAX_BULK_QUESTIONS} questions can be imported at once")
+
+    errors = validate_questions(questions)
+    if errors:
+        for error in errors:
+            print(f"Question {error['index'] + 1}: {error['message']}", file=sys.stderr)
+        sys.exit('Nothing was imported')
+
+    if args.quiz_id:
+        result = write_questions(args.quiz_id, questions)
+        if result is None:
+            sys.exit(f"Quiz {args.quiz_id} not found")
+    else:
+        title = args.title or quiz_fields.get('title')
+        description = args.description or quiz_fields.get('description')
+        if not title or not description:
+            sys.exit('A new quiz needs a title and a description')
+        result = write_new_quiz(title, description, questions)
+
+    print(json.dumps(result, indent=2))
+    if result['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
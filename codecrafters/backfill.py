@@ -1,43 +1,283 @@
-import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr
+from quiz import CATALOG_PARTITION
+from user import ROLE_REGISTRY_KEY, role_index_key
+from attempt import parse_timestamp, time_taken_seconds
+from migration import run_migration_handler
+from http_cache import bump_catalog_version
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import TABLE_NAME, table
 
-dynamodb = boto3.resource('dynamodb')
-table_name = 'QuizTable'  # Replace with your actual table name
-table = dynamodb.Table(table_name)
+table_name = TABLE_NAME
 
+# Every backfill runs on the migration engine: parallel scan segments,
+# checkpoints that let a timed-out invocation resume, optional capacity limits
+# and a progress report. See migration.run_migration_handler for the options.
 
+
+def add_user_and_quiz_ids(client, item):
+    # Parse userId and quizId from PK
+    user_id = item['PK'].split('#')[1]
+    quiz_id = item['PK'].split('#')[3]
+
+    # Add userId and quizId attributes
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        UpdateExpression="SET userId = :userId, quizId = :quizId",
+        ExpressionAttributeValues={
+            ':userId': user_id,
+            ':quizId': quiz_id
+        },
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+
+@instrumented
+@encoded
 def handler(event, context):
-    try:
-        # Scan to fetch all items
-        response = table.scan()
-        items = response['Items']
-
-        for item in items:
-            if item['PK'].startswith('USER#') and item['SK'].startswith('ATTEMPT#'):
-                # Parse userId and quizId from PK
-                user_id = item['PK'].split('#')[1]
-                quiz_id = item['PK'].split('#')[3]
-
-                # Add userId and quizId attributes
-                table.update_item(
-                    Key={
-                        'PK': item['PK'],
-                        'SK': item['SK']
-                    },
-                    UpdateExpression="SET userId = :userId, quizId = :quizId",
-                    ExpressionAttributeValues={
-                        ':userId': user_id,
-                        ':quizId': quiz_id
-                    }
-                )
-
-        return {
-            'statusCode': 200,
-            'body': "Backfill completed successfully."
-        }
+    return run_migration_handler(
+        table,
+        'user-and-quiz-ids',
+        add_user_and_quiz_ids,
+        {
+            'FilterExpression': Attr('PK').begins_with('USER#')
+            & Attr('SK').begins_with('ATTEMPT#')
+        },
+        event,
+        context
+    )
+
+
+def add_quiz_catalog(client, item):
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        UpdateExpression="SET quizCatalog = :catalog",
+        ExpressionAttributeValues={
+            ':catalog': CATALOG_PARTITION
+        },
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+
+@instrumented
+@encoded
+def backfill_quiz_catalog(event, context):
+    # Add the quizCatalog attribute to visible quizzes created before the
+    # VisibleQuizIndex existed, so get_all_quizzes can find them
+    response = run_migration_handler(
+        table,
+        'quiz-catalog',
+        add_quiz_catalog,
+        {
+            'FilterExpression': Attr('SK').eq('METADATA')
+            & Attr('PK').begins_with('QUIZ#')
+            & Attr('visible').eq(True)
+            & Attr('quizCatalog').not_exists()
+        },
+        event,
+        context
+    )
+    # Cached catalog pages do not list the quizzes added so far
+    bump_catalog_version()
+    return response
+
+
+def count_questions(client, quiz_id):
+    # Count question items without reading them, following every page
+    count = 0
+    query_kwargs = {
+        'TableName': table_name,
+        'KeyConditionExpression': Key('PK').eq(f"QUIZ#{quiz_id}")
+        & Key('SK').begins_with("QUESTION#"),
+        'Select': 'COUNT'
+    }
+
+    while True:
+        response = client.query(**query_kwargs)
+        count += response['Count']
+
+        if 'LastEvaluatedKey' not in response:
+            return count
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def repair_question_count(client, item):
+    actual_count = count_questions(client, item['PK'].split('#')[1])
+
+    if item.get('questionCount') == actual_count:
+        return None
+
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        # Bumping version changes the ETag of GET /quiz/{quizId}
+        UpdateExpression="SET questionCount = :count ADD version :one",
+        ExpressionAttributeValues={
+            ':count': actual_count,
+            ':one': 1
+        },
+        ReturnConsumedCapacity='TOTAL'
+    )
 
-    except Exception as e:
-        print(f"Error running backfill: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': f"Error running backfill: {str(e)}"
+
+@instrumented
+@encoded
+def reconcile_question_counts(event, context):
+    # Repair questionCount on quiz metadata where it drifted from the
+    # number of QUESTION# items actually stored under the quiz
+    return run_migration_handler(
+        table,
+        'question-counts',
+        repair_question_count,
+        {
+            'FilterExpression': Attr('SK').eq('METADATA')
+            & Attr('PK').begins_with('QUIZ#')
+        },
+        event,
+        context
+    )
+
+
+def add_attempt_id(client, item):
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        UpdateExpression="SET attemptId = :attemptId",
+        ExpressionAttributeValues={
+            ':attemptId': item['SK'].split('#')[1]
+        },
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+
+@instrumented
+@encoded
+def backfill_attempt_ids(event, context):
+    # Add the attemptId attribute to attempts created before the
+    # AttemptIdIndex existed, so get_user_attempt_details can find them
+    return run_migration_handler(
+        table,
+        'attempt-ids',
+        add_attempt_id,
+        {
+            'FilterExpression': Attr('PK').begins_with('USER#')
+            & Attr('SK').begins_with('ATTEMPT#')
+            & Attr('attemptId').not_exists()
+        },
+        event,
+        context
+    )
+
+
+def add_user_role(client, item):
+    index_key = role_index_key(item.get('role'))
+    client.update_item(
+        TableName=table_name,
+        Key=ROLE_REGISTRY_KEY,
+        UpdateExpression="ADD #roles :role",
+        ExpressionAttributeNames={
+            '#roles': 'roles'
+        },
+        ExpressionAttributeValues={
+            ':role': {index_key['userRole']}
         }
+    )
+
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        UpdateExpression="SET userRole = :role",
+        ExpressionAttributeValues={
+            ':role': index_key['userRole']
+        },
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+
+@instrumented
+@encoded
+def backfill_user_roles(event, context):
+    # Add the userRole attribute to users created before the UserRoleIndex
+    # existed, or whose role was cleared before users without a role were
+    # indexed, so list_students and get_all_users can find them
+    return run_migration_handler(
+        table,
+        'user-roles',
+        add_user_role,
+        {
+            'FilterExpression': Attr('SK').eq('METADATA')
+            & Attr('PK').begins_with('USER#')
+            & Attr('userRole').not_exists()
+        },
+        event,
+        context
+    )
+
+
+def add_completion(client, item):
+    # Times set through update_user_attempt may carry an offset, the index
+    # sorts on the UTC form. Unreadable times are left out of the index.
+    try:
+        date_finished = str(parse_timestamp(item['dateFinished']))
+    except ValueError:
+        return None
+
+    attributes = {
+        ':userId': item['PK'].split('#')[1],
+        ':dateFinished': date_finished
+    }
+    update_expression = "SET completedBy = :userId, completedAt = :dateFinished"
+
+    seconds = time_taken_seconds(item.get('dateStarted'), date_finished)
+    if seconds is not None:
+        update_expression += ", timeTakenSeconds = :timeTakenSeconds"
+        attributes[':timeTakenSeconds'] = seconds
+
+    return client.update_item(
+        TableName=table_name,
+        Key={
+            'PK': item['PK'],
+            'SK': item['SK']
+        },
+        UpdateExpression=update_expression,
+        ExpressionAttributeValues=attributes,
+        ReturnConsumedCapacity='TOTAL'
+    )
+
+
+@instrumented
+@encoded
+def backfill_completed_attempts(event, context):
+    # Add attempts completed before the CompletedAttemptsIndex existed to it,
+    # so list_user_attempts can find them
+    return run_migration_handler(
+        table,
+        'completed-attempts',
+        add_completion,
+        {
+            'FilterExpression': Attr('PK').begins_with('USER#')
+            & Attr('SK').begins_with('ATTEMPT#')
+            & Attr('dateFinished').attribute_type('S')
+            & Attr('completedBy').not_exists()
+        },
+        event,
+        context
+    )
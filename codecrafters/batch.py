@@ -0,0 +1,85 @@
+import time
+
+# Helpers for DynamoDB batch reads and writes.
+# BatchGetItem accepts at most 100 keys per call and may hand back part of the
+# request as UnprocessedKeys when the table is throttled, so callers go through
+# batch_get_items instead of calling batch_get_item directly. BatchWriteItem
+# works the same way with 25 items and UnprocessedItems.
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.05
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def batch_get_items(dynamodb, table_name, keys, projection_expression=None,
+                    expression_attribute_names=None):
+    # Fetch every key, 100 at a time, retrying unprocessed keys with
+    # exponential backoff. Missing items are simply absent from the result.
+    # dynamodb is the resource or the low-level client; with the client, keys
+    # and items are in wire format.
+    items = []
+
+    # BatchGetItem rejects duplicate keys in one request
+    unique_keys = list({(repr(key['PK']), repr(key['SK'])): key for key in keys}.values())
+
+    for key_chunk in chunks(unique_keys, BATCH_GET_LIMIT):
+        request = {'Keys': key_chunk}
+        if projection_expression:
+            request['ProjectionExpression'] = projection_expression
+        if expression_attribute_names:
+            request['ExpressionAttributeNames'] = expression_attribute_names
+
+        request_items = {table_name: request}
+        attempt = 0
+
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+
+            request_items = response.get('UnprocessedKeys') or {}
+            if not request_items:
+                break
+
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                raise RuntimeError(
+                    f"BatchGetItem left keys unprocessed after {MAX_RETRIES} retries")
+            time.sleep(BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+
+    return items
+
+
+def batch_write_items(dynamodb, table_name, items):
+    # Put every item, 25 at a time, retrying unprocessed items with
+    # exponential backoff. Unlike boto3's batch_writer this gives up after
+    # MAX_RETRIES and returns the items that were never written, so callers
+    # can report them.
+    failed = []
+
+    for item_chunk in chunks(items, BATCH_WRITE_LIMIT):
+        request_items = {
+            table_name: [{'PutRequest': {'Item': item}} for item in item_chunk]
+        }
+        attempt = 0
+
+        while request_items:
+            response = dynamodb.batch_write_item(RequestItems=request_items)
+
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                break
+
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                failed.extend(
+                    request['PutRequest']['Item'] for request in request_items.get(table_name, []))
+                break
+            time.sleep(BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+
+    return failed
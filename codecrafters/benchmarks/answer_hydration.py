@@ -0,0 +1,90 @@
+import argparse
+import json
+import uuid
+
+from benchmarks.common import (
+    DEFAULT_ENDPOINT, CallCounter, connect, ensure_table, timed, use_resource)
+import answer
+from attempt import convert_decimal
+from boto3.dynamodb.conditions import Key
+
+# Compares DynamoDB round trips of get_user_answers against the previous
+# implementation, which fetched each answered question with its own get_item.
+
+
+def legacy_get_user_answers(table, user_id, quiz_id, attempt_id):
+    response = table.query(
+        KeyConditionExpression=Key('PK').eq(
+            f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}")
+    )
+    answers = response.get('Items', [])
+    for item in answers:
+        question = table.get_item(
+            Key={'PK': f"QUIZ#{quiz_id}", 'SK': item['SK']}
+        ).get('Item')
+        if question:
+            item['questionText'] = question['questionText']
+            item['correctAnswer'] = question['correctAnswer']
+    return convert_decimal(answers)
+
+
+def seed_attempt(table, question_count):
+    user_id = str(uuid.uuid4())
+    quiz_id = str(uuid.uuid4())
+    attempt_id = str(uuid.uuid4())
+
+    with table.batch_writer() as writer:
+        for number in range(question_count):
+            question_id = str(uuid.uuid4())
+            writer.put_item(Item={
+                'PK': f"QUIZ#{quiz_id}",
+                'SK': f"QUESTION#{question_id}",
+                'questionText': f"Question {number}",
+                'options': ['a', 'b', 'c', 'd'],
+                'correctAnswer': 'a'
+            })
+            writer.put_item(Item={
+                'PK': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}",
+                'SK': f"QUESTION#{question_id}",
+                'userAnswer': 'a' if number % 2 else 'b',
+                'status': 'pass' if number % 2 else 'fail'
+            })
+
+    return user_id, quiz_id, attempt_id
+
+
+def run(dynamodb, question_counts):
+    table = ensure_table(dynamodb)
+    client = use_resource(dynamodb)
+    counter = CallCounter(dynamodb.meta.client, client)
+
+    print(f"{'questions':>9} {'legacy calls':>12} {'legacy ms':>10} {'batched calls':>13} {'batched ms':>11}")
+    for question_count in question_counts:
+        user_id, quiz_id, attempt_id = seed_attempt(table, question_count)
+
+        counter.reset()
+        legacy, legacy_seconds = timed(
+            legacy_get_user_answers, table, user_id, quiz_id, attempt_id)
+        legacy_calls = counter.total
+
+        counter.reset()
+        response, batched_seconds = timed(answer.get_user_answers, {
+            'pathParameters': {
+                'userId': user_id, 'quizId': quiz_id, 'attemptId': attempt_id}
+        }, None)
+        batched_calls = counter.total
+
+        batched = json.loads(response['body'])['answers']
+        assert len(batched) == len(legacy) == question_count
+
+        print(f"{question_count:>9} {legacy_calls:>12} {legacy_seconds * 1000:>10.1f} "
+              f"{batched_calls:>13} {batched_seconds * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Count DynamoDB round trips of get_user_answers')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT)
+    parser.add_argument('--questions', type=int, nargs='+', default=[10, 50, 150])
+    args = parser.parse_args()
+    run(connect(args.endpoint), args.questions)
@@ -0,0 +1,128 @@
+import argparse
+import json
+import uuid
+
+from benchmarks.common import (
+    DEFAULT_ENDPOINT, CallCounter, connect, ensure_table, latency_summary,
+    timed, use_resource)
+import answer
+import question_cache
+
+# Tail latency of create_user_answer compared with the previous implementation,
+# which made four sequential calls: get attempt, get question, update score
+# and put answer.
+
+
+def legacy_create_user_answer(table, user_id, quiz_id, attempt_id, question_id, user_answer):
+    attempt = table.get_item(Key={
+        'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+        'SK': f"ATTEMPT#{attempt_id}"
+    }).get('Item')
+    if not attempt or question_id != attempt['currentQuestionId']:
+        raise RuntimeError('Attempt is not on the expected question')
+
+    question = table.get_item(Key={
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': f"QUESTION#{question_id}"
+    }).get('Item')
+    status = 'pass' if user_answer == question['correctAnswer'] else 'fail'
+
+    if status == 'pass':
+        table.update_item(
+            Key={
+                'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+                'SK': f"ATTEMPT#{attempt_id}"
+            },
+            UpdateExpression="SET score = if_not_exists(score, :start) + :increment",
+            ExpressionAttributeValues={':start': 0, ':increment': 100}
+        )
+
+    table.put_item(Item={
+        'PK': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}",
+        'SK': f"QUESTION#{question_id}",
+        'userAnswer': user_answer,
+        'status': status
+    })
+
+
+def seed(table, question_count, attempt_count):
+    quiz_id = str(uuid.uuid4())
+    question_ids = [str(uuid.uuid4()) for _ in range(question_count)]
+    attempts = []
+
+    with table.batch_writer() as writer:
+        writer.put_item(Item={
+            'PK': f"QUIZ#{quiz_id}", 'SK': 'METADATA',
+            'title': 'Benchmark', 'description': 'Benchmark quiz', 'version': 1
+        })
+        for question_id in question_ids:
+            writer.put_item(Item={
+                'PK': f"QUIZ#{quiz_id}",
+                'SK': f"QUESTION#{question_id}",
+                'questionText': 'Which option is correct?',
+                'options': ['a', 'b', 'c', 'd'],
+                'correctAnswer': 'a'
+            })
+        for number in range(attempt_count):
+            user_id = str(uuid.uuid4())
+            attempt_id = str(uuid.uuid4())
+            question_id = question_ids[number % question_count]
+            writer.put_item(Item={
+                'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+                'SK': f"ATTEMPT#{attempt_id}",
+                'score': 0,
+                'currentQuestionId': question_id,
+                'questionOrder': question_ids,
+                'progress': 0
+            })
+            attempts.append((user_id, attempt_id, question_id))
+
+    return quiz_id, attempts
+
+
+def run(dynamodb, submissions, question_count):
+    table = ensure_table(dynamodb)
+    client = use_resource(dynamodb)
+    question_cache.clear()
+    counter = CallCounter(dynamodb.meta.client, client)
+
+    quiz_id, attempts = seed(table, question_count, submissions * 2)
+    legacy_attempts, new_attempts = attempts[:submissions], attempts[submissions:]
+
+    counter.reset()
+    legacy_samples = []
+    for number, (user_id, attempt_id, question_id) in enumerate(legacy_attempts):
+        user_answer = 'a' if number % 2 else 'b'
+        _, seconds = timed(legacy_create_user_answer, table, user_id, quiz_id,
+                           attempt_id, question_id, user_answer)
+        legacy_samples.append(seconds)
+    legacy_calls = counter.total
+
+    counter.reset()
+    new_samples = []
+    for number, (user_id, attempt_id, question_id) in enumerate(new_attempts):
+        event = {'body': json.dumps({
+            'userId': user_id, 'quizId': quiz_id, 'attemptId': attempt_id,
+            'questionId': question_id, 'userAnswer': 'a' if number % 2 else 'b'
+        })}
+        response, seconds = timed(answer.create_user_answer, event, None)
+        assert response['statusCode'] == 201, response
+        new_samples.append(seconds)
+    new_calls = counter.total
+
+    print(f"{'path':<12} {'calls/answer':>12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, samples, calls in (('legacy', legacy_samples, legacy_calls),
+                                 ('transaction', new_samples, new_calls)):
+        summary = latency_summary(samples)
+        print(f"{name:<12} {calls / submissions:>12.2f} {summary['p50']:>8.1f} "
+              f"{summary['p95']:>8.1f} {summary['p99']:>8.1f} {summary['max']:>8.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare create_user_answer latency with the four-call path')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT)
+    parser.add_argument('--submissions', type=int, default=500)
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+    run(connect(args.endpoint), args.submissions, args.questions)
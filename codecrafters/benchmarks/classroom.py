@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    DEFAULT_ENDPOINT, connect, ensure_table, latency_summary, timed,
+    use_resource)
+from question import question_item
+from quiz import quiz_metadata_item
+import answer
+import attempt
+import question_cache
+
+# Load test of a classroom taking the same quiz at once. Every virtual student
+# starts an attempt, then for each question reads it, answers it and moves on,
+# and finally reads back their answers, all through the real handlers with
+# API Gateway style events. Students wait for each other at a barrier so they
+# all start together, like a class at 9:00.
+#
+# Reports throughput, p50/p95/p99 latency per handler and the DynamoDB calls
+# made per student-quiz, e.g.
+#   python -m benchmarks.classroom --students 200 --questions 20 --output baseline.json
+
+HANDLER_NAMES = (
+    'create_user_attempt', 'get_current_question', 'create_user_answer',
+    'move_to_next_question', 'get_user_answers'
+)
+
+
+class StudentFailed(Exception):
+    pass
+
+
+class Recorder:
+    # Latency samples and failures per handler, plus DynamoDB calls by the
+    # handler that made them. Calls are attributed through a thread-local
+    # because every student runs on its own thread.
+
+    def __init__(self, *clients):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.samples = defaultdict(list)
+        self.failures = Counter()
+        self.calls = defaultdict(Counter)
+        for client in clients:
+            client.meta.events.register('before-call.dynamodb', self._count)
+
+    def _count(self, model, **kwargs):
+        handler_name = getattr(self.local, 'handler_name', None)
+        if handler_name is None:
+            return
+        with self.lock:
+            self.calls[handler_name][model.name] += 1
+
+    def call(self, handler_name, handler, event, expected_status):
+        self.local.handler_name = handler_name
+        try:
+            response, seconds = timed(handler, event, None)
+        except Exception as e:
+            with self.lock:
+                self.failures[handler_name] += 1
+            raise StudentFailed(f"{handler_name} raised {e!r}")
+        finally:
+            self.local.handler_name = None
+
+        with self.lock:
+            self.samples[handler_name].append(seconds)
+            if response['statusCode'] != expected_status:
+                self.failures[handler_name] += 1
+        if response['statusCode'] != expected_status:
+            raise StudentFailed(f"{handler_name} returned {response['statusCode']}: {response.get('body')}")
+        return json.loads(response['body'])
+
+
+def seed_quiz(table, question_count):
+    quiz_id = str(uuid.uuid4())
+    options = ['a', 'b', 'c', 'd']
+    with table.batch_writer() as writer:
+        writer.put_item(Item=quiz_metadata_item(
+            quiz_id, 'Classroom load test', 'Generated quiz', question_count))
+        for number in range(question_count):
+            writer.put_item(Item=question_item(quiz_id, str(uuid.uuid4()), {
+                'questionText': f"Which option is correct for question {number + 1}?",
+                'options': options,
+                'correctAnswer': random.choice(options)
+            }))
+    return quiz_id
+
+
+def take_quiz(recorder, quiz_id, student_number, barrier, think_seconds):
+    user_id = f"student-{student_number}-{uuid.uuid4()}"
+    if barrier:
+        barrier.wait()
+
+    created = recorder.call('create_user_attempt', attempt.create_user_attempt, {
+        'body': json.dumps({'quizId': quiz_id, 'userId': user_id})
+    }, 201)
+    path = {'userId': user_id, 'quizId': quiz_id, 'attemptId': created['userAttemptId']}
+
+    while True:
+        question = recorder.call('get_current_question', attempt.get_current_question, {
+            'pathParameters': path,
+            'queryStringParameters': None
+        }, 200)
+        if think_seconds:
+            time.sleep(random.uniform(0, 2 * think_seconds))
+
+        recorder.call('create_user_answer', answer.create_user_answer, {
+            'body': json.dumps({
+                **path,
+                'questionId': question['questionId'],
+                'userAnswer': random.choice(question['options'])
+            })
+        }, 201)
+        moved = recorder.call('move_to_next_question', attempt.move_to_next_question, {
+            'body': json.dumps(path)
+        }, 200)
+        if moved.get('message') == 'Quiz completed':
+            break
+
+    recorder.call('get_user_answers', answer.get_user_answers, {
+        'pathParameters': path
+    }, 200)
+
+
+def run(dynamodb, students, question_count, workers, think_seconds, output):
+    table = ensure_table(
+        dynamodb, indexes=('UserAttemptsIndex', 'AttemptIdIndex', 'QuizAttemptsIndex'))
+    client = use_resource(dynamodb)
+    question_cache.clear()
+    quiz_id = seed_quiz(table, question_count)
+
+    recorder = Recorder(dynamodb.meta.client, client)
+    workers = min(workers or students, students)
+    # Only the first wave of students can meet at the barrier
+    barrier = threading.Barrier(workers)
+    failed_students = []
+
+    def student(number):
+        try:
+            take_quiz(recorder, quiz_id, number,
+                      barrier if number < workers else None, think_seconds)
+        except StudentFailed as e:
+            failed_students.append(str(e))
+
+    # The handlers log every step, which would drown the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(student, range(students)))
+        wall_seconds = time.perf_counter() - start
+
+    completed = students - len(failed_students)
+    requests = sum(len(samples) for samples in recorder.samples.values())
+    calls_by_operation = Counter()
+    for operations in recorder.calls.values():
+        calls_by_operation.update(operations)
+
+    report = {
+        'students': students,
+        'questions': question_count,
+        'workers': workers,
+        'completedQuizzes': completed,
+        'wallSeconds': wall_seconds,
+        'requests': requests,
+        'requestsPerSecond': requests / wall_seconds,
+        'quizzesPerSecond': completed / wall_seconds,
+        'handlers': {
+            handler_name: {
+                'requests': len(recorder.samples[handler_name]),
+                'failures': recorder.failures[handler_name],
+                **latency_summary(recorder.samples[handler_name]),
+                'dynamodbCallsPerRequest': (
+                    sum(recorder.calls[handler_name].values())
+                    / max(len(recorder.samples[handler_name]), 1))
+            }
+            for handler_name in HANDLER_NAMES
+        },
+        'dynamodbCallsPerStudentQuiz': sum(calls_by_operation.values()) / students,
+        'dynamodbCallsPerStudentQuizByOperation': {
+            operation: count / students for operation, count in sorted(calls_by_operation.items())
+        }
+    }
+
+    print(f"{students} students, {question_count} questions, {workers} concurrent")
+    print(f"{wall_seconds:.1f} s, {requests} requests, {report['requestsPerSecond']:.1f} requests/s, "
+          f"{report['quizzesPerSecond']:.2f} quizzes/s, {len(failed_students)} students failed")
+    print()
+    print(f"{'handler':<24} {'requests':>9} {'failures':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'calls/req':>10}")
+    for handler_name, summary in report['handlers'].items():
+        print(f"{handler_name:<24} {summary['requests']:>9} {summary['failures']:>9} "
+              f"{summary['p50']:>8.1f} {summary['p95']:>8.1f} {summary['p99']:>8.1f} "
+              f"{summary['max']:>8.1f} {summary['dynamodbCallsPerRequest']:>10.2f}")
+    print()
+    print(f"DynamoDB calls per student-quiz: {report['dynamodbCallsPerStudentQuiz']:.1f}")
+    for operation, count in report['dynamodbCallsPerStudentQuizByOperation'].items():
+        print(f"  {operation:<22} {count:>8.1f}")
+    for message in failed_students[:5]:
+        print(f"failed: {message}")
+
+    if output:
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Simulate a classroom of students taking the same quiz at once')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--workers', type=int,
+                        help='students answering at the same time (default: all of them)')
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='average time a student spends on a question')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+    run(connect(args.endpoint), args.students, args.questions, args.workers,
+        args.think_ms / 1000, args.output)
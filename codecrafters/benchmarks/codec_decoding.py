@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+import uuid
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+import codec
+from db import convert_decimal
+
+# Micro-benchmark of turning query results into a JSON response body: the
+# resource layer's TypeDeserializer followed by convert_decimal, against a
+# single pass through codec.py. Runs offline on generated wire-format items.
+
+
+def attempt_items(count, question_count):
+    question_ids = [str(uuid.uuid4()) for _ in range(question_count)]
+    user_id = str(uuid.uuid4())
+    quiz_id = str(uuid.uuid4())
+    return [{
+        'PK': f"USER#{user_id}#QUIZ#{quiz_id}",
+        'SK': f"ATTEMPT#{uuid.uuid4()}",
+        'userId': user_id,
+        'quizId': quiz_id,
+        'questionOrder': question_ids,
+        'currentQuestionId': question_ids[-1],
+        'progress': question_count - 1,
+        'score': 100 * (number % question_count),
+        'dateStarted': '2024-01-01 09:00:00.000000',
+        'dateFinished': '2024-01-01 09:05:00.000000'
+    } for number in range(count)]
+
+
+def answer_items(count):
+    attempt_pk = f"USER#{uuid.uuid4()}#QUIZ#{uuid.uuid4()}#ATTEMPT#{uuid.uuid4()}"
+    return [{
+        'PK': attempt_pk,
+        'SK': f"QUESTION#{uuid.uuid4()}",
+        # Some questions accept several options
+        'userAnswer': ['a', 'c'] if number % 3 == 0 else 'a',
+        'status': 'pass' if number % 2 else 'fail',
+        'questionText': f"Which keyword is used for question {number}?",
+        'correctAnswer': 'a'
+    } for number in range(count)]
+
+
+def resource_path(wire_items, deserializer):
+    items = [{key: deserializer.deserialize(value) for key, value in item.items()}
+             for item in wire_items]
+    return json.dumps(convert_decimal(items))
+
+
+def codec_path(wire_items):
+    return json.dumps(codec.deserialize_items(wire_items))
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(item_counts, question_count, repeat):
+    serializer = TypeSerializer()
+    deserializer = TypeDeserializer()
+
+    print(f"{'payload':<10} {'items':>6} {'resource ms':>12} {'codec ms':>9} {'speedup':>8}")
+    for count in item_counts:
+        for name, items in (('attempts', attempt_items(count, question_count)),
+                            ('answers', answer_items(count))):
+            wire_items = [{key: serializer.serialize(value) for key, value in item.items()}
+                          for item in items]
+
+            # Both paths must produce the same response body
+            assert json.loads(resource_path(wire_items, deserializer)) == json.loads(codec_path(wire_items))
+
+            resource_seconds = best_of(lambda: resource_path(wire_items, deserializer), repeat)
+            codec_seconds = best_of(lambda: codec_path(wire_items), repeat)
+
+            print(f"{name:<10} {count:>6} {resource_seconds * 1000:>12.2f} "
+                  f"{codec_seconds * 1000:>9.2f} {resource_seconds / codec_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare resource-layer decoding plus convert_decimal with codec.py')
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--questions', type=int, default=40,
+                        help='length of each attempt\'s questionOrder')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.items, args.questions, args.repeat)
@@ -0,0 +1,96 @@
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Cold start cost per handler: every run starts a fresh Python process (like a
+# new Lambda container), imports the handler module, then calls the handler
+# twice. The first call includes building the shared DynamoDB client, the
+# second shows the warm cost for comparison.
+#
+# The child process must not import boto3 before it starts timing, so
+# benchmarks.common is only imported by the parent.
+
+MISSING = 'cold-start-benchmark'
+
+HANDLERS = [
+    ('quiz.get_quiz_by_id', {'pathParameters': {'quizId': MISSING}}),
+    ('question.get_questions_by_quiz', {'pathParameters': {'quizId': MISSING}}),
+    ('user.get_user_by_id', {'pathParameters': {'userId': MISSING}}),
+    ('attempt.get_user_attempt', {'pathParameters': {
+        'userId': MISSING, 'quizId': MISSING, 'attemptId': MISSING}}),
+    ('answer.get_user_answers', {'pathParameters': {
+        'userId': MISSING, 'quizId': MISSING, 'attemptId': MISSING}}),
+    ('stats.get_question_stats', {'pathParameters': {'quizId': MISSING}}),
+    ('leaderboard.get_leaderboard', {'pathParameters': {'quizId': MISSING}})
+]
+
+
+def measure_in_this_process(handler_path, event):
+    module_name, function_name = handler_path.rsplit('.', 1)
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    handler = getattr(module, function_name)
+    handler(event, None)
+    first_call = time.perf_counter()
+    handler(event, None)
+    second_call = time.perf_counter()
+
+    return {
+        'importMs': (imported - start) * 1000,
+        'firstCallMs': (first_call - imported) * 1000,
+        'warmCallMs': (second_call - first_call) * 1000
+    }
+
+
+def measure_cold(handler_path, event, endpoint):
+    # The child process only prints the timings, handler output goes to stderr
+    child = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.cold_start', '--child', handler_path,
+         '--event', json.dumps(event)],
+        env={**os.environ, 'DYNAMODB_ENDPOINT': endpoint},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def run(endpoint, runs):
+    from benchmarks.common import connect, ensure_table, percentile
+
+    ensure_table(connect(endpoint))
+
+    print(f"{'handler':<32} {'import ms':>10} {'first call ms':>14} {'warm call ms':>13} {'total p50':>10}")
+    for handler_path, event in HANDLERS:
+        samples = [measure_cold(handler_path, event, endpoint) for _ in range(runs)]
+        imports = [sample['importMs'] for sample in samples]
+        first_calls = [sample['firstCallMs'] for sample in samples]
+        warm_calls = [sample['warmCallMs'] for sample in samples]
+        totals = [sample['importMs'] + sample['firstCallMs'] for sample in samples]
+
+        print(f"{handler_path:<32} {percentile(imports, 50):>10.1f} {percentile(first_calls, 50):>14.1f} "
+              f"{percentile(warm_calls, 50):>13.1f} {percentile(totals, 50):>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure import and first-call latency of each handler in a fresh process')
+    parser.add_argument('--endpoint', default='http://localhost:8000')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--event', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        timings = measure_in_this_process(args.child, json.loads(args.event))
+        print(json.dumps(timings), file=stdout)
+    else:
+        run(args.endpoint, args.runs)
@@ -0,0 +1,202 @@
+import os
+import time
+from collections import Counter
+
+# Shared setup for the benchmarks. They run against DynamoDB Local
+# (docker run -p 8000:8000 amazon/dynamodb-local -jar DynamoDBLocal.jar -inMemory -sharedDb)
+# so they never touch the real table, or against the in-process stand-in in
+# benchmarks/memory_dynamodb.py with --endpoint memory. Run them from the
+# codecrafters directory, e.g.
+#   python -m benchmarks.answer_hydration --endpoint http://localhost:8000
+#   python -m benchmarks.classroom --endpoint memory
+
+DEFAULT_ENDPOINT = 'http://localhost:8000'
+
+# DynamoDB Local accepts any credentials, but boto3 still needs some to sign requests
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-north-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+# Keep the handlers' per-invocation metric log lines out of the reports
+os.environ.setdefault('DYNAMODB_METRICS_SAMPLE_RATE', '0')
+
+import boto3  # noqa: E402
+import db  # noqa: E402
+from benchmarks.memory_dynamodb import MEMORY_ENDPOINT, MemoryDynamoDB  # noqa: E402
+
+
+def connect(endpoint):
+    if endpoint == MEMORY_ENDPOINT:
+        return MemoryDynamoDB().resource()
+    return boto3.resource('dynamodb', endpoint_url=endpoint)
+
+
+# Index definitions from serverless.yml that benchmarks can ask ensure_table for
+INDEXES = {
+    'UserNameIndex': {
+        'keys': [('userName', 'HASH'), ('SK', 'RANGE')],
+        'projection': {'ProjectionType': 'ALL'}
+    },
+    'UserRoleIndex': {
+        'keys': [('userRole', 'HASH'), ('userName', 'RANGE')],
+        'projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['fullName', 'email', 'role']}
+    },
+    'VisibleQuizIndex': {
+        'keys': [('quizCatalog', 'HASH'), ('title', 'RANGE')],
+        'projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['description']}
+    },
+    'UserAttemptsIndex': {
+        'keys': [('userId', 'HASH'), ('quizId', 'RANGE')],
+        'projection': {'ProjectionType': 'ALL'}
+    },
+    'AttemptIdIndex': {
+        'keys': [('attemptId', 'HASH')],
+        'projection': {
+            'ProjectionType': 'INCLUDE',
+            'NonKeyAttributes': ['userId', 'quizId', 'dateStarted', 'dateFinished', 'score']
+        }
+    },
+    'CompletedAttemptsIndex': {
+        'keys': [('completedBy', 'HASH'), ('completedAt', 'RANGE')],
+        'projection': {
+            'ProjectionType': 'INCLUDE',
+            'NonKeyAttributes': [
+                'userId', 'quizId', 'score', 'progress', 'dateStarted', 'dateFinished',
+                'currentQuestionId', 'timeTakenSeconds'
+            ]
+        }
+    },
+    'QuizAttemptsIndex': {
+        'keys': [('quizId', 'HASH'), ('SK', 'RANGE')],
+        'projection': {
+            'ProjectionType': 'INCLUDE',
+            'NonKeyAttributes': ['userId', 'score', 'progress', 'dateStarted', 'dateFinished']
+        }
+    }
+}
+
+
+def ensure_table(dynamodb, table_name='QuizTable', indexes=()):
+    # Indexes are only added when the table is created
+    existing = dynamodb.meta.client.list_tables()['TableNames']
+    if table_name not in existing:
+        attributes = {'PK', 'SK'}
+        create_kwargs = {}
+        if indexes:
+            create_kwargs['GlobalSecondaryIndexes'] = []
+            for index_name in indexes:
+                index = INDEXES[index_name]
+                attributes.update(name for name, _ in index['keys'])
+                create_kwargs['GlobalSecondaryIndexes'].append({
+                    'IndexName': index_name,
+                    'KeySchema': [
+                        {'AttributeName': name, 'KeyType': key_type}
+                        for name, key_type in index['keys']
+                    ],
+                    'Projection': index['projection']
+                })
+
+        dynamodb.create_table(
+            TableName=table_name,
+            AttributeDefinitions=[
+                {'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)
+            ],
+            KeySchema=[
+                {'AttributeName': 'PK', 'KeyType': 'HASH'},
+                {'AttributeName': 'SK', 'KeyType': 'RANGE'}
+            ],
+            BillingMode='PAY_PER_REQUEST',
+            **create_kwargs
+        )
+    return dynamodb.Table(table_name)
+
+
+def use_resource(dynamodb):
+    # Point every handler module at the benchmark's resource, plus a low-level
+    # client for the same endpoint, which is returned for call counting
+    database = getattr(dynamodb, 'database', None)
+    if database is not None:
+        client = database.client()
+    else:
+        client = boto3.client(
+            'dynamodb',
+            endpoint_url=dynamodb.meta.client.meta.endpoint_url,
+            region_name=dynamodb.meta.client.meta.region_name,
+            config=db.CLIENT_CONFIG
+        )
+    db.configure(resource=dynamodb, client=client)
+    return client
+
+
+class CallCounter:
+    # Counts DynamoDB API calls made through clients, by operation name
+
+    def __init__(self, *clients):
+        self.calls = Counter()
+        for client in clients:
+            client.meta.events.register('before-call.dynamodb', self._count)
+
+    def _count(self, model, **kwargs):
+        self.calls[model.name] += 1
+
+    def reset(self):
+        self.calls.clear()
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+
+class ReadMeter:
+    # Measurement mode: asks DynamoDB to report consumed capacity on every read
+    # made through the clients and adds up capacity units and response bytes
+
+    READ_OPERATIONS = {'GetItem', 'Query', 'Scan', 'BatchGetItem'}
+
+    def __init__(self, *clients):
+        self.read_capacity_units = 0.0
+        self.response_bytes = 0
+        for client in clients:
+            client.meta.events.register('before-parameter-build.dynamodb', self._request_capacity)
+            client.meta.events.register('after-call.dynamodb', self._measure)
+
+    def _request_capacity(self, params, model, **kwargs):
+        if model.name in self.READ_OPERATIONS:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    def _measure(self, http_response, parsed, model, **kwargs):
+        if model.name not in self.READ_OPERATIONS:
+            return
+
+        consumed = parsed.get('ConsumedCapacity') or []
+        # BatchGetItem reports a list, one entry per table
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        self.read_capacity_units += sum(entry.get('CapacityUnits', 0) for entry in consumed)
+        self.response_bytes += len(http_response.content or b'')
+
+    def reset(self):
+        self.read_capacity_units = 0.0
+        self.response_bytes = 0
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(samples):
+    return {
+        'p50': percentile(samples, 50) * 1000,
+        'p95': percentile(samples, 95) * 1000,
+        'p99': percentile(samples, 99) * 1000,
+        'max': max(samples) * 1000 if samples else 0.0
+    }
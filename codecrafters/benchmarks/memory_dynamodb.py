@@ -0,0 +1,2259 @@
+import base64
+import bisect
+import json
+import math
+import re
+import threading
+import zlib
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from types import SimpleNamespace
+
+import botocore.session
+from botocore.errorfactory import ClientExceptionsFactory
+from botocore.hooks import HierarchicalEmitter
+from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+# In-process stand-in for DynamoDB, for benchmarks and local experiments that
+# should run without AWS or DynamoDB Local.
+#
+# Tables are dicts of partitions, each keeping its items sorted by sort key,
+# and global secondary indexes are kept up to date on every write. It covers
+# the part of DynamoDB this project uses: GetItem, PutItem, UpdateItem,
+# DeleteItem, Query and Scan (with indexes, filters, projections, Limit,
+# segments and pagination), BatchGetItem, BatchWriteItem, TransactWriteItems,
+# TransactGetItems and the table calls the benchmarks make. Condition, key,
+# filter, update and projection expressions are parsed like DynamoDB does,
+# including the checks for unused or undefined expression attribute names and
+# values. Query and Scan pages stop at 1 MB, BatchGetItem at 16 MB, and every
+# request is charged read or write capacity units from the size of the items
+# it touched, reported through ReturnConsumedCapacity and added up in
+# MemoryDynamoDB.consumed.
+#
+# resource() and client() behave like boto3's DynamoDB resource (Python values,
+# Decimal numbers, condition objects, batch_writer) and low-level client (wire
+# format). Both emit botocore's before-parameter-build, before-call and
+# after-call events, so benchmarks.common.CallCounter and ReadMeter work
+# unchanged. install() points every handler module at a fresh database:
+#
+#   database = MemoryDynamoDB()
+#   ensure_table(database.install(), indexes=INDEXES)
+#
+# or pass --endpoint memory to a benchmark.
+
+MEMORY_ENDPOINT = 'memory'
+
+PAGE_SIZE_LIMIT = 1024 * 1024
+BATCH_GET_SIZE_LIMIT = 16 * 1024 * 1024
+ITEM_SIZE_LIMIT = 400 * 1024
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+TRANSACTION_LIMIT = 100
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+EXPRESSION_CACHE_SIZE = 2048
+
+
+class DynamoDBError(Exception):
+    # Turned into a botocore ClientError by MemoryClient. extra holds
+    # additional top-level response fields such as CancellationReasons.
+
+    def __init__(self, code, message, **extra):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.extra = extra
+
+
+def validation_error(message):
+    return DynamoDBError('ValidationException', message)
+
+
+# Attribute values
+
+def _number(text):
+    try:
+        number = Decimal(text)
+    except (InvalidOperation, TypeError):
+        raise validation_error(f"A value provided cannot be converted into a number: {text!r}")
+    if not number.is_finite():
+        raise validation_error(f"A value provided cannot be converted into a number: {text!r}")
+    return number
+
+
+def _number_text(number):
+    # DynamoDB hands numbers back without exponent or trailing zeros
+    if not number:
+        return '0'
+    return format(number.normalize(), 'f')
+
+
+def canonical_value(value):
+    # Copy of a wire attribute value with numbers normalised
+    for type_name, data in value.items():
+        if type_name == 'S':
+            return {'S': data}
+        if type_name == 'N':
+            return {'N': _number_text(_number(data))}
+        if type_name == 'M':
+            return {'M': {key: canonical_value(item) for key, item in data.items()}}
+        if type_name == 'L':
+            return {'L': [canonical_value(item) for item in data]}
+        if type_name in ('SS', 'NS', 'BS') and not data:
+            raise validation_error(
+                'One or more parameter values were invalid: An AttributeValue may not contain an empty set.')
+        if type_name == 'NS':
+            numbers = {_number_text(_number(item)) for item in data}
+            if len(numbers) != len(data):
+                raise validation_error('Input collection contains duplicates')
+            return {'NS': sorted(numbers)}
+        if type_name in ('SS', 'BS'):
+            if len(set(data)) != len(data):
+                raise validation_error('Input collection contains duplicates')
+            return {type_name: list(data)}
+        if type_name in ('B', 'BOOL', 'NULL'):
+            return {type_name: data}
+        raise validation_error(f"Unsupported attribute value type: {type_name}")
+    raise validation_error('Supplied AttributeValue is empty, must contain exactly one of the supported datatypes')
+
+
+def canonical_item(item):
+    return {name: canonical_value(value) for name, value in item.items()}
+
+
+def _plain(value):
+    # Hashable Python form of a wire value, used for equality
+    for type_name, data in value.items():
+        if type_name == 'N':
+            return ('N', Decimal(data))
+        if type_name == 'SS' or type_name == 'BS':
+            return (type_name, frozenset(data))
+        if type_name == 'NS':
+            return ('NS', frozenset(Decimal(item) for item in data))
+        if type_name == 'L':
+            return ('L', tuple(_plain(item) for item in data))
+        if type_name == 'M':
+            return ('M', frozenset((key, _plain(item)) for key, item in data.items()))
+        return (type_name, data)
+
+
+def _equal(left, right):
+    if left is None or right is None:
+        return False
+    if 'S' in left and 'S' in right:
+        return left['S'] == right['S']
+    return _plain(left) == _plain(right)
+
+
+def _ordered(left, right):
+    # Both values as comparable Python values, or None when they cannot be ordered
+    if left is None or right is None:
+        return None
+    for left_type, left_data in left.items():
+        for right_type, right_data in right.items():
+            if left_type != right_type:
+                return None
+            if left_type == 'S' or left_type == 'B':
+                return left_data, right_data
+            if left_type == 'N':
+                return Decimal(left_data), Decimal(right_data)
+    return None
+
+
+def key_value(value):
+    # Sortable Python value of a key attribute
+    if 'S' in value:
+        return value['S']
+    if 'N' in value:
+        return Decimal(value['N'])
+    return bytes(value['B'])
+
+
+def _number_size(text):
+    digits = text.lstrip('-').replace('.', '').strip('0')
+    return (len(digits) + 1) // 2 + 1
+
+
+def _text_size(text):
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def value_size(value):
+    for type_name, data in value.items():
+        if type_name == 'S':
+            return _text_size(data)
+        if type_name == 'N':
+            return _number_size(data)
+        if type_name == 'B':
+            return len(data)
+        if type_name == 'BOOL' or type_name == 'NULL':
+            return 1
+        if type_name == 'SS':
+            return sum(_text_size(item) for item in data)
+        if type_name == 'NS':
+            return sum(_number_size(item) for item in data)
+        if type_name == 'BS':
+            return sum(len(item) for item in data)
+        if type_name == 'L':
+            return 3 + sum(1 + value_size(item) for item in data)
+        if type_name == 'M':
+            return 3 + sum(1 + _text_size(key) + value_size(item) for key, item in data.items())
+    return 0
+
+
+def item_size(item):
+    return sum(_text_size(name) + value_size(value) for name, value in item.items())
+
+
+def _read_units(size, consistent=False):
+    units = max(1, math.ceil(size / READ_UNIT_BYTES))
+    return float(units) if consistent else units / 2
+
+
+def _write_units(size):
+    return float(max(1, math.ceil(size / WRITE_UNIT_BYTES)))
+
+
+# Expressions
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<name>\#[A-Za-z0-9_]+) |
+        (?P<value>:[A-Za-z0-9_]+) |
+        (?P<number>[0-9]+) |
+        (?P<word>[A-Za-z_][A-Za-z0-9_]*) |
+        (?P<op><>|<=|>=|[=<>(),.\[\]+-])
+    )""", re.VERBOSE)
+
+COMPARATORS = ('=', '<>', '<', '<=', '>', '>=')
+CONDITION_FUNCTIONS = {
+    'attribute_exists': 1, 'attribute_not_exists': 1, 'attribute_type': 2,
+    'begins_with': 2, 'contains': 2
+}
+UPDATE_SECTIONS = ('SET', 'REMOVE', 'ADD', 'DELETE')
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    length = len(expression)
+    while position < length:
+        if expression[position:].strip() == '':
+            break
+        match = _TOKEN.match(expression, position)
+        if not match or match.end() == position:
+            raise validation_error(
+                f"Invalid expression: Syntax error; token: \"{expression[position:].strip()[:1]}\", "
+                f"near: \"{expression[max(position - 5, 0):position + 5].strip()}\"")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    # Recursive descent parser producing tuples:
+    #   ('path', elements)  elements are names, '#refs' and list indexes
+    #   ('value', ':ref'), ('size', path), ('if_not_exists', path, operand),
+    #   ('list_append', a, b), ('+', a, b), ('-', a, b)
+    #   ('compare', op, a, b), ('between', a, low, high), ('in', a, options),
+    #   ('function', name, args), ('and', a, b), ('or', a, b), ('not', a)
+
+    def __init__(self, expression, kind):
+        if not expression or not expression.strip():
+            raise validation_error(f"Invalid {kind}: The expression can not be empty;")
+        self.expression = expression
+        self.kind = kind
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def error(self, message=None):
+        token = self.peek()[1]
+        detail = message or f"Syntax error; token: \"{token if token is not None else '<EOF>'}\""
+        return validation_error(f"Invalid {self.kind}: {detail}")
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise self.error()
+        self.position += 1
+        return token
+
+    def at_end(self):
+        return self.position >= len(self.tokens)
+
+    def accept_op(self, text):
+        if self.peek() == ('op', text):
+            self.position += 1
+            return True
+        return False
+
+    def expect_op(self, text):
+        if not self.accept_op(text):
+            raise self.error()
+
+    def peek_keyword(self, word, offset=0):
+        kind, text = self.peek(offset)
+        return kind == 'word' and text.upper() == word
+
+    def accept_keyword(self, word):
+        if self.peek_keyword(word):
+            self.position += 1
+            return True
+        return False
+
+    def finish(self, node):
+        if not self.at_end():
+            raise self.error()
+        return node
+
+    # Operands
+
+    def path(self):
+        elements = [self.path_element()]
+        while True:
+            if self.accept_op('.'):
+                elements.append(self.path_element())
+            elif self.accept_op('['):
+                kind, text = self.next()
+                if kind != 'number':
+                    raise self.error()
+                elements.append(int(text))
+                self.expect_op(']')
+            else:
+                return ('path', tuple(elements))
+
+    def path_element(self):
+        kind, text = self.next()
+        if kind not in ('name', 'word'):
+            raise self.error()
+        return text
+
+    def is_function(self):
+        return self.peek()[0] == 'word' and self.peek(1) == ('op', '(')
+
+    def operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return ('value', text)
+        if self.is_function():
+            if text.lower() != 'size':
+                raise self.error(f"Invalid function name; function: {text}")
+            self.position += 2
+            path = self.path()
+            self.expect_op(')')
+            return ('size', path)
+        return self.path()
+
+    # Conditions
+
+    def condition(self):
+        node = self.conjunction()
+        while self.accept_keyword('OR'):
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.accept_keyword('AND'):
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.accept_keyword('NOT'):
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        if self.accept_op('('):
+            node = self.condition()
+            self.expect_op(')')
+            return node
+
+        if self.is_function() and self.peek()[1].lower() in CONDITION_FUNCTIONS:
+            name = self.next()[1].lower()
+            self.expect_op('(')
+            args = [self.operand()]
+            while self.accept_op(','):
+                args.append(self.operand())
+            self.expect_op(')')
+            if len(args) != CONDITION_FUNCTIONS[name]:
+                raise self.error(f"Incorrect number of operands for operator or function; operator or function: {name}, number of operands: {len(args)}")
+            if args[0][0] != 'path':
+                raise self.error(f"Operator or function requires a document path; operator or function: {name}")
+            return ('function', name, tuple(args))
+
+        left = self.operand()
+        if self.accept_keyword('BETWEEN'):
+            low = self.operand()
+            if not self.accept_keyword('AND'):
+                raise self.error()
+            return ('between', left, low, self.operand())
+        if self.accept_keyword('IN'):
+            self.expect_op('(')
+            options = [self.operand()]
+            while self.accept_op(','):
+                options.append(self.operand())
+            self.expect_op(')')
+            return ('in', left, tuple(options))
+
+        kind, text = self.next()
+        if kind != 'op' or text not in COMPARATORS:
+            self.position -= 1
+            raise self.error()
+        return ('compare', text, left, self.operand())
+
+    # Update expressions
+
+    def update(self):
+        sections = {}
+        while not self.at_end():
+            kind, text = self.next()
+            section = text.upper() if kind == 'word' else None
+            if section not in UPDATE_SECTIONS:
+                self.position -= 1
+                raise self.error()
+            if section in sections:
+                raise self.error(f"The \"{section}\" section can only be used once in an update expression;")
+
+            actions = []
+            while True:
+                path = self.path()
+                if section == 'SET':
+                    self.expect_op('=')
+                    actions.append((path, self.set_value()))
+                elif section == 'REMOVE':
+                    actions.append(path)
+                else:
+                    kind, text = self.next()
+                    if kind != 'value':
+                        self.position -= 1
+                        raise self.error()
+                    actions.append((path, ('value', text)))
+                if not self.accept_op(','):
+                    break
+            sections[section] = actions
+        return sections
+
+    def set_value(self):
+        left = self.set_operand()
+        if self.accept_op('+'):
+            return ('+', left, self.set_operand())
+        if self.accept_op('-'):
+            return ('-', left, self.set_operand())
+        return left
+
+    def set_operand(self):
+        kind, text = self.peek()
+        if kind == 'value':
+            self.position += 1
+            return ('value', text)
+        if self.is_function():
+            name = text.lower()
+            self.position += 2
+            if name == 'if_not_exists':
+                path = self.path()
+                self.expect_op(',')
+                fallback = self.set_operand()
+                self.expect_op(')')
+                return ('if_not_exists', path, fallback)
+            if name == 'list_append':
+                first = self.set_operand()
+                self.expect_op(',')
+                second = self.set_operand()
+                self.expect_op(')')
+                return ('list_append', first, second)
+            raise self.error(f"Invalid function name; function: {text}")
+        return self.path()
+
+    # Projection expressions
+
+    def projection(self):
+        paths = [self.path()]
+        while self.accept_op(','):
+            paths.append(self.path())
+        return paths
+
+
+def _references(node, names, values):
+    # Collects the #names and :values an expression tree uses
+    if isinstance(node, dict):
+        for actions in node.values():
+            _references(actions, names, values)
+    elif isinstance(node, (list, tuple)):
+        if node and node[0] == 'path':
+            names.update(element for element in node[1]
+                         if isinstance(element, str) and element.startswith('#'))
+        elif node and node[0] == 'value':
+            values.add(node[1])
+        else:
+            for child in node:
+                if isinstance(child, (list, tuple, dict)):
+                    _references(child, names, values)
+
+
+class Expression:
+    # A parsed expression with the attribute names and values it refers to
+
+    def __init__(self, tree, evaluate=None):
+        self.tree = tree
+        self.evaluate = evaluate
+        self.names = set()
+        self.values = set()
+        _references(tree, self.names, self.values)
+
+
+_expression_cache = {}
+_expression_cache_lock = threading.Lock()
+
+
+def parse_expression(expression, kind):
+    # kind: 'condition', 'key', 'update' or 'projection'
+    cache_key = (kind, expression)
+    parsed = _expression_cache.get(cache_key)
+    if parsed is not None:
+        return parsed
+
+    label = {
+        'condition': 'ConditionExpression',
+        'key': 'KeyConditionExpression',
+        'update': 'UpdateExpression',
+        'projection': 'ProjectionExpression'
+    }[kind]
+    parser = _Parser(expression, label)
+    if kind == 'update':
+        parsed = Expression(parser.finish(parser.update()))
+    elif kind == 'projection':
+        parsed = Expression(parser.finish(parser.projection()))
+    else:
+        tree = parser.finish(parser.condition())
+        parsed = Expression(tree, _compile_condition(tree))
+
+    with _expression_cache_lock:
+        if len(_expression_cache) >= EXPRESSION_CACHE_SIZE:
+            _expression_cache.clear()
+        _expression_cache[cache_key] = parsed
+    return parsed
+
+
+class ExpressionContext:
+    # Parses the expressions of one request and checks its
+    # ExpressionAttributeNames and ExpressionAttributeValues against them
+
+    def __init__(self, params):
+        self.names = params.get('ExpressionAttributeNames')
+        self.values = params.get('ExpressionAttributeValues')
+        if self.names is not None and not self.names:
+            raise validation_error('ExpressionAttributeNames must not be empty')
+        if self.values is not None and not self.values:
+            raise validation_error('ExpressionAttributeValues must not be empty')
+        self.names = self.names or {}
+        self.values = self.values or {}
+        self.used_names = set()
+        self.used_values = set()
+
+    def parse(self, expression, kind):
+        if expression is None:
+            return None
+        if not isinstance(expression, str):
+            raise validation_error(f"Invalid {kind} expression")
+        parsed = parse_expression(expression, kind)
+        for name in parsed.names:
+            if name not in self.names:
+                raise validation_error(
+                    f"An expression attribute name used in the document path is not defined; attribute name: {name}")
+        for value in parsed.values:
+            if value not in self.values:
+                raise validation_error(
+                    f"An expression attribute value used in expression is not defined; attribute value: {value}")
+        self.used_names |= parsed.names
+        self.used_values |= parsed.values
+        return parsed
+
+    def check_unused(self):
+        unused_names = set(self.names) - self.used_names
+        if unused_names:
+            raise validation_error(
+                f"Value provided in ExpressionAttributeNames unused in expressions: keys: {{{', '.join(sorted(unused_names))}}}")
+        unused_values = set(self.values) - self.used_values
+        if unused_values:
+            raise validation_error(
+                f"Value provided in ExpressionAttributeValues unused in expressions: keys: {{{', '.join(sorted(unused_values))}}}")
+
+    def resolve(self, path):
+        # Path elements with #refs replaced by attribute names
+        return tuple(self.names[element] if isinstance(element, str) and element.startswith('#') else element
+                     for element in path[1])
+
+
+def _resolve(path, names):
+    return tuple(names[element] if isinstance(element, str) and element.startswith('#') else element
+                 for element in path[1])
+
+
+def get_path(item, elements):
+    value = item.get(elements[0])
+    for element in elements[1:]:
+        if value is None:
+            return None
+        if isinstance(element, int):
+            items = value.get('L')
+            value = items[element] if items is not None and element < len(items) else None
+        else:
+            attributes = value.get('M')
+            value = attributes.get(element) if attributes is not None else None
+    return value
+
+
+def _compile_operand(node):
+    kind = node[0]
+    if kind == 'value':
+        reference = node[1]
+        return lambda item, names, values: values[reference]
+    if kind == 'path':
+        elements = node[1]
+        if len(elements) == 1 and not elements[0].startswith('#'):
+            name = elements[0]
+            return lambda item, names, values: item.get(name)
+        return lambda item, names, values: get_path(item, _resolve(node, names))
+    if kind == 'size':
+        target = _compile_operand(node[1])
+
+        def size(item, names, values):
+            value = target(item, names, values)
+            if value is None:
+                return None
+            for type_name, data in value.items():
+                if type_name in ('S', 'B', 'SS', 'NS', 'BS', 'L', 'M'):
+                    return {'N': str(len(data))}
+            return None
+        return size
+    raise validation_error(f"Invalid operand: {kind}")
+
+
+def _compare(operator, left, right):
+    if operator == '=':
+        return _equal(left, right)
+    if operator == '<>':
+        return not _equal(left, right)
+    pair = _ordered(left, right)
+    if pair is None:
+        return False
+    first, second = pair
+    if operator == '<':
+        return first < second
+    if operator == '<=':
+        return first <= second
+    if operator == '>':
+        return first > second
+    return first >= second
+
+
+def _begins_with(value, prefix):
+    if value is None or prefix is None:
+        return False
+    if 'S' in value and 'S' in prefix:
+        return value['S'].startswith(prefix['S'])
+    if 'B' in value and 'B' in prefix:
+        return bytes(value['B']).startswith(bytes(prefix['B']))
+    return False
+
+
+def _contains(value, operand):
+    if value is None or operand is None:
+        return False
+    if 'S' in value and 'S' in operand:
+        return operand['S'] in value['S']
+    if 'B' in value and 'B' in operand:
+        return bytes(operand['B']) in bytes(value['B'])
+    if 'SS' in value and 'S' in operand:
+        return operand['S'] in value['SS']
+    if 'NS' in value and 'N' in operand:
+        return Decimal(operand['N']) in {Decimal(item) for item in value['NS']}
+    if 'BS' in value and 'B' in operand:
+        return bytes(operand['B']) in {bytes(item) for item in value['BS']}
+    if 'L' in value:
+        return any(_equal(item, operand) for item in value['L'])
+    return False
+
+
+def _compile_condition(node):
+    kind = node[0]
+    if kind == 'and':
+        left, right = _compile_condition(node[1]), _compile_condition(node[2])
+        return lambda item, names, values: left(item, names, values) and right(item, names, values)
+    if kind == 'or':
+        left, right = _compile_condition(node[1]), _compile_condition(node[2])
+        return lambda item, names, values: left(item, names, values) or right(item, names, values)
+    if kind == 'not':
+        inner = _compile_condition(node[1])
+        return lambda item, names, values: not inner(item, names, values)
+    if kind == 'compare':
+        operator = node[1]
+        left, right = _compile_operand(node[2]), _compile_operand(node[3])
+        if operator == '=':
+            return lambda item, names, values: _equal(left(item, names, values), right(item, names, values))
+        return lambda item, names, values: _compare(operator, left(item, names, values), right(item, names, values))
+    if kind == 'between':
+        target, low, high = (_compile_operand(operand) for operand in node[1:])
+
+        def between(item, names, values):
+            value = target(item, names, values)
+            return (_compare('>=', value, low(item, names, values))
+                    and _compare('<=', value, high(item, names, values)))
+        return between
+    if kind == 'in':
+        target = _compile_operand(node[1])
+        options = [_compile_operand(option) for option in node[2]]
+
+        def is_in(item, names, values):
+            value = target(item, names, values)
+            return any(_equal(value, option(item, names, values)) for option in options)
+        return is_in
+    if kind == 'function':
+        name = node[1]
+        args = [_compile_operand(arg) for arg in node[2]]
+        if name == 'attribute_exists':
+            return lambda item, names, values: args[0](item, names, values) is not None
+        if name == 'attribute_not_exists':
+            return lambda item, names, values: args[0](item, names, values) is None
+        if name == 'attribute_type':
+            def attribute_type(item, names, values):
+                value = args[0](item, names, values)
+                expected = args[1](item, names, values)
+                return value is not None and expected.get('S') in value
+            return attribute_type
+        if name == 'begins_with':
+            return lambda item, names, values: _begins_with(args[0](item, names, values), args[1](item, names, values))
+        return lambda item, names, values: _contains(args[0](item, names, values), args[1](item, names, values))
+    raise validation_error(f"Invalid condition: {kind}")
+
+
+def project(item, paths):
+    # Keeps only the given resolved document paths of an item
+    result = {}
+    for elements in paths:
+        value = get_path(item, elements)
+        if value is None:
+            continue
+        if len(elements) == 1:
+            result[elements[0]] = value
+            continue
+        _set_projected(result, elements, value)
+    return result
+
+
+def _set_projected(result, elements, value):
+    # Nested projections keep the enclosing maps and lists, lists compacted
+    container = result
+    for position, element in enumerate(elements[:-1]):
+        following = elements[position + 1]
+        empty = {'L': []} if isinstance(following, int) else {'M': {}}
+        if isinstance(element, int):
+            items = container['L']
+            while len(items) <= element:
+                items.append(None)
+            if items[element] is None:
+                items[element] = empty
+            container = items[element]
+        else:
+            attributes = container if position == 0 else container['M']
+            if element not in attributes:
+                attributes[element] = empty
+            container = attributes[element]
+    last = elements[-1]
+    if isinstance(last, int):
+        items = container['L']
+        while len(items) <= last:
+            items.append(None)
+        items[last] = value
+    else:
+        container['M'][last] = value
+    _compact(result)
+
+
+def _compact(value):
+    if isinstance(value, dict):
+        for child in value.values():
+            _compact(child)
+        if 'L' in value and isinstance(value['L'], list):
+            value['L'][:] = [item for item in value['L'] if item is not None]
+
+
+# Update expressions
+
+def _update_operand(node, item, context):
+    kind = node[0]
+    if kind == 'value':
+        return context.values[node[1]]
+    if kind == 'path':
+        value = get_path(item, context.resolve(node))
+        if value is None:
+            raise validation_error(
+                'The provided expression refers to an attribute that does not exist in the item')
+        return value
+    if kind == 'if_not_exists':
+        value = get_path(item, context.resolve(node[1]))
+        return value if value is not None else _update_operand(node[2], item, context)
+    if kind == 'list_append':
+        first = _update_operand(node[1], item, context)
+        second = _update_operand(node[2], item, context)
+        if 'L' not in first or 'L' not in second:
+            raise validation_error(
+                'An operand in the update expression has an incorrect data type')
+        return {'L': first['L'] + second['L']}
+    if kind in ('+', '-'):
+        first = _update_operand(node[1], item, context)
+        second = _update_operand(node[2], item, context)
+        if 'N' not in first or 'N' not in second:
+            raise validation_error(
+                'An operand in the update expression has an incorrect data type')
+        result = Decimal(first['N']) + Decimal(second['N']) if kind == '+' \
+            else Decimal(first['N']) - Decimal(second['N'])
+        return {'N': _number_text(result)}
+    raise validation_error(f"Invalid UpdateExpression operand: {kind}")
+
+
+def _check_overlap(paths):
+    for index, first in enumerate(paths):
+        for second in paths[index + 1:]:
+            shorter = min(len(first), len(second))
+            if first[:shorter] == second[:shorter]:
+                raise validation_error(
+                    f"Invalid UpdateExpression: Two document paths overlap with each other; "
+                    f"must remove or rewrite one of these paths; path one: [{', '.join(map(str, first))}], "
+                    f"path two: [{', '.join(map(str, second))}]")
+
+
+def _set_path(item, elements, value):
+    # Copy-on-write assignment of a nested path
+    if len(elements) == 1:
+        item[elements[0]] = value
+        return
+    parent = item.get(elements[0])
+    item[elements[0]] = _set_nested(parent, elements[1:], value)
+
+
+def _set_nested(container, elements, value):
+    element = elements[0]
+    if container is None:
+        raise validation_error('The document path provided in the update expression is invalid for update')
+    if isinstance(element, int):
+        if 'L' not in container:
+            raise validation_error('The document path provided in the update expression is invalid for update')
+        items = list(container['L'])
+        if len(elements) == 1:
+            if element < len(items):
+                items[element] = value
+            else:
+                items.append(value)
+        else:
+            if element >= len(items):
+                raise validation_error('The document path provided in the update expression is invalid for update')
+            items[element] = _set_nested(items[element], elements[1:], value)
+        return {'L': items}
+
+    if 'M' not in container:
+        raise validation_error('The document path provided in the update expression is invalid for update')
+    attributes = dict(container['M'])
+    if len(elements) == 1:
+        attributes[element] = value
+    else:
+        attributes[element] = _set_nested(attributes.get(element), elements[1:], value)
+    return {'M': attributes}
+
+
+def _remove_path(item, elements):
+    if len(elements) == 1:
+        item.pop(elements[0], None)
+        return
+    parent = item.get(elements[0])
+    if parent is not None:
+        item[elements[0]] = _remove_nested(parent, elements[1:])
+
+
+def _remove_nested(container, elements):
+    element = elements[0]
+    if isinstance(element, int):
+        if 'L' not in container or element >= len(container['L']):
+            return container
+        items = list(container['L'])
+        if len(elements) == 1:
+            del items[element]
+        else:
+            items[element] = _remove_nested(items[element], elements[1:])
+        return {'L': items}
+    if 'M' not in container or element not in container['M']:
+        return container
+    attributes = dict(container['M'])
+    if len(elements) == 1:
+        del attributes[element]
+    else:
+        attributes[element] = _remove_nested(attributes[element], elements[1:])
+    return {'M': attributes}
+
+
+def _add(current, value):
+    if current is None:
+        if 'N' in value or 'SS' in value or 'NS' in value or 'BS' in value:
+            return value
+    elif 'N' in current and 'N' in value:
+        return {'N': _number_text(Decimal(current['N']) + Decimal(value['N']))}
+    else:
+        for set_type in ('SS', 'NS', 'BS'):
+            if set_type in current and set_type in value:
+                merged = list(current[set_type])
+                merged.extend(item for item in value[set_type] if item not in current[set_type])
+                return {set_type: merged}
+    raise validation_error(
+        'Invalid UpdateExpression: Incorrect operand type for operator or function; operator: ADD')
+
+
+def _delete(current, value):
+    for set_type in ('SS', 'NS', 'BS'):
+        if set_type in value:
+            if current is None:
+                return None
+            if set_type not in current:
+                break
+            remaining = [item for item in current[set_type] if item not in value[set_type]]
+            return {set_type: remaining} if remaining else None
+    raise validation_error(
+        'Invalid UpdateExpression: Incorrect operand type for operator or function; operator: DELETE')
+
+
+def apply_update(item, update, context):
+    # Returns (new item, top-level attribute names that were changed).
+    # Every value is worked out from the item as it was before the update.
+    sections = update.tree
+    paths = []
+    assignments = []
+    for path, operand in sections.get('SET', []):
+        elements = context.resolve(path)
+        paths.append(elements)
+        assignments.append((elements, canonical_value(_update_operand(operand, item, context))))
+    removals = [context.resolve(path) for path in sections.get('REMOVE', [])]
+    paths.extend(removals)
+    additions = []
+    for path, operand in sections.get('ADD', []):
+        elements = context.resolve(path)
+        paths.append(elements)
+        additions.append((elements, _add(get_path(item, elements), canonical_value(context.values[operand[1]]))))
+    deletions = []
+    for path, operand in sections.get('DELETE', []):
+        elements = context.resolve(path)
+        paths.append(elements)
+        deletions.append((elements, _delete(get_path(item, elements), canonical_value(context.values[operand[1]]))))
+    _check_overlap(paths)
+
+    new_item = dict(item)
+    for elements, value in assignments + additions:
+        _set_path(new_item, elements, value)
+    for elements, value in deletions:
+        if value is None:
+            _remove_path(new_item, elements)
+        else:
+            _set_path(new_item, elements, value)
+    for elements in sorted(removals, key=lambda elements: [e for e in elements if isinstance(e, int)], reverse=True):
+        _remove_path(new_item, elements)
+
+    return new_item, {elements[0] for elements in paths}
+
+
+# Storage
+
+class _Partition:
+    __slots__ = ('keys', 'records')
+
+    def __init__(self):
+        self.keys = []  # sorted sort key values
+        self.records = {}  # sort key value -> (item, size)
+
+
+class _Index:
+    def __init__(self, definition, table):
+        self.name = definition['IndexName']
+        schema = {key['KeyType']: key['AttributeName'] for key in definition['KeySchema']}
+        self.hash_key = schema['HASH']
+        self.range_key = schema.get('RANGE')
+        projection = definition.get('Projection') or {'ProjectionType': 'ALL'}
+        self.projection_type = projection.get('ProjectionType', 'ALL')
+        self.key_names = {table.hash_key, table.range_key, self.hash_key, self.range_key} - {None}
+        self.projected = self.key_names | set(projection.get('NonKeyAttributes', []))
+        self.table = table
+        self.partitions = {}  # index hash value -> sorted list of entries
+        self.partition_keys = []
+
+    def entry(self, item):
+        # (index hash value, entry) for an item, or None when it is not indexed
+        hash_value = item.get(self.hash_key)
+        if hash_value is None:
+            return None
+        entry_range = ''
+        if self.range_key:
+            range_value = item.get(self.range_key)
+            if range_value is None:
+                return None
+            entry_range = key_value(range_value)
+        table_hash, table_range = self.table.item_key(item)
+        return key_value(hash_value), (entry_range, table_hash, table_range)
+
+    def insert(self, entry):
+        hash_value, entry = entry
+        entries = self.partitions.get(hash_value)
+        if entries is None:
+            entries = self.partitions[hash_value] = []
+            bisect.insort(self.partition_keys, hash_value)
+        bisect.insort(entries, entry)
+
+    def delete(self, entry):
+        hash_value, entry = entry
+        entries = self.partitions[hash_value]
+        del entries[bisect.bisect_left(entries, entry)]
+        if not entries:
+            del self.partitions[hash_value]
+            del self.partition_keys[bisect.bisect_left(self.partition_keys, hash_value)]
+
+    def project(self, item):
+        if self.projection_type == 'ALL':
+            return item
+        return {name: value for name, value in item.items() if name in self.projected}
+
+    def projected_size(self, item, size):
+        return size if self.projection_type == 'ALL' else item_size(self.project(item))
+
+    def write(self, old_item, old_size, new_item, new_size):
+        # Moves the entry of a changed item and returns the write capacity
+        # units it cost
+        old_entry = self.entry(old_item) if old_item is not None else None
+        new_entry = self.entry(new_item) if new_item is not None else None
+        if old_entry is None and new_entry is None:
+            return 0.0
+        if old_entry == new_entry:
+            if self.project(old_item) == self.project(new_item):
+                return 0.0
+            return _write_units(self.projected_size(new_item, new_size))
+
+        units = 0.0
+        if old_entry is not None:
+            self.delete(old_entry)
+            units += _write_units(self.projected_size(old_item, old_size))
+        if new_entry is not None:
+            self.insert(new_entry)
+            units += _write_units(self.projected_size(new_item, new_size))
+        return units
+
+    def description(self):
+        return {
+            'IndexName': self.name,
+            'KeySchema': [{'AttributeName': self.hash_key, 'KeyType': 'HASH'}]
+            + ([{'AttributeName': self.range_key, 'KeyType': 'RANGE'}] if self.range_key else []),
+            'Projection': {'ProjectionType': self.projection_type, **(
+                {'NonKeyAttributes': sorted(self.projected - self.key_names)}
+                if self.projection_type == 'INCLUDE' else {})},
+            'IndexStatus': 'ACTIVE',
+            'ItemCount': sum(len(entries) for entries in self.partitions.values())
+        }
+
+
+class _Table:
+    def __init__(self, params):
+        self.name = params['TableName']
+        schema = {key['KeyType']: key['AttributeName'] for key in params['KeySchema']}
+        self.hash_key = schema['HASH']
+        self.range_key = schema.get('RANGE')
+        self.attribute_types = {
+            definition['AttributeName']: definition['AttributeType']
+            for definition in params['AttributeDefinitions']
+        }
+        for name in (self.hash_key, self.range_key):
+            if name and name not in self.attribute_types:
+                raise validation_error(
+                    'One or more parameter values were invalid: Some index key attributes are not defined in AttributeDefinitions')
+        self.key_schema = params['KeySchema']
+        self.indexes = {}
+        for definition in params.get('GlobalSecondaryIndexes', []) + params.get('LocalSecondaryIndexes', []):
+            index = _Index(definition, self)
+            for name in (index.hash_key, index.range_key):
+                if name and name not in self.attribute_types:
+                    raise validation_error(
+                        'One or more parameter values were invalid: Some index key attributes are not defined in AttributeDefinitions')
+            self.indexes[index.name] = index
+        self.partitions = {}
+        self.partition_keys = []
+        self.item_count = 0
+
+    def description(self):
+        description = {
+            'TableName': self.name,
+            'TableStatus': 'ACTIVE',
+            'KeySchema': self.key_schema,
+            'AttributeDefinitions': [
+                {'AttributeName': name, 'AttributeType': attribute_type}
+                for name, attribute_type in self.attribute_types.items()
+            ],
+            'ItemCount': self.item_count,
+            'TableSizeBytes': sum(
+                size for partition in self.partitions.values() for _, size in partition.records.values()),
+            'BillingModeSummary': {'BillingMode': 'PAY_PER_REQUEST'}
+        }
+        if self.indexes:
+            description['GlobalSecondaryIndexes'] = [index.description() for index in self.indexes.values()]
+        return description
+
+    def item_key(self, item):
+        range_value = item[self.range_key] if self.range_key else None
+        return key_value(item[self.hash_key]), (key_value(range_value) if range_value is not None else '')
+
+    def key_attributes(self, item):
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        return key
+
+    def check_key(self, key):
+        # Validates a Key parameter and returns its (hash, range) values
+        expected = 2 if self.range_key else 1
+        if not isinstance(key, dict) or len(key) != expected or self.hash_key not in key \
+                or (self.range_key and self.range_key not in key):
+            raise validation_error('The provided key element does not match the schema')
+        for name, value in key.items():
+            if not isinstance(value, dict) or self.attribute_types[name] not in value:
+                raise validation_error('The provided key element does not match the schema')
+        self.check_key_values(key)
+        return self.item_key(key)
+
+    def check_key_values(self, item):
+        for name in (self.hash_key, self.range_key):
+            if name is None:
+                continue
+            value = item[name]
+            data = next(iter(value.values()))
+            if data == '' or data == b'':
+                raise validation_error(
+                    f"One or more parameter values are not valid. The AttributeValue for a key attribute "
+                    f"cannot contain an empty string value. Key: {name}")
+
+    def check_item(self, item):
+        for name in (self.hash_key, self.range_key):
+            if name is None:
+                continue
+            if name not in item:
+                raise validation_error(f"One or more parameter values were invalid: Missing the key {name} in the item")
+            expected = self.attribute_types[name]
+            actual = next(iter(item[name]))
+            if actual != expected:
+                raise validation_error(
+                    f"One or more parameter values were invalid: Type mismatch for key {name} "
+                    f"expected: {expected} actual: {actual}")
+        self.check_key_values(item)
+        for index in self.indexes.values():
+            for name in (index.hash_key, index.range_key):
+                if name is None or name not in item:
+                    continue
+                expected = self.attribute_types[name]
+                actual = next(iter(item[name]))
+                if actual != expected:
+                    raise validation_error(
+                        f"One or more parameter values were invalid: Type mismatch for Index Key {name} "
+                        f"Expected: {expected} Actual: {actual} IndexName: {index.name}")
+                if item[name][actual] in ('', b''):
+                    raise validation_error(
+                        f"One or more parameter values are not valid. A value specified for a secondary index "
+                        f"key is not supported. The AttributeValue for a key attribute cannot contain an empty "
+                        f"string value. IndexName: {index.name}, IndexKey: {name}")
+        size = item_size(item)
+        if size > ITEM_SIZE_LIMIT:
+            raise validation_error('Item size has exceeded the maximum allowed size')
+        return size
+
+    def get(self, key):
+        # (item, size) stored under a (hash, range) key, or (None, 0)
+        partition = self.partitions.get(key[0])
+        if partition is None:
+            return None, 0
+        return partition.records.get(key[1], (None, 0))
+
+    def write(self, key, new_item, new_size=0):
+        # Stores (or deletes, when new_item is None) the item under key.
+        # Returns the previous item and the write capacity spent per index.
+        hash_value, range_value = key
+        partition = self.partitions.get(hash_value)
+        old_item, old_size = partition.records.get(range_value, (None, 0)) if partition else (None, 0)
+
+        index_units = {}
+        for index in self.indexes.values():
+            units = index.write(old_item, old_size, new_item, new_size)
+            if units:
+                index_units[index.name] = units
+
+        if new_item is None:
+            if old_item is not None:
+                del partition.records[range_value]
+                del partition.keys[bisect.bisect_left(partition.keys, range_value)]
+                self.item_count -= 1
+                if not partition.records:
+                    del self.partitions[hash_value]
+                    del self.partition_keys[bisect.bisect_left(self.partition_keys, hash_value)]
+        else:
+            if partition is None:
+                partition = self.partitions[hash_value] = _Partition()
+                bisect.insort(self.partition_keys, hash_value)
+            if old_item is None:
+                bisect.insort(partition.keys, range_value)
+                self.item_count += 1
+            partition.records[range_value] = (new_item, new_size)
+
+        return old_item, _write_units(max(old_size, new_size)), index_units
+
+    # Ordered reads. Each yields the full table items as (item, size).
+
+    def query_items(self, hash_value, bounds, forward, start):
+        partition = self.partitions.get(hash_value)
+        if partition is None:
+            return
+        keys = partition.keys
+        low, high = _bound_positions(keys, bounds)
+        if start is not None:
+            if forward:
+                low = max(low, bisect.bisect_right(keys, start))
+            else:
+                high = min(high, bisect.bisect_left(keys, start))
+        positions = range(low, high) if forward else range(high - 1, low - 1, -1)
+        records = partition.records
+        for position in positions:
+            if position >= len(keys):
+                return
+            record = records.get(keys[position])
+            if record is not None:
+                yield record
+
+    def scan_items(self, start, segment):
+        partition_position = 0
+        start_range = None
+        if start is not None:
+            partition_position = bisect.bisect_left(self.partition_keys, start[0])
+            if partition_position < len(self.partition_keys) and self.partition_keys[partition_position] == start[0]:
+                start_range = start[1]
+        for hash_value in list(self.partition_keys[partition_position:]):
+            if segment is not None and _segment(hash_value, segment[1]) != segment[0]:
+                start_range = None
+                continue
+            partition = self.partitions.get(hash_value)
+            if partition is None:
+                continue
+            keys = partition.keys
+            position = bisect.bisect_right(keys, start_range) if start_range is not None else 0
+            start_range = None
+            for range_value in keys[position:]:
+                record = partition.records.get(range_value)
+                if record is not None:
+                    yield record
+
+
+def _segment(hash_value, total_segments):
+    if isinstance(hash_value, str):
+        data = hash_value.encode('utf-8')
+    elif isinstance(hash_value, Decimal):
+        data = str(hash_value).encode()
+    else:
+        data = hash_value
+    return zlib.crc32(data) % total_segments
+
+
+def _successor(prefix):
+    # Smallest value greater than every value starting with prefix
+    if isinstance(prefix, str):
+        if not prefix:
+            return None
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1) if ord(prefix[-1]) < 0x10FFFF else None
+    stripped = prefix.rstrip(b'\xff')
+    return stripped[:-1] + bytes([stripped[-1] + 1]) if stripped else None
+
+
+def _bound_positions(keys, bounds, key=None):
+    # bounds: None or (operator, value[, value]) on the sort key
+    if bounds is None:
+        return 0, len(keys)
+    operator = bounds[0]
+    value = bounds[1]
+    left = partial(bisect.bisect_left, keys, key=key) if key else partial(bisect.bisect_left, keys)
+    right = partial(bisect.bisect_right, keys, key=key) if key else partial(bisect.bisect_right, keys)
+    if operator == '=':
+        return left(value), right(value)
+    if operator == '<':
+        return 0, left(value)
+    if operator == '<=':
+        return 0, right(value)
+    if operator == '>':
+        return right(value), len(keys)
+    if operator == '>=':
+        return left(value), len(keys)
+    if operator == 'between':
+        return left(value), right(bounds[2])
+    # begins_with
+    successor = _successor(value)
+    return left(value), (left(successor) if successor is not None else len(keys))
+
+
+def _entry_range(entry):
+    return entry[0]
+
+
+def _index_query_items(index, hash_value, bounds, forward, start):
+    entries = index.partitions.get(hash_value)
+    if not entries:
+        return
+    low, high = _bound_positions(entries, bounds, key=_entry_range)
+    if start is not None:
+        if forward:
+            low = max(low, bisect.bisect_right(entries, start))
+        else:
+            high = min(high, bisect.bisect_left(entries, start))
+    positions = range(low, high) if forward else range(high - 1, low - 1, -1)
+    for position in positions:
+        if position >= len(entries):
+            return
+        _, table_hash, table_range = entries[position]
+        item, size = index.table.get((table_hash, table_range))
+        if item is not None:
+            yield item, size
+
+
+def _index_scan_items(index, start, segment):
+    partition_position = 0
+    start_entry = None
+    if start is not None:
+        partition_position = bisect.bisect_left(index.partition_keys, start[0])
+        if partition_position < len(index.partition_keys) and index.partition_keys[partition_position] == start[0]:
+            start_entry = start[1]
+    for hash_value in list(index.partition_keys[partition_position:]):
+        if segment is not None and _segment(hash_value, segment[1]) != segment[0]:
+            start_entry = None
+            continue
+        entries = index.partitions.get(hash_value, [])
+        position = bisect.bisect_right(entries, start_entry) if start_entry is not None else 0
+        start_entry = None
+        for _, table_hash, table_range in list(entries[position:]):
+            item, size = index.table.get((table_hash, table_range))
+            if item is not None:
+                yield item, size
+
+
+def _key_condition(tree, context, hash_key, range_key):
+    # Splits a KeyConditionExpression into the partition key value and the
+    # sort key bounds
+    parts = []
+
+    def flatten(node):
+        if node[0] == 'and':
+            flatten(node[1])
+            flatten(node[2])
+        else:
+            parts.append(node)
+    flatten(tree)
+
+    def attribute(node):
+        if node[0] != 'path' or len(node[1]) != 1:
+            raise validation_error('Invalid KeyConditionExpression: Key conditions must use top-level key attributes')
+        return context.resolve(node)[0]
+
+    hash_value = None
+    bounds = None
+    for node in parts:
+        if node[0] == 'compare':
+            operator, left, right = node[1], node[2], node[3]
+            if left[0] == 'value' and right[0] == 'path':
+                left, right = right, left
+                operator = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}.get(operator, operator)
+            if right[0] != 'value':
+                raise validation_error('Invalid KeyConditionExpression: Key conditions must compare a key with a value')
+            name = attribute(left)
+            value = context.values[right[1]]
+            if name == hash_key:
+                if operator != '=' or hash_value is not None:
+                    raise validation_error('Query key condition not supported')
+                hash_value = value
+                continue
+            if name != range_key or bounds is not None or operator == '<>':
+                raise validation_error('Query key condition not supported')
+            bounds = (operator, value)
+        elif node[0] == 'between':
+            name = attribute(node[1])
+            if name != range_key or bounds is not None:
+                raise validation_error('Query key condition not supported')
+            low, high = context.values[node[2][1]], context.values[node[3][1]]
+            pair = _ordered(low, high)
+            if pair is None or pair[0] > pair[1]:
+                raise validation_error(
+                    'Invalid KeyConditionExpression: The BETWEEN operator requires upper bound to be greater than or equal to lower bound')
+            bounds = ('between', low, high)
+        elif node[0] == 'function' and node[1] == 'begins_with':
+            name = attribute(node[2][0])
+            if name != range_key or bounds is not None:
+                raise validation_error('Query key condition not supported')
+            bounds = ('begins_with', context.values[node[2][1][1]])
+        else:
+            raise validation_error('Invalid operator used in KeyConditionExpression')
+
+    if hash_value is None:
+        raise validation_error(f"Query condition missed key schema element: {hash_key}")
+    return hash_value, bounds
+
+
+def _bounds_values(bounds, attribute_type):
+    if bounds is None:
+        return None
+    for value in bounds[1:]:
+        if attribute_type not in value:
+            raise validation_error('One or more parameter values were invalid: Condition parameter type does not match schema type')
+    return (bounds[0],) + tuple(key_value(value) for value in bounds[1:])
+
+
+class MemoryDynamoDB:
+    # One in-memory DynamoDB "account". Thread-safe: requests run one at a
+    # time, like single-item operations are atomic in DynamoDB.
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {}
+        # Capacity units charged so far: table name -> {'read': units, 'write': units}
+        self.consumed = {}
+
+    def client(self):
+        return MemoryClient(self)
+
+    def resource(self):
+        return MemoryResource(self)
+
+    def install(self):
+        # Points db (and so every handler module) at this database
+        import db
+        resource = self.resource()
+        db.configure(resource=resource, client=self.client())
+        return resource
+
+    def reset_consumed(self):
+        with self.lock:
+            self.consumed.clear()
+
+    def execute(self, operation_name, params):
+        handler = getattr(self, f"_{operation_name}", None)
+        if handler is None:
+            raise validation_error(f"Operation {operation_name} is not supported by the in-memory DynamoDB")
+        with self.lock:
+            return handler(params)
+
+    # Helpers
+
+    def _table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            raise DynamoDBError('ResourceNotFoundException', 'Requested resource not found')
+        return table
+
+    def _charge(self, table, kind, table_units, index_units, mode):
+        # Records consumed capacity and returns the ConsumedCapacity entry
+        total = table_units + sum(index_units.values())
+        consumed = self.consumed.setdefault(table.name, {'read': 0.0, 'write': 0.0})
+        consumed[kind] += total
+        if mode not in ('TOTAL', 'INDEXES'):
+            return None
+
+        units_name = 'ReadCapacityUnits' if kind == 'read' else 'WriteCapacityUnits'
+        entry = {'TableName': table.name, 'CapacityUnits': total, units_name: total}
+        if mode == 'INDEXES':
+            entry['Table'] = {'CapacityUnits': table_units, units_name: table_units}
+            if index_units:
+                entry['GlobalSecondaryIndexes'] = {
+                    name: {'CapacityUnits': units, units_name: units}
+                    for name, units in index_units.items()
+                }
+        return entry
+
+    @staticmethod
+    def _with_capacity(response, entry):
+        if entry is not None:
+            response['ConsumedCapacity'] = entry
+        return response
+
+    @staticmethod
+    def _projection(context, params):
+        expression = context.parse(params.get('ProjectionExpression'), 'projection')
+        if expression is None:
+            return None
+        return [context.resolve(path) for path in expression.tree]
+
+    @staticmethod
+    def _condition_failed(context, condition, item):
+        return condition is not None and not condition.evaluate(item or {}, context.names, context.values)
+
+    def _check_condition(self, context, condition, item, params):
+        if self._condition_failed(context, condition, item):
+            extra = {}
+            if item and params.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                extra['Item'] = dict(item)
+            raise DynamoDBError('ConditionalCheckFailedException', 'The conditional request failed', **extra)
+
+    # Tables
+
+    def _CreateTable(self, params):
+        if params['TableName'] in self.tables:
+            raise DynamoDBError('ResourceInUseException', f"Table already exists: {params['TableName']}")
+        table = _Table(params)
+        self.tables[table.name] = table
+        return {'TableDescription': table.description()}
+
+    def _DescribeTable(self, params):
+        return {'Table': self._table(params['TableName']).description()}
+
+    def _DeleteTable(self, params):
+        table = self._table(params['TableName'])
+        del self.tables[table.name]
+        return {'TableDescription': {**table.description(), 'TableStatus': 'DELETING'}}
+
+    def _ListTables(self, params):
+        return {'TableNames': sorted(self.tables)}
+
+    # Single items
+
+    def _GetItem(self, params):
+        table = self._table(params['TableName'])
+        context = ExpressionContext(params)
+        projection = self._projection(context, params)
+        context.check_unused()
+
+        item, size = table.get(table.check_key(params['Key']))
+        entry = self._charge(table, 'read', _read_units(size, params.get('ConsistentRead')), {},
+                             params.get('ReturnConsumedCapacity'))
+        response = {}
+        if item is not None:
+            response['Item'] = project(item, projection) if projection else dict(item)
+        return self._with_capacity(response, entry)
+
+    def _PutItem(self, params):
+        table = self._table(params['TableName'])
+        context = ExpressionContext(params)
+        condition = context.parse(params.get('ConditionExpression'), 'condition')
+        context.check_unused()
+
+        item = canonical_item(params['Item'])
+        size = table.check_item(item)
+        key = table.item_key(item)
+        old_item, _ = table.get(key)
+        self._check_condition(context, condition, old_item, params)
+
+        old_item, units, index_units = table.write(key, item, size)
+        entry = self._charge(table, 'write', units, index_units, params.get('ReturnConsumedCapacity'))
+        response = {}
+        if params.get('ReturnValues') == 'ALL_OLD' and old_item is not None:
+            response['Attributes'] = dict(old_item)
+        return self._with_capacity(response, entry)
+
+    def _DeleteItem(self, params):
+        table = self._table(params['TableName'])
+        context = ExpressionContext(params)
+        condition = context.parse(params.get('ConditionExpression'), 'condition')
+        context.check_unused()
+
+        key = table.check_key(params['Key'])
+        old_item, _ = table.get(key)
+        self._check_condition(context, condition, old_item, params)
+
+        old_item, units, index_units = table.write(key, None)
+        entry = self._charge(table, 'write', units, index_units, params.get('ReturnConsumedCapacity'))
+        response = {}
+        if params.get('ReturnValues') == 'ALL_OLD' and old_item is not None:
+            response['Attributes'] = dict(old_item)
+        return self._with_capacity(response, entry)
+
+    def _updated_item(self, table, params, context, update, old_item):
+        # The item an UpdateItem request would store
+        if update is None:
+            raise validation_error('UpdateExpression is required')
+        base = dict(old_item) if old_item is not None else dict(params['Key'])
+        new_item, changed = apply_update(base, update, context)
+        for name in (table.hash_key, table.range_key):
+            if name in changed:
+                raise validation_error(
+                    f"One or more parameter values were invalid: Cannot update attribute {name}. "
+                    f"This attribute is part of the key")
+        return new_item, changed
+
+    def _UpdateItem(self, params):
+        table = self._table(params['TableName'])
+        if 'AttributeUpdates' in params:
+            raise validation_error('AttributeUpdates is not supported, use UpdateExpression')
+        context = ExpressionContext(params)
+        update = context.parse(params.get('UpdateExpression'), 'update')
+        condition = context.parse(params.get('ConditionExpression'), 'condition')
+        context.check_unused()
+
+        key = table.check_key(params['Key'])
+        old_item, _ = table.get(key)
+        self._check_condition(context, condition, old_item, params)
+        new_item, changed = self._updated_item(table, params, context, update, old_item)
+        size = table.check_item(new_item)
+
+        old_item, units, index_units = table.write(key, new_item, size)
+        entry = self._charge(table, 'write', units, index_units, params.get('ReturnConsumedCapacity'))
+
+        return_values = params.get('ReturnValues', 'NONE')
+        response = {}
+        if return_values == 'ALL_NEW':
+            response['Attributes'] = dict(new_item)
+        elif return_values == 'ALL_OLD' and old_item is not None:
+            response['Attributes'] = dict(old_item)
+        elif return_values == 'UPDATED_NEW':
+            response['Attributes'] = {name: new_item[name] for name in changed if name in new_item}
+        elif return_values == 'UPDATED_OLD' and old_item is not None:
+            response['Attributes'] = {name: old_item[name] for name in changed if name in old_item}
+        return self._with_capacity(response, entry)
+
+    # Queries and scans
+
+    def _read_page(self, table, index, items, params, context, filter_expression, projection):
+        select = params.get('Select')
+        if select == 'ALL_ATTRIBUTES' and index is not None and index.projection_type != 'ALL':
+            raise validation_error(
+                'One or more parameter values were invalid: Select type ALL_ATTRIBUTES is not supported '
+                f"for global secondary index {index.name} because its projection type is not ALL")
+        if select == 'SPECIFIC_ATTRIBUTES' and projection is None:
+            raise validation_error('SPECIFIC_ATTRIBUTES requires a ProjectionExpression')
+        if select == 'COUNT' and projection is not None:
+            raise validation_error('Cannot specify the ProjectionExpression when choosing to get only the Count')
+
+        limit = params.get('Limit')
+        if limit is not None and limit < 1:
+            raise validation_error('Limit must be greater than or equal to 1')
+
+        results = []
+        scanned = 0
+        read_bytes = 0
+        last = None
+        stopped = False
+        projected = index is not None and index.projection_type != 'ALL'
+        for item, size in items:
+            read_item = item
+            if projected:
+                read_item = index.project(item)
+                size = item_size(read_item)
+            if scanned and read_bytes + size > PAGE_SIZE_LIMIT:
+                stopped = True
+                break
+            read_bytes += size
+            scanned += 1
+            last = item
+            if filter_expression is None or filter_expression.evaluate(read_item, context.names, context.values):
+                results.append(read_item)
+            if limit is not None and scanned >= limit:
+                stopped = True
+                break
+
+        response = {'Count': len(results), 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = [project(item, projection) if projection else dict(item) for item in results]
+        if stopped and last is not None:
+            last_key = table.key_attributes(last)
+            if index is not None:
+                last_key[index.hash_key] = last[index.hash_key]
+                if index.range_key:
+                    last_key[index.range_key] = last[index.range_key]
+            response['LastEvaluatedKey'] = last_key
+
+        consistent = params.get('ConsistentRead')
+        units = _read_units(read_bytes, consistent)
+        entry = self._charge(table, 'read', 0.0 if index else units, {index.name: units} if index else {},
+                             params.get('ReturnConsumedCapacity'))
+        return self._with_capacity(response, entry)
+
+    def _index(self, table, params):
+        name = params.get('IndexName')
+        if name is None:
+            return None
+        index = table.indexes.get(name)
+        if index is None:
+            raise validation_error(
+                f"The table does not have the specified index: {name}")
+        if params.get('ConsistentRead'):
+            raise validation_error('Consistent reads are not supported on global secondary indexes')
+        return index
+
+    def _start(self, table, index, params, scan):
+        # Position after ExclusiveStartKey, in the form the readers expect
+        start_key = params.get('ExclusiveStartKey')
+        if start_key is None:
+            return None
+        try:
+            table_key = table.item_key(start_key)
+            if index is None:
+                return table_key if scan else table_key[1]
+            index_hash, entry = index.entry(start_key)
+        except (KeyError, TypeError, StopIteration):
+            raise validation_error('The provided starting key is invalid')
+        return (index_hash, entry) if scan else entry
+
+    def _Query(self, params):
+        table = self._table(params['TableName'])
+        index = self._index(table, params)
+        if 'KeyConditions' in params:
+            raise validation_error('KeyConditions is not supported, use KeyConditionExpression')
+        context = ExpressionContext(params)
+        key_condition = context.parse(params.get('KeyConditionExpression'), 'key')
+        if key_condition is None:
+            raise validation_error('Either the KeyConditions or KeyConditionExpression parameter must be specified in the request.')
+        filter_expression = context.parse(params.get('FilterExpression'), 'condition')
+        projection = self._projection(context, params)
+        context.check_unused()
+
+        hash_key = index.hash_key if index else table.hash_key
+        range_key = index.range_key if index else table.range_key
+        hash_value, bounds = _key_condition(key_condition.tree, context, hash_key, range_key)
+        if table.attribute_types[hash_key] not in hash_value:
+            raise validation_error('One or more parameter values were invalid: Condition parameter type does not match schema type')
+        bounds = _bounds_values(bounds, table.attribute_types.get(range_key))
+        if filter_expression is not None:
+            key_names = {hash_key, range_key}
+            used = {elements[0] for elements in
+                    (context.resolve(node) for node in _paths(filter_expression.tree))}
+            if used & key_names:
+                raise validation_error(
+                    'Filter Expression can only contain non-primary key attributes: '
+                    f"Primary key attribute: {sorted(used & key_names)[0]}")
+
+        forward = params.get('ScanIndexForward', True)
+        start = self._start(table, index, params, scan=False)
+        if index is None:
+            items = table.query_items(key_value(hash_value), bounds, forward, start)
+        else:
+            items = _index_query_items(index, key_value(hash_value), bounds, forward, start)
+        return self._read_page(table, index, items, params, context, filter_expression, projection)
+
+    def _Scan(self, params):
+        table = self._table(params['TableName'])
+        index = self._index(table, params)
+        context = ExpressionContext(params)
+        filter_expression = context.parse(params.get('FilterExpression'), 'condition')
+        projection = self._projection(context, params)
+        context.check_unused()
+
+        segment = None
+        if 'Segment' in params or 'TotalSegments' in params:
+            if 'Segment' not in params or 'TotalSegments' not in params:
+                raise validation_error('The Segment parameter is required but was not present in the request when parameter TotalSegments is present')
+            if not 0 <= params['Segment'] < params['TotalSegments']:
+                raise validation_error('The Segment parameter is zero-based and must be less than parameter TotalSegments')
+            segment = (params['Segment'], params['TotalSegments'])
+
+        start = self._start(table, index, params, scan=True)
+        if index is None:
+            items = table.scan_items(start, segment)
+        else:
+            items = _index_scan_items(index, start, segment)
+        return self._read_page(table, index, items, params, context, filter_expression, projection)
+
+    # Batches
+
+    def _BatchGetItem(self, params):
+        request_items = params.get('RequestItems') or {}
+        total_keys = sum(len(request.get('Keys', [])) for request in request_items.values())
+        if total_keys > BATCH_GET_LIMIT:
+            raise validation_error('Too many items requested for the BatchGetItem call')
+
+        prepared = []
+        for table_name, request in request_items.items():
+            table = self._table(table_name)
+            context = ExpressionContext(request)
+            projection = self._projection(context, request)
+            context.check_unused()
+            keys = [table.check_key(key) for key in request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise validation_error('Provided list of item keys contains duplicates')
+            prepared.append((table, request, projection, keys))
+
+        responses = {}
+        unprocessed = {}
+        capacity = []
+        response_bytes = 0
+        for table, request, projection, keys in prepared:
+            items = responses.setdefault(table.name, [])
+            units = 0.0
+            for position, key in enumerate(keys):
+                item, size = table.get(key)
+                if item is not None and response_bytes + size > BATCH_GET_SIZE_LIMIT and response_bytes:
+                    unprocessed[table.name] = {
+                        **{name: value for name, value in request.items() if name != 'Keys'},
+                        'Keys': request['Keys'][position:]
+                    }
+                    break
+                units += _read_units(size, request.get('ConsistentRead'))
+                if item is not None:
+                    response_bytes += size
+                    items.append(project(item, projection) if projection else dict(item))
+            entry = self._charge(table, 'read', units, {}, params.get('ReturnConsumedCapacity'))
+            if entry is not None:
+                capacity.append(entry)
+
+        response = {'Responses': responses, 'UnprocessedKeys': unprocessed}
+        if capacity:
+            response['ConsumedCapacity'] = capacity
+        return response
+
+    def _BatchWriteItem(self, params):
+        request_items = params.get('RequestItems') or {}
+        total = sum(len(requests) for requests in request_items.values())
+        if total > BATCH_WRITE_LIMIT:
+            raise validation_error(
+                'Too many items requested for the BatchWriteItem call')
+        if total == 0:
+            raise validation_error('The batch write request list for a table cannot be null or empty')
+
+        prepared = []
+        for table_name, requests in request_items.items():
+            table = self._table(table_name)
+            keys = set()
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = canonical_item(request['PutRequest']['Item'])
+                    size = table.check_item(item)
+                    key = table.item_key(item)
+                else:
+                    item, size = None, 0
+                    key = table.check_key(request['DeleteRequest']['Key'])
+                if key in keys:
+                    raise validation_error('Provided list of item keys contains duplicates')
+                keys.add(key)
+                prepared.append((table, key, item, size))
+
+        capacity = {}
+        for table, key, item, size in prepared:
+            _, units, index_units = table.write(key, item, size)
+            table_units, all_index_units = capacity.setdefault(table.name, [0.0, {}])
+            capacity[table.name][0] = table_units + units
+            for name, index_unit in index_units.items():
+                all_index_units[name] = all_index_units.get(name, 0.0) + index_unit
+
+        response = {'UnprocessedItems': {}}
+        entries = [
+            self._charge(self.tables[name], 'write', units, index_units, params.get('ReturnConsumedCapacity'))
+            for name, (units, index_units) in capacity.items()
+        ]
+        if any(entry is not None for entry in entries):
+            response['ConsumedCapacity'] = entries
+        return response
+
+    # Transactions
+
+    def _TransactWriteItems(self, params):
+        actions = params.get('TransactItems') or []
+        if not actions or len(actions) > TRANSACTION_LIMIT:
+            raise validation_error(
+                f"Member must have length less than or equal to {TRANSACTION_LIMIT} and greater than or equal to 1")
+
+        planned = []
+        reasons = []
+        seen = set()
+        for action in actions:
+            (action_name, request), = action.items()
+            table = self._table(request['TableName'])
+            context = ExpressionContext(request)
+            condition = context.parse(request.get('ConditionExpression'), 'condition')
+            update = context.parse(request.get('UpdateExpression'), 'update') if action_name == 'Update' else None
+            context.check_unused()
+
+            if action_name == 'Put':
+                new_item = canonical_item(request['Item'])
+                size = table.check_item(new_item)
+                key = table.item_key(new_item)
+            else:
+                key = table.check_key(request['Key'])
+                new_item, size = None, 0
+            if (table.name, key) in seen:
+                raise validation_error('Transaction request cannot include multiple operations on one item')
+            seen.add((table.name, key))
+
+            old_item, old_size = table.get(key)
+            if self._condition_failed(context, condition, old_item):
+                reason = {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'}
+                if old_item is not None and request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD':
+                    reason['Item'] = dict(old_item)
+                reasons.append(reason)
+                continue
+            try:
+                if action_name == 'Update':
+                    new_item, _ = self._updated_item(table, request, context, update, old_item)
+                    size = table.check_item(new_item)
+            except DynamoDBError as e:
+                reasons.append({'Code': 'ValidationError', 'Message': e.message})
+                continue
+
+            reasons.append({'Code': 'None'})
+            planned.append((action_name, table, key, new_item, size, old_size))
+
+        if len(planned) != len(actions):
+            codes = ', '.join(reason['Code'] for reason in reasons)
+            raise DynamoDBError(
+                'TransactionCanceledException',
+                f"Transaction cancelled, please refer cancellation reasons for specific reasons [{codes}]",
+                CancellationReasons=reasons)
+
+        capacity = {}
+        for action_name, table, key, new_item, size, old_size in planned:
+            if action_name == 'ConditionCheck':
+                units, index_units = _write_units(old_size), {}
+            else:
+                _, units, index_units = table.write(key, new_item, size)
+            table_units, all_index_units = capacity.setdefault(table.name, [0.0, {}])
+            capacity[table.name][0] = table_units + 2 * units
+            for name, index_unit in index_units.items():
+                all_index_units[name] = all_index_units.get(name, 0.0) + 2 * index_unit
+
+        response = {}
+        entries = [
+            self._charge(self.tables[name], 'write', units, index_units, params.get('ReturnConsumedCapacity'))
+            for name, (units, index_units) in capacity.items()
+        ]
+        if any(entry is not None for entry in entries):
+            response['ConsumedCapacity'] = entries
+        return response
+
+    def _TransactGetItems(self, params):
+        actions = params.get('TransactItems') or []
+        if not actions or len(actions) > TRANSACTION_LIMIT:
+            raise validation_error(
+                f"Member must have length less than or equal to {TRANSACTION_LIMIT} and greater than or equal to 1")
+
+        responses = []
+        capacity = {}
+        for action in actions:
+            request = action['Get']
+            table = self._table(request['TableName'])
+            context = ExpressionContext(request)
+            projection = self._projection(context, request)
+            context.check_unused()
+            item, size = table.get(table.check_key(request['Key']))
+            capacity[table.name] = capacity.get(table.name, 0.0) + 2 * _read_units(size, True)
+            if item is None:
+                responses.append({})
+            else:
+                responses.append({'Item': project(item, projection) if projection else dict(item)})
+
+        response = {'Responses': responses}
+        entries = [
+            self._charge(self.tables[name], 'read', units, {}, params.get('ReturnConsumedCapacity'))
+            for name, units in capacity.items()
+        ]
+        if any(entry is not None for entry in entries):
+            response['ConsumedCapacity'] = entries
+        return response
+
+
+def _paths(node):
+    # Every document path in a condition tree
+    if isinstance(node, tuple):
+        if node and node[0] == 'path':
+            yield node
+        else:
+            for child in node:
+                yield from _paths(child)
+
+
+# boto3-compatible front ends
+
+_service_model = None
+_operation_models = {}
+_exceptions = None
+_model_lock = threading.Lock()
+
+OPERATIONS = {
+    'create_table': 'CreateTable',
+    'describe_table': 'DescribeTable',
+    'delete_table': 'DeleteTable',
+    'list_tables': 'ListTables',
+    'get_item': 'GetItem',
+    'put_item': 'PutItem',
+    'update_item': 'UpdateItem',
+    'delete_item': 'DeleteItem',
+    'query': 'Query',
+    'scan': 'Scan',
+    'batch_get_item': 'BatchGetItem',
+    'batch_write_item': 'BatchWriteItem',
+    'transact_write_items': 'TransactWriteItems',
+    'transact_get_items': 'TransactGetItems'
+}
+
+
+def _load_models():
+    global _service_model, _exceptions
+    if _service_model is None:
+        with _model_lock:
+            if _service_model is None:
+                service_model = botocore.session.get_session().get_service_model('dynamodb')
+                _exceptions = ClientExceptionsFactory().create_client_exceptions(service_model)
+                _service_model = service_model
+    return _service_model
+
+
+def _operation_model(operation_name):
+    model = _operation_models.get(operation_name)
+    if model is None:
+        model = _operation_models[operation_name] = _load_models().operation_model(operation_name)
+    return model
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    return str(value)
+
+
+class _HttpResponse:
+    # What after-call handlers see as the raw HTTP response
+
+    headers = {}
+
+    def __init__(self, status_code, parsed):
+        self.status_code = status_code
+        self._parsed = parsed
+        self._content = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            body = {key: value for key, value in self._parsed.items() if key != 'ResponseMetadata'}
+            self._content = json.dumps(body, default=_json_default).encode('utf-8')
+        return self._content
+
+
+def _copy_params(value):
+    # Containers are copied so the caller's objects are never changed,
+    # values and condition objects are shared
+    if isinstance(value, dict):
+        return {key: _copy_params(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_params(item) for item in value]
+    return value
+
+
+VALUE_MAPS = ('Item', 'Key', 'ExpressionAttributeValues', 'ExclusiveStartKey')
+CONDITION_PARAMETERS = ('ConditionExpression', 'FilterExpression', 'KeyConditionExpression')
+
+
+class _ResourceTransformer:
+    # The conversions boto3's resource layer makes (condition objects to
+    # expressions, Python values to and from attribute values), applied to the
+    # fields DynamoDB uses directly instead of walking the service model on
+    # every call like boto3.dynamodb.transform does
+
+    def __init__(self):
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def serialize_map(self, values):
+        serialize = self._serializer.serialize
+        return {
+            name: {'S': value} if type(value) is str else serialize(value)
+            for name, value in values.items()
+        }
+
+    def deserialize_map(self, values):
+        deserialize = self._deserializer.deserialize
+        return {
+            name: value['S'] if 'S' in value else deserialize(value)
+            for name, value in values.items()
+        }
+
+    def transform_input(self, params):
+        # A builder per request: placeholders are numbered per request and
+        # the client is shared between threads
+        builder = ConditionExpressionBuilder()
+        self._transform_request(params, builder)
+        for action in params.get('TransactItems', ()):
+            for request in action.values():
+                self._transform_request(request, builder)
+        for requests in params.get('RequestItems', {}).values():
+            if isinstance(requests, dict):
+                requests['Keys'] = [self.serialize_map(key) for key in requests.get('Keys', [])]
+                continue
+            for request in requests:
+                for body in request.values():
+                    self._transform_request(body, builder)
+
+    def _transform_request(self, request, builder):
+        for name in CONDITION_PARAMETERS:
+            condition = request.get(name)
+            if not isinstance(condition, ConditionBase):
+                continue
+            built = builder.build_expression(
+                condition, is_key_condition=name == 'KeyConditionExpression')
+            request[name] = built.condition_expression
+            if built.attribute_name_placeholders:
+                request.setdefault('ExpressionAttributeNames', {}).update(built.attribute_name_placeholders)
+            if built.attribute_value_placeholders:
+                request.setdefault('ExpressionAttributeValues', {}).update(built.attribute_value_placeholders)
+        for name in VALUE_MAPS:
+            if name in request:
+                request[name] = self.serialize_map(request[name])
+
+    def transform_output(self, parsed):
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in parsed:
+                parsed[name] = self.deserialize_map(parsed[name])
+        if 'Items' in parsed:
+            parsed['Items'] = [self.deserialize_map(item) for item in parsed['Items']]
+
+        responses = parsed.get('Responses')
+        if isinstance(responses, dict):
+            for table_name, items in responses.items():
+                responses[table_name] = [self.deserialize_map(item) for item in items]
+        elif isinstance(responses, list):
+            for response in responses:
+                if 'Item' in response:
+                    response['Item'] = self.deserialize_map(response['Item'])
+
+        for request in parsed.get('UnprocessedKeys', {}).values():
+            request['Keys'] = [self.deserialize_map(key) for key in request['Keys']]
+        for requests in parsed.get('UnprocessedItems', {}).values():
+            for request in requests:
+                for body in request.values():
+                    for name in ('Item', 'Key'):
+                        if name in body:
+                            body[name] = self.deserialize_map(body[name])
+
+
+class MemoryClient:
+    # Stands in for boto3.client('dynamodb'). With high_level it converts
+    # Python values and condition objects like the resource layer's client.
+
+    def __init__(self, database, high_level=False):
+        _load_models()
+        self._database = database
+        self._transformer = _ResourceTransformer() if high_level else None
+        self.exceptions = _exceptions
+        self.meta = SimpleNamespace(
+            events=HierarchicalEmitter(),
+            service_model=_service_model,
+            region_name='local',
+            endpoint_url=MEMORY_ENDPOINT,
+            config=None
+        )
+
+    def __getattr__(self, name):
+        operation_name = OPERATIONS.get(name)
+        if operation_name is None:
+            raise AttributeError(f"'MemoryClient' object has no attribute '{name}'")
+        return partial(self._make_api_call, operation_name)
+
+    def _make_api_call(self, operation_name, params=None, **kwargs):
+        params = dict(params or {}, **kwargs)
+        model = _operation_model(operation_name)
+        events = self.meta.events
+        context = {}
+
+        transformer = self._transformer
+        if transformer is not None:
+            params = _copy_params(params)
+        events.emit(f"before-parameter-build.dynamodb.{operation_name}",
+                    params=params, model=model, context=context)
+        if transformer is not None:
+            transformer.transform_input(params)
+
+        _, response = events.emit_until_response(
+            f"before-call.dynamodb.{operation_name}", model=model, params=params, context=context)
+        if response is not None:
+            http, parsed = response
+        else:
+            try:
+                parsed = self._database.execute(operation_name, params)
+                parsed['ResponseMetadata'] = {'HTTPStatusCode': 200, 'RetryAttempts': 0}
+                http = _HttpResponse(200, parsed)
+            except DynamoDBError as e:
+                parsed = {
+                    'Error': {'Code': e.code, 'Message': e.message},
+                    'ResponseMetadata': {'HTTPStatusCode': 400, 'RetryAttempts': 0},
+                    'message': e.message,
+                    **e.extra
+                }
+                http = _HttpResponse(400, parsed)
+
+        events.emit(f"after-call.dynamodb.{operation_name}",
+                    http_response=http, parsed=parsed, model=model, context=context)
+        if http.status_code >= 300:
+            raise self.exceptions.from_code(parsed['Error']['Code'])(parsed, operation_name)
+        if transformer is not None:
+            transformer.transform_output(parsed)
+        return parsed
+
+
+class MemoryTable:
+    # Stands in for a boto3 Table resource
+
+    def __init__(self, name, client):
+        self.name = name
+        self.table_name = name
+        self.meta = SimpleNamespace(client=client)
+
+    def _call(self, method, **params):
+        return getattr(self.meta.client, method)(TableName=self.name, **params)
+
+    def get_item(self, **params):
+        return self._call('get_item', **params)
+
+    def put_item(self, **params):
+        return self._call('put_item', **params)
+
+    def update_item(self, **params):
+        return self._call('update_item', **params)
+
+    def delete_item(self, **params):
+        return self._call('delete_item', **params)
+
+    def query(self, **params):
+        return self._call('query', **params)
+
+    def scan(self, **params):
+        return self._call('scan', **params)
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return BatchWriter(self.name, self.meta.client, overwrite_by_pkeys=overwrite_by_pkeys)
+
+    def delete(self):
+        return self.meta.client.delete_table(TableName=self.name)
+
+    def wait_until_exists(self):
+        self.meta.client.describe_table(TableName=self.name)
+
+    @property
+    def key_schema(self):
+        return self.meta.client.describe_table(TableName=self.name)['Table']['KeySchema']
+
+    @property
+    def item_count(self):
+        return self.meta.client.describe_table(TableName=self.name)['Table']['ItemCount']
+
+
+class MemoryResource:
+    # Stands in for boto3.resource('dynamodb')
+
+    def __init__(self, database):
+        self.database = database
+        self.meta = SimpleNamespace(client=MemoryClient(database, high_level=True))
+
+    def Table(self, name):
+        return MemoryTable(name, self.meta.client)
+
+    def create_table(self, **params):
+        self.meta.client.create_table(**params)
+        return self.Table(params['TableName'])
+
+    def batch_get_item(self, **params):
+        return self.meta.client.batch_get_item(**params)
+
+    def batch_write_item(self, **params):
+        return self.meta.client.batch_write_item(**params)
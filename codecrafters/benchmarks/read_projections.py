@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from benchmarks.common import (
+    DEFAULT_ENDPOINT, ReadMeter, connect, ensure_table, use_resource)
+import answer
+import attempt
+import projection
+import question_cache
+import quiz
+import user
+
+# Reports consumed read capacity and response bytes per endpoint with and
+# without projection expressions. "DynamoDB bytes" is what the handler
+# downloads from DynamoDB, "body bytes" is what it returns to the client.
+
+
+def seed(table, user_count, question_count, attempt_count):
+    quiz_id = str(uuid.uuid4())
+    question_ids = [str(uuid.uuid4()) for _ in range(question_count)]
+    student_id = None
+    started = datetime(2024, 1, 1, 9, 0)
+
+    with table.batch_writer() as writer:
+        writer.put_item(Item={
+            'PK': f"QUIZ#{quiz_id}",
+            'SK': 'METADATA',
+            'title': 'Benchmark quiz',
+            'description': 'Quiz used to measure read sizes',
+            'visible': True,
+            'questionCount': question_count,
+            'version': 0
+        })
+        for number, question_id in enumerate(question_ids):
+            writer.put_item(Item={
+                'PK': f"QUIZ#{quiz_id}",
+                'SK': f"QUESTION#{question_id}",
+                'questionText': f"Question {number}",
+                'options': ['a', 'b', 'c', 'd'],
+                'correctAnswer': 'a'
+            })
+
+        for number in range(user_count):
+            user_id = str(uuid.uuid4())
+            role = 'student' if number % 2 else 'teacher'
+            if role == 'student' and not student_id:
+                student_id = user_id
+            writer.put_item(Item={
+                'PK': f"USER#{user_id}",
+                'SK': 'METADATA',
+                'userName': f"user{number}",
+                'fullName': f"User {number}",
+                'email': f"user{number}@example.com",
+                'role': role,
+                'userRole': role
+            })
+
+        writer.put_item(Item={**user.ROLE_REGISTRY_KEY, 'roles': {'student', 'teacher'}})
+
+        attempt_ids = []
+        for number in range(attempt_count):
+            attempt_id = str(uuid.uuid4())
+            attempt_ids.append(attempt_id)
+            date_started = started + timedelta(days=number)
+            item = {
+                'PK': f"USER#{student_id}#QUIZ#{quiz_id}",
+                'SK': f"ATTEMPT#{attempt_id}",
+                'userId': student_id,
+                'quizId': quiz_id,
+                'attemptId': attempt_id,
+                'questionOrder': question_ids,
+                'currentQuestionId': question_ids[-1],
+                'progress': question_count - 1,
+                'score': 100 * (number % question_count),
+                'dateStarted': str(date_started),
+                'dateFinished': str(date_started + timedelta(minutes=5)),
+                'completedBy': student_id,
+                'completedAt': str(date_started + timedelta(minutes=5)),
+                'timeTakenSeconds': 300
+            }
+            # The last attempt is still in progress
+            if number == attempt_count - 1:
+                item.update(currentQuestionId=question_ids[0], progress=0, score=0)
+                for name in ('dateFinished', 'completedBy', 'completedAt', 'timeTakenSeconds'):
+                    del item[name]
+            writer.put_item(Item=item)
+
+    return student_id, quiz_id, attempt_ids
+
+
+def endpoints(student_id, quiz_id, attempt_ids):
+    in_progress = {'userId': student_id, 'quizId': quiz_id, 'attemptId': attempt_ids[-1]}
+    return [
+        ('get_all_users', user.get_all_users, {}),
+        ('list_students', user.list_students, {}),
+        ('get_user_by_id', user.get_user_by_id, {'pathParameters': {'userId': student_id}}),
+        ('get_quiz_by_id', quiz.get_quiz_by_id, {'pathParameters': {'quizId': quiz_id}}),
+        ('list_user_attempts', attempt.list_user_attempts, {'pathParameters': {'userId': student_id}}),
+        ('get_user_attempt', attempt.get_user_attempt, {'pathParameters': in_progress}),
+        ('get_attempt_details', attempt.get_user_attempt_details,
+         {'pathParameters': {'attemptId': attempt_ids[0]}}),
+        ('get_current_question', attempt.get_current_question, {'pathParameters': in_progress}),
+        ('get_user_answers', answer.get_user_answers, {'pathParameters': in_progress})
+    ]
+
+
+def no_projection(*attributes):
+    return {}
+
+
+@contextmanager
+def without_projections():
+    # Handlers import projection() by name, so it is swapped in every module
+    # that holds it for one that reads whole items
+    original = projection.projection
+    modules = [
+        module for module in list(sys.modules.values())
+        if module is not projection and getattr(module, 'projection', None) is original
+    ]
+    for module in modules:
+        module.projection = no_projection
+    try:
+        yield
+    finally:
+        for module in modules:
+            module.projection = original
+
+
+def measure(meter, handler, event):
+    # Warm the question bank cache so only the handler's own reads are counted
+    question_cache.clear()
+    if handler is attempt.get_current_question:
+        handler(event, None)
+
+    meter.reset()
+    response = handler(event, None)
+    return meter.read_capacity_units, meter.response_bytes, len(response['body'])
+
+
+def run(dynamodb, user_count, question_count, attempt_count):
+    table = ensure_table(dynamodb, indexes=(
+        'UserAttemptsIndex', 'AttemptIdIndex', 'UserRoleIndex', 'CompletedAttemptsIndex'))
+    client = use_resource(dynamodb)
+    meter = ReadMeter(dynamodb.meta.client, client)
+    student_id, quiz_id, attempt_ids = seed(table, user_count, question_count, attempt_count)
+
+    print(f"{'endpoint':<22} {'RCU before':>10} {'RCU after':>10} "
+          f"{'DynamoDB bytes before':>21} {'after':>8} {'body bytes before':>17} {'after':>8}")
+    report = {}
+    for name, handler, event in endpoints(student_id, quiz_id, attempt_ids):
+        with without_projections():
+            before = measure(meter, handler, event)
+        after = measure(meter, handler, event)
+        report[name] = {'before': before, 'after': after}
+
+        print(f"{name:<22} {before[0]:>10.1f} {after[0]:>10.1f} "
+              f"{before[1]:>21} {after[1]:>8} {before[2]:>17} {after[2]:>8}")
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure read capacity and response bytes per endpoint with and without projections')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--attempts', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='also print the report as JSON')
+    args = parser.parse_args()
+    result = run(connect(args.endpoint), args.users, args.questions, args.attempts)
+    if args.json:
+        print(json.dumps(result))
@@ -0,0 +1,212 @@
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import DEFAULT_ENDPOINT, connect, ensure_table, use_resource
+from question import question_item
+from quiz import quiz_metadata_item
+import answer
+import attempt
+import question
+import quiz
+import response_encoding
+import user
+
+# CPU time against bytes saved when compressing real response bodies. The
+# store is seeded with a quiz, its questions, a student's completed attempts
+# with their answers and a class of users, the handlers produce the bodies,
+# and every body is compressed at several gzip levels and brotli qualities
+# (when the brotli package is installed). Transfer time is estimated for a
+# slow school connection, so "total" shows whether a level pays for itself,
+# e.g.
+#   python -m benchmarks.response_compression --endpoint memory --bandwidth-kbps 1000
+
+GZIP_LEVELS = (1, 3, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 7, 9, 11)
+
+WORDS = (
+    'python function variable loop list dictionary class object method module '
+    'package import return value string integer float boolean exception error '
+    'network protocol server client request response database query index table '
+    'cloud storage bucket lambda container memory thread process kernel file '
+    'which what how does the a of in is are for to with from when following '
+    'correct keyword statement operator syntax compile runtime type instance'
+).split()
+
+
+def sentence(rng, low, high):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    return ' '.join(words).capitalize()
+
+
+def seed(table, rng, question_count, attempt_count, user_count):
+    quiz_id = str(uuid.uuid4())
+    student_id = str(uuid.uuid4())
+    question_ids = [str(uuid.uuid4()) for _ in range(question_count)]
+    questions = {}
+    started = datetime(2024, 1, 1, 9, 0)
+    attempt_ids = []
+
+    with table.batch_writer() as writer:
+        for number in range(100):
+            writer.put_item(Item=quiz_metadata_item(
+                str(uuid.uuid4()), f"{sentence(rng, 2, 4)} {number}", sentence(rng, 8, 20), 20))
+        writer.put_item(Item=quiz_metadata_item(
+            quiz_id, 'Compression benchmark', sentence(rng, 8, 20), question_count))
+
+        for question_id in question_ids:
+            options = [sentence(rng, 1, 6) for _ in range(4)]
+            questions[question_id] = {
+                'questionText': sentence(rng, 8, 25) + '?',
+                'options': options,
+                'correctAnswer': rng.choice(options)
+            }
+            writer.put_item(Item=question_item(quiz_id, question_id, questions[question_id]))
+
+        for number in range(attempt_count):
+            attempt_id = str(uuid.uuid4())
+            attempt_ids.append(attempt_id)
+            order = rng.sample(question_ids, len(question_ids))
+            date_started = started + timedelta(days=number, minutes=rng.randint(0, 600))
+            date_finished = date_started + timedelta(seconds=rng.randint(120, 1800))
+            writer.put_item(Item={
+                'PK': f"USER#{student_id}#QUIZ#{quiz_id}",
+                'SK': f"ATTEMPT#{attempt_id}",
+                'userId': student_id,
+                'quizId': quiz_id,
+                'attemptId': attempt_id,
+                'questionOrder': order,
+                'currentQuestionId': order[-1],
+                'progress': question_count - 1,
+                'score': 0,
+                'dateStarted': str(date_started),
+                'dateFinished': str(date_finished),
+                'completedBy': student_id,
+                'completedAt': str(date_finished),
+                'timeTakenSeconds': int((date_finished - date_started).total_seconds())
+            })
+            for question_id in order:
+                user_answer = rng.choice(questions[question_id]['options'])
+                writer.put_item(Item={
+                    'PK': f"USER#{student_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}",
+                    'SK': f"QUESTION#{question_id}",
+                    'userAnswer': user_answer,
+                    'status': 'pass' if user_answer == questions[question_id]['correctAnswer'] else 'fail'
+                })
+
+        for number in range(user_count):
+            role = 'teacher' if number % 25 == 0 else 'student'
+            first, last = rng.choice(WORDS).capitalize(), rng.choice(WORDS).capitalize()
+            writer.put_item(Item={
+                'PK': f"USER#{uuid.uuid4()}",
+                'SK': 'METADATA',
+                'userName': f"{first.lower()}.{last.lower()}{number}",
+                'fullName': f"{first} {last}",
+                'email': f"{first.lower()}.{last.lower()}{number}@school.example.com",
+                'role': role,
+                'userRole': role
+            })
+        writer.put_item(Item={**user.ROLE_REGISTRY_KEY, 'roles': {'student', 'teacher'}})
+
+    return quiz_id, student_id, attempt_ids
+
+
+def payloads(quiz_id, student_id, attempt_ids):
+    # (name, handler, event) of the responses students and teachers download most
+    attempt_path = {'userId': student_id, 'quizId': quiz_id, 'attemptId': attempt_ids[0]}
+    return [
+        ('get_questions_by_quiz', question.get_questions_by_quiz, {'pathParameters': {'quizId': quiz_id}}),
+        ('get_user_answers', answer.get_user_answers, {'pathParameters': attempt_path}),
+        ('get_user_attempt', attempt.get_user_attempt, {'pathParameters': attempt_path}),
+        ('list_user_attempts', attempt.list_user_attempts,
+         {'pathParameters': {'userId': student_id}, 'queryStringParameters': {'limit': '100'}}),
+        ('get_all_quizzes', quiz.get_all_quizzes, {'queryStringParameters': {'limit': '100'}}),
+        ('get_all_users', user.get_all_users, {'queryStringParameters': {'limit': '100'}}),
+        ('list_students', user.list_students, {'queryStringParameters': {'limit': '100'}})
+    ]
+
+
+def measure(compress, body, level, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compress(body, level)
+        samples.append(time.perf_counter() - start)
+    return len(compressed), statistics.median(samples)
+
+
+def settings():
+    levels = [('gzip', level) for level in GZIP_LEVELS]
+    if response_encoding.brotli is not None:
+        levels += [('br', quality) for quality in BROTLI_QUALITIES]
+    return levels
+
+
+def run(dynamodb, question_count, attempt_count, user_count, bandwidth_kbps, repeat, output):
+    table = ensure_table(dynamodb, indexes=(
+        'VisibleQuizIndex', 'UserRoleIndex', 'CompletedAttemptsIndex'))
+    use_resource(dynamodb)
+    rng = random.Random(7)
+    quiz_id, student_id, attempt_ids = seed(table, rng, question_count, attempt_count, user_count)
+    bytes_per_ms = bandwidth_kbps * 1000 / 8 / 1000
+
+    if response_encoding.brotli is None:
+        print('brotli is not installed, only gzip is measured (pip install brotli)')
+    print(f"transfer estimated at {bandwidth_kbps} kbit/s, compression is CPU time of one call (median of {repeat})")
+
+    report = {'bandwidthKbps': bandwidth_kbps, 'payloads': {}}
+    for name, handler, event in payloads(quiz_id, student_id, attempt_ids):
+        body = handler(event, None)['body'].encode('utf-8')
+        plain_transfer = len(body) / bytes_per_ms
+        rows = [{
+            'encoding': 'identity', 'level': None, 'bytes': len(body), 'ratio': 1.0,
+            'compressMs': 0.0, 'transferMs': plain_transfer, 'totalMs': plain_transfer
+        }]
+        for encoding, level in settings():
+            size, seconds = measure(response_encoding.ENCODERS[encoding], body, level, repeat)
+            transfer = size / bytes_per_ms
+            rows.append({
+                'encoding': encoding,
+                'level': level,
+                'bytes': size,
+                'ratio': len(body) / size,
+                'compressMs': seconds * 1000,
+                'transferMs': transfer,
+                'totalMs': seconds * 1000 + transfer
+            })
+        report['payloads'][name] = rows
+
+        print()
+        print(f"{name} ({len(body)} bytes)")
+        print(f"  {'encoding':<9} {'level':>5} {'bytes':>9} {'ratio':>6} {'compress ms':>12} "
+              f"{'MB/s':>8} {'transfer ms':>12} {'total ms':>9}")
+        for row in rows:
+            speed = len(body) / row['compressMs'] / 1000 if row['compressMs'] else float('inf')
+            print(f"  {row['encoding']:<9} {row['level'] if row['level'] is not None else '-':>5} "
+                  f"{row['bytes']:>9} {row['ratio']:>6.2f} {row['compressMs']:>12.3f} "
+                  f"{speed:>8.1f} {row['transferMs']:>12.1f} {row['totalMs']:>9.1f}")
+
+    if output:
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure CPU time and bytes of response compression at different levels')
+    parser.add_argument('--endpoint', default=DEFAULT_ENDPOINT)
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--attempts', type=int, default=100)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--bandwidth-kbps', type=float, default=1000,
+                        help='connection speed used to estimate transfer time')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    args = parser.parse_args()
+    run(connect(args.endpoint), args.questions, args.attempts, args.users,
+        args.bandwidth_kbps, args.repeat, args.output)
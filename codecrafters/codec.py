@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+# Converts between DynamoDB's wire format ({'N': '100'}, {'L': [...]}, ...)
+# and plain Python values in a single pass.
+# The boto3 resource layer turns every number into a Decimal, which the
+# handlers then had to walk again with convert_decimal before json.dumps.
+# Items decoded here are ready for json.dumps as they are: numbers become int
+# (or float when they have a fraction) and sets become lists.
+#
+# Use it with db.client, the low-level client that returns wire format.
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        number = float(text)
+        return int(number) if number.is_integer() else number
+
+
+def _map(value):
+    return {key: deserialize(item) for key, item in value.items()}
+
+
+def _list(value):
+    # Lists of strings, like an attempt's questionOrder, are decoded inline
+    return [item['S'] if 'S' in item else deserialize(item) for item in value]
+
+
+_DESERIALIZERS = {
+    'S': lambda value: value,
+    'N': _number,
+    'BOOL': lambda value: value,
+    'NULL': lambda value: None,
+    'M': _map,
+    'L': _list,
+    'SS': list,
+    'NS': lambda value: [_number(item) for item in value],
+    'B': lambda value: value,
+    'BS': list
+}
+
+
+def deserialize(value):
+    # value is one wire attribute value such as {'S': 'text'}. Strings are by
+    # far the most common type, so they skip the lookup.
+    for type_name, data in value.items():
+        if type_name == 'S':
+            return data
+        return _DESERIALIZERS[type_name](data)
+
+
+def deserialize_item(item):
+    return {key: deserialize(value) for key, value in item.items()}
+
+
+def deserialize_items(items):
+    return [{key: deserialize(value) for key, value in item.items()} for item in items]
+
+
+def serialize(value):
+    # bool is checked before int because True is an int too
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        return {'N': repr(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {key: serialize(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [serialize(item) for item in value]}
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(item, str) for item in value):
+            return {'SS': list(value)}
+        if all(isinstance(item, (bytes, bytearray)) for item in value):
+            return {'BS': [bytes(item) for item in value]}
+        return {'NS': [str(item) for item in value]}
+    raise TypeError(f"Unsupported DynamoDB type: {type(value).__name__}")
+
+
+def serialize_item(item):
+    return {key: serialize(value) for key, value in item.items()}
+
+
+def serialize_values(values):
+    # ExpressionAttributeValues, e.g. {':userId': 'u1'}
+    return {name: serialize(value) for name, value in values.items()}
@@ -0,0 +1,123 @@
+import os
+import threading
+from decimal import Decimal
+import boto3
+from botocore.config import Config
+from instrumentation import instrument_client
+
+# Shared DynamoDB access for every handler module.
+# Nothing is created at import time: the resource and the low-level client are
+# built on first use and then reused for the lifetime of the Lambda container,
+# so handlers that never touch DynamoDB do not pay for them and the import
+# phase of a cold start stays short.
+#
+# table and dynamodb are the boto3 resource layer, which works with Python
+# values and Decimal numbers. client is a plain low-level client that works
+# with DynamoDB's wire format; hot read paths pair it with codec.py to skip
+# the Decimal round trip.
+#
+# Both are hooked into instrumentation.py, which records the calls made by
+# every handler invocation.
+#
+# Set DYNAMODB_ENDPOINT to point every module at DynamoDB Local, e.g.
+#   DYNAMODB_ENDPOINT=http://localhost:8000 serverless offline
+
+TABLE_NAME = 'QuizTable'
+ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT') or None
+
+CLIENT_CONFIG = Config(
+    # Fail fast and let the retry policy try again instead of waiting for
+    # the Lambda timeout
+    connect_timeout=3,
+    read_timeout=10,
+    # Threaded batch writers and migrations share the client
+    max_pool_connections=25,
+    # Keep idle connections in the pool alive between warm invocations
+    tcp_keepalive=True,
+    retries={'mode': 'standard', 'max_attempts': 5}
+)
+
+_lock = threading.Lock()
+_resource = None
+_client = None
+_tables = {}
+
+
+def get_resource():
+    global _resource
+    if _resource is None:
+        with _lock:
+            if _resource is None:
+                resource = boto3.resource(
+                    'dynamodb', endpoint_url=ENDPOINT_URL, config=CLIENT_CONFIG)
+                instrument_client(resource.meta.client)
+                _resource = resource
+    return _resource
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = instrument_client(boto3.client(
+                    'dynamodb', endpoint_url=ENDPOINT_URL, config=CLIENT_CONFIG))
+    return _client
+
+
+def get_table(name=TABLE_NAME):
+    table = _tables.get(name)
+    if table is None:
+        table = get_resource().Table(name)
+        _tables[name] = table
+    return table
+
+
+def configure(endpoint_url=None, resource=None, client=None):
+    # Point every handler module at another endpoint or at existing resource
+    # and client objects. Used by the benchmarks; the next access builds
+    # whatever is missing.
+    global ENDPOINT_URL, _resource, _client
+    if resource is not None:
+        instrument_client(resource.meta.client)
+    if client is not None:
+        instrument_client(client)
+    with _lock:
+        ENDPOINT_URL = endpoint_url
+        _resource = resource
+        _client = client
+        _tables.clear()
+
+
+class _Lazy:
+    # Stands in for an object that is only created on first attribute access
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+# Handler modules use these like the resource and table they used to build
+dynamodb = _Lazy(get_resource)
+table = _Lazy(get_table)
+client = _Lazy(get_client)
+
+
+# DynamoDB often returns numeric fields as Decimal objects when using Python's boto3 library.
+# These Decimal objects are not directly serializable into JSON.
+# We use a helper function to convert Decimal to int/float.
+# Reads through client and codec.py do not need it.
+
+
+def convert_decimal(obj):
+    if isinstance(obj, list):
+        return [convert_decimal(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: convert_decimal(value) for key, value in obj.items()}
+    if isinstance(obj, Decimal):
+        # Convert Decimal to int if it's an integer value, otherwise float
+        return int(obj) if obj % 1 == 0 else float(obj)
+    else:
+        return obj
@@ -0,0 +1,231 @@
+import os
+import csv
+import sys
+import gzip
+import json
+import argparse
+import tempfile
+import boto3
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table, client
+import codec
+
+# Export of every attempt and answer of a quiz for teachers.
+# Attempts are paged through QuizAttemptsIndex and each attempt's answers are
+# paged from its own partition, and records are written as soon as they are
+# read, so memory use does not grow with the size of the class. Reads go
+# through the low-level client and codec, so records are JSON-ready as read.
+#
+# From the command line (run in the codecrafters directory):
+#   python export.py <quizId> --format csv --output results.csv.gz
+#   python export.py <quizId> --output s3://bucket/results.ndjson.gz --s3-endpoint http://localhost:9000
+
+QUIZ_ATTEMPTS_INDEX = 'QuizAttemptsIndex'
+FORMATS = ('ndjson', 'csv')
+CSV_COLUMNS = [
+    'type', 'attemptId', 'userId', 'score', 'progress', 'dateStarted',
+    'dateFinished', 'questionId', 'userAnswer', 'status'
+]
+
+
+@instrumented
+@encoded
+def export_quiz_results(event, context):
+    quiz_id = event['pathParameters']['quizId']
+    data = json.loads(event.get('body') or '{}')
+    export_format = data.get('format', 'ndjson')
+    bucket = os.environ.get('EXPORT_BUCKET')
+
+    if export_format not in FORMATS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f"format must be one of: {', '.join(FORMATS)}"})
+        }
+
+    if not bucket:
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'message': 'EXPORT_BUCKET is not configured'})
+        }
+
+    key = f"exports/{quiz_id}/{context.aws_request_id}.{export_format}.gz"
+    counts = export_to_s3(quiz_id, bucket, key, export_format)
+
+    return {
+        'statusCode': 201,
+        'body': json.dumps({
+            'message': 'Quiz results exported successfully',
+            'location': f"s3://{bucket}/{key}",
+            'attempts': counts['attempts'],
+            'answers': counts['answers']
+        })
+    }
+
+
+def iter_quiz_ids():
+    # IDs of every quiz, visible or not
+    scan_kwargs = {
+        'TableName': table.name,
+        'FilterExpression': 'SK = :metadata AND begins_with(PK, :prefix)',
+        'ExpressionAttributeValues': codec.serialize_values({
+            ':metadata': 'METADATA',
+            ':prefix': 'QUIZ#'
+        }),
+        'ProjectionExpression': 'PK'
+    }
+
+    while True:
+        response = client.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            yield item['PK']['S'].split('#')[1]
+
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_quiz_attempts(quiz_id):
+    query_kwargs = {
+        'TableName': table.name,
+        'IndexName': QUIZ_ATTEMPTS_INDEX,
+        'KeyConditionExpression': 'quizId = :quizId AND begins_with(SK, :prefix)',
+        'ExpressionAttributeValues': codec.serialize_values({
+            ':quizId': quiz_id,
+            ':prefix': 'ATTEMPT#'
+        })
+    }
+
+    while True:
+        response = client.query(**query_kwargs)
+        yield from codec.deserialize_items(response.get('Items', []))
+
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_attempt_answers(user_id, quiz_id, attempt_id):
+    query_kwargs = {
+        'TableName': table.name,
+        'KeyConditionExpression': 'PK = :pk',
+        'ExpressionAttributeValues': codec.serialize_values({
+            ':pk': f"USER#{user_id}#QUIZ#{quiz_id}#ATTEMPT#{attempt_id}"
+        })
+    }
+
+    while True:
+        response = client.query(**query_kwargs)
+        yield from codec.deserialize_items(response.get('Items', []))
+
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_export_records(quiz_id):
+    # One attempt record followed by that attempt's answer records
+    for attempt in iter_quiz_attempts(quiz_id):
+        attempt_id = attempt['SK'].split('#')[1]
+        user_id = attempt['userId']
+
+        yield {
+            'type': 'attempt',
+            'attemptId': attempt_id,
+            'userId': user_id,
+            'score': attempt.get('score', 0),
+            'progress': attempt.get('progress', 0),
+            'dateStarted': attempt.get('dateStarted'),
+            'dateFinished': attempt.get('dateFinished')
+        }
+
+        for answer in iter_attempt_answers(user_id, quiz_id, attempt_id):
+            yield {
+                'type': 'answer',
+                'attemptId': attempt_id,
+                'userId': user_id,
+                'questionId': answer['SK'].split('#')[1],
+                'userAnswer': answer.get('userAnswer'),
+                'status': answer.get('status')
+            }
+
+
+def write_records(records, stream, export_format):
+    # Write records to a text stream and return how many of each type were written
+    counts = {'attempts': 0, 'answers': 0}
+
+    if export_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+
+    for record in records:
+        if export_format == 'csv':
+            # Lists (multiple correct answers) are kept as JSON inside the cell
+            writer.writerow({
+                column: json.dumps(value) if isinstance(value, list) else value
+                for column, value in record.items()
+            })
+        else:
+            stream.write(json.dumps(record) + '\n')
+
+        counts['attempts' if record['type'] == 'attempt' else 'answers'] += 1
+
+    return counts
+
+
+def export_to_file(quiz_id, path, export_format='ndjson', compress=None):
+    # Compress when asked to, or when the file name ends with .gz
+    if compress is None:
+        compress = path.endswith('.gz')
+
+    if compress:
+        stream = gzip.open(path, 'wt', encoding='utf-8', newline='')
+    else:
+        stream = open(path, 'w', encoding='utf-8', newline='')
+
+    with stream:
+        return write_records(iter_export_records(quiz_id), stream, export_format)
+
+
+def export_to_s3(quiz_id, bucket, key, export_format='ndjson', s3_endpoint=None):
+    # Lambda only allows writing to /tmp; the gzip file is streamed to S3 from there
+    s3 = boto3.client('s3', endpoint_url=s3_endpoint)
+
+    with tempfile.NamedTemporaryFile(suffix='.gz') as temporary_file:
+        counts = export_to_file(quiz_id, temporary_file.name, export_format, compress=True)
+        s3.upload_file(
+            temporary_file.name,
+            bucket,
+            key,
+            ExtraArgs={
+                'ContentType': 'text/csv' if export_format == 'csv' else 'application/x-ndjson',
+                'ContentEncoding': 'gzip'
+            }
+        )
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export all attempts and answers of a quiz')
+    parser.add_argument('quiz_id')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson')
+    parser.add_argument('--output', default='-',
+                        help='file path, s3://bucket/key, or - for stdout')
+    parser.add_argument('--s3-endpoint', help='endpoint of an S3-compatible store')
+    args = parser.parse_args(argv)
+
+    if args.output == '-':
+        counts = write_records(iter_export_records(args.quiz_id), sys.stdout, args.format)
+    elif args.output.startswith('s3://'):
+        bucket, _, key = args.output[len('s3://'):].partition('/')
+        counts = export_to_s3(args.quiz_id, bucket, key, args.format, args.s3_endpoint)
+    else:
+        counts = export_to_file(args.quiz_id, args.output, args.format)
+
+    print(f"Exported {counts['attempts']} attempts and {counts['answers']} answers",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
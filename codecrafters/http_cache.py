@@ -0,0 +1,88 @@
+import os
+import json
+import hashlib
+from db import table
+
+# Conditional GET for quiz content, which changes far less often than it is
+# read. Responses carry an ETag built from a version number stored in the
+# table, so a handler can answer If-None-Match from that number alone and
+# return 304 without running the reads behind the body:
+#   - a quiz and its questions use the version attribute of the quiz
+#     metadata, bumped by every change to the quiz or its questions;
+#   - the quiz catalog uses the CATALOG#QUIZ version item, bumped whenever a
+#     quiz is created, renamed, shown or hidden.
+# Cache-Control lets browsers (and API Gateway caching, when enabled on the
+# stage) reuse a response for MAX_AGE_SECONDS before revalidating it.
+
+MAX_AGE_SECONDS = int(os.environ.get('HTTP_CACHE_MAX_AGE', '60'))
+CATALOG_VERSION_KEY = {'PK': 'CATALOG#QUIZ', 'SK': 'VERSION'}
+
+
+def make_etag(*parts):
+    # Same parts, same ETag, in every container
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def get_header(event, name):
+    # API Gateway passes headers with the case the client used
+    headers = event.get('headers') or {}
+    name = name.lower()
+    for header, value in headers.items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def is_not_modified(event, etag):
+    # Weak comparison, since a compressed response may come back as W/"..."
+    if_none_match = get_header(event, 'If-None-Match')
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def cache_headers(etag):
+    return {
+        'ETag': etag,
+        'Cache-Control': f"public, max-age={MAX_AGE_SECONDS}"
+    }
+
+
+def not_modified_response(etag):
+    return {
+        'statusCode': 304,
+        'headers': cache_headers(etag),
+        'body': ''
+    }
+
+
+def cached_response(body, etag):
+    return {
+        'statusCode': 200,
+        'headers': cache_headers(etag),
+        'body': json.dumps(body)
+    }
+
+
+def get_catalog_version():
+    response = table.get_item(
+        Key=CATALOG_VERSION_KEY,
+        ProjectionExpression='#version',
+        ExpressionAttributeNames={'#version': 'version'}
+    )
+    return response.get('Item', {}).get('version', 0)
+
+
+def bump_catalog_version():
+    # Called after every write that changes what the catalog lists
+    table.update_item(
+        Key=CATALOG_VERSION_KEY,
+        UpdateExpression='ADD version :one',
+        ExpressionAttributeValues={':one': 1}
+    )
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from functools import wraps
+
+# DynamoDB instrumentation for the Lambda handlers.
+# Every handler is wrapped with @instrumented. While a sampled invocation
+# runs, each DynamoDB call made through the shared clients in db.py is
+# recorded: operation, table and index, latency, consumed read and write
+# capacity units (ReturnConsumedCapacity is asked for on the way out), items
+# returned and response bytes. When the handler returns, one JSON line is
+# written to the log in CloudWatch Embedded Metric Format, so CloudWatch turns
+# it into per-handler metrics without any extra API call, e.g.
+#
+#   {"_aws": {...}, "Service": "codecrafters", "Handler": "quiz.get_all_quizzes",
+#    "DynamoDBCalls": 1, "ReadCapacityUnits": 0.5, ..., "operations": {...}, "calls": [...]}
+#
+# summary() adds up every sampled invocation of the container per handler,
+# and is logged as one more JSON line ({"Service": ..., "summary": {...}})
+# after every DYNAMODB_METRICS_SUMMARY_EVERY sampled invocations (default 100,
+# 0 turns it off).
+#
+# DYNAMODB_METRICS_SAMPLE_RATE (0 to 1, default 1) is the share of
+# invocations that are recorded; lower it on busy stages. Invocations that are not sampled only pay for
+# one random() call and a dictionary lookup per DynamoDB call.
+#
+# Calls made from worker threads of a handler (batch writes, parallel scan
+# segments) are counted too: a call made outside any invocation's own thread
+# goes to the only running invocation, which is always the case in Lambda.
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CodeCrafters')
+SERVICE_NAME = os.environ.get('SERVICE_NAME', 'codecrafters')
+SAMPLE_RATE = float(os.environ.get('DYNAMODB_METRICS_SAMPLE_RATE', '1'))
+SUMMARY_EVERY = int(os.environ.get('DYNAMODB_METRICS_SUMMARY_EVERY', '100'))
+# Longer invocations (deletions, migrations) log their totals but only the
+# first calls one by one
+MAX_LOGGED_CALLS = 50
+WRITE_OPERATIONS = {
+    'PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems'
+}
+METRICS = (
+    ('DynamoDBCalls', 'Count'),
+    ('DynamoDBErrors', 'Count'),
+    ('DynamoDBLatency', 'Milliseconds'),
+    ('ReadCapacityUnits', 'Count'),
+    ('WriteCapacityUnits', 'Count'),
+    ('ItemsReturned', 'Count'),
+    ('ResponseBytes', 'Bytes')
+)
+CALL_CONTEXT_KEY = 'dynamodbCall'
+
+_lock = threading.Lock()
+_local = threading.local()
+_running = set()
+_totals = {}
+_sampled = 0
+_cold_start = True
+
+
+class Invocation:
+    def __init__(self, handler_name, request_id=None):
+        self.handler_name = handler_name
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, call):
+        with self.lock:
+            self.calls.append(call)
+
+    def operations(self):
+        # Totals per DynamoDB operation
+        operations = {}
+        for call in self.calls:
+            totals = operations.setdefault(call['operation'], {
+                'calls': 0, 'errors': 0, 'latencyMs': 0.0, 'readCapacityUnits': 0.0,
+                'writeCapacityUnits': 0.0, 'items': 0, 'bytes': 0
+            })
+            totals['calls'] += 1
+            totals['errors'] += 1 if call['error'] else 0
+            totals['latencyMs'] += call['latencyMs']
+            totals['readCapacityUnits'] += call['readCapacityUnits']
+            totals['writeCapacityUnits'] += call['writeCapacityUnits']
+            totals['items'] += call['items']
+            totals['bytes'] += call['bytes']
+        for totals in operations.values():
+            totals['latencyMs'] = round(totals['latencyMs'], 2)
+        return operations
+
+    def metrics(self):
+        return {
+            'DynamoDBCalls': len(self.calls),
+            'DynamoDBErrors': sum(1 for call in self.calls if call['error']),
+            'DynamoDBLatency': round(sum(call['latencyMs'] for call in self.calls), 2),
+            'ReadCapacityUnits': sum(call['readCapacityUnits'] for call in self.calls),
+            'WriteCapacityUnits': sum(call['writeCapacityUnits'] for call in self.calls),
+            'ItemsReturned': sum(call['items'] for call in self.calls),
+            'ResponseBytes': sum(call['bytes'] for call in self.calls)
+        }
+
+    def log_record(self, status_code=None, error=None, cold_start=False):
+        with self.lock:
+            metrics = self.metrics()
+            return {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': NAMESPACE,
+                        'Dimensions': [['Service', 'Handler']],
+                        'Metrics': [{'Name': name, 'Unit': unit} for name, unit in METRICS]
+                    }]
+                },
+                'Service': SERVICE_NAME,
+                'Handler': self.handler_name,
+                **metrics,
+                'requestId': self.request_id,
+                'coldStart': cold_start,
+                'durationMs': round((time.perf_counter() - self.started) * 1000, 2),
+                'statusCode': status_code,
+                'error': error,
+                'sampleRate': SAMPLE_RATE,
+                'operations': self.operations(),
+                'calls': self.calls[:MAX_LOGGED_CALLS],
+                'callsOmitted': max(len(self.calls) - MAX_LOGGED_CALLS, 0)
+            }
+
+
+def current_invocation():
+    invocation = getattr(_local, 'invocation', None)
+    if invocation is not None:
+        return invocation
+    # Worker threads of a handler
+    if len(_running) == 1:
+        for invocation in _running:
+            return invocation
+    return None
+
+
+def instrumented(handler):
+    handler_name = f"{handler.__module__}.{handler.__name__}"
+
+    @wraps(handler)
+    def wrapper(event, context):
+        global _cold_start
+        # Handlers called by other handlers are part of the outer invocation
+        if getattr(_local, 'invocation', None) is not None or random.random() >= SAMPLE_RATE:
+            return handler(event, context)
+
+        invocation = Invocation(handler_name, getattr(context, 'aws_request_id', None))
+        with _lock:
+            cold_start, _cold_start = _cold_start, False
+            _running.add(invocation)
+        _local.invocation = invocation
+
+        status_code = None
+        error = None
+        try:
+            response = handler(event, context)
+            if isinstance(response, dict):
+                status_code = response.get('statusCode')
+            return response
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _local.invocation = None
+            with _lock:
+                _running.discard(invocation)
+            record = invocation.log_record(status_code, error, cold_start)
+            sampled = add_to_summary(record)
+            emit(record)
+            if SUMMARY_EVERY and sampled % SUMMARY_EVERY == 0:
+                emit({'Service': SERVICE_NAME, 'summary': summary()})
+
+    return wrapper
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record, default=str) + '\n')
+    sys.stdout.flush()
+
+
+def add_to_summary(record):
+    # Returns the number of invocations sampled in this container so far
+    global _sampled
+    with _lock:
+        _sampled += 1
+        totals = _totals.setdefault(record['Handler'], {
+            'invocations': 0, 'errors': 0, 'durationMs': 0.0,
+            **{name: 0 for name, _ in METRICS}
+        })
+        totals['invocations'] += 1
+        totals['errors'] += 1 if record['error'] else 0
+        totals['durationMs'] += record['durationMs']
+        for name, _ in METRICS:
+            totals[name] += record[name]
+        return _sampled
+
+
+def summary():
+    # Totals and per-invocation averages of every handler sampled in this container
+    with _lock:
+        handlers = {}
+        for handler_name, totals in sorted(_totals.items()):
+            invocations = totals['invocations']
+            handlers[handler_name] = {
+                **totals,
+                'durationMs': round(totals['durationMs'], 2),
+                'DynamoDBLatency': round(totals['DynamoDBLatency'], 2),
+                'perInvocation': {
+                    name: round(totals[name] / invocations, 2) for name, _ in METRICS
+                }
+            }
+        return {'sampleRate': SAMPLE_RATE, 'handlers': handlers}
+
+
+def reset_summary():
+    global _sampled
+    with _lock:
+        _totals.clear()
+        _sampled = 0
+
+
+def instrument_client(client):
+    # Hooks a low-level client (or the one behind a resource) into the
+    # instrumentation. Registering twice is harmless.
+    events = client.meta.events
+    events.register('before-parameter-build.dynamodb', _start_call,
+                    unique_id='instrumentation-start-call')
+    events.register('after-call.dynamodb', _finish_call,
+                    unique_id='instrumentation-finish-call')
+    events.register('after-call-error.dynamodb', _failed_call,
+                    unique_id='instrumentation-failed-call')
+    return client
+
+
+def _start_call(params, model, context, **kwargs):
+    invocation = current_invocation()
+    if invocation is None:
+        return
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+    context[CALL_CONTEXT_KEY] = (invocation, {
+        'operation': model.name,
+        'table': params.get('TableName'),
+        'index': params.get('IndexName'),
+        'started': time.perf_counter()
+    })
+
+
+def _finish_call(http_response, parsed, model, context, **kwargs):
+    started_call = context.pop(CALL_CONTEXT_KEY, None)
+    if started_call is None:
+        return
+    invocation, call = started_call
+    read_units, write_units = consumed_units(parsed.get('ConsumedCapacity'), model.name)
+    invocation.record({
+        'operation': call['operation'],
+        'table': call['table'] or _first_table(parsed),
+        'index': call['index'],
+        'latencyMs': round((time.perf_counter() - call['started']) * 1000, 3),
+        'readCapacityUnits': read_units,
+        'writeCapacityUnits': write_units,
+        'items': items_returned(parsed),
+        'bytes': response_bytes(http_response),
+        'error': parsed.get('Error', {}).get('Code')
+    })
+
+
+def _failed_call(exception, context, **kwargs):
+    # No response at all, e.g. a connection error after all retries
+    started_call = context.pop(CALL_CONTEXT_KEY, None)
+    if started_call is None:
+        return
+    invocation, call = started_call
+    invocation.record({
+        'operation': call['operation'],
+        'table': call['table'],
+        'index': call['index'],
+        'latencyMs': round((time.perf_counter() - call['started']) * 1000, 3),
+        'readCapacityUnits': 0.0,
+        'writeCapacityUnits': 0.0,
+        'items': 0,
+        'bytes': 0,
+        'error': type(exception).__name__
+    })
+
+
+def consumed_units(consumed, operation_name):
+    # (read units, write units) from a ConsumedCapacity entry or list of entries
+    if not consumed:
+        return 0.0, 0.0
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+
+    read_units = write_units = 0.0
+    for entry in consumed:
+        if 'ReadCapacityUnits' in entry or 'WriteCapacityUnits' in entry:
+            read_units += float(entry.get('ReadCapacityUnits', 0))
+            write_units += float(entry.get('WriteCapacityUnits', 0))
+        elif operation_name in WRITE_OPERATIONS:
+            write_units += float(entry.get('CapacityUnits', 0))
+        else:
+            read_units += float(entry.get('CapacityUnits', 0))
+    return read_units, write_units
+
+
+def items_returned(parsed):
+    if 'Items' in parsed:
+        return len(parsed['Items'])
+    if 'Item' in parsed:
+        return 1
+    responses = parsed.get('Responses')
+    if isinstance(responses, dict):
+        # BatchGetItem
+        return sum(len(items) for items in responses.values())
+    if isinstance(responses, list):
+        # TransactGetItems
+        return sum(1 for response in responses if response.get('Item'))
+    return 0
+
+
+def response_bytes(http_response):
+    length = http_response.headers.get('content-length')
+    if length is not None:
+        return int(length)
+    return len(http_response.content or b'')
+
+
+def _first_table(parsed):
+    consumed = parsed.get('ConsumedCapacity')
+    if isinstance(consumed, list) and consumed:
+        return consumed[0].get('TableName')
+    return None
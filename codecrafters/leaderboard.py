@@ -0,0 +1,209 @@
+import json
+from boto3.dynamodb.conditions import Key
+from attempt import ATTEMPT_ID_INDEX, time_taken_seconds
+from export import iter_quiz_ids, iter_quiz_attempts
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table, client, convert_decimal
+import codec
+
+# Per-quiz leaderboard of completed attempts.
+# Every completed attempt gets an entry in the LEADERBOARD#QUIZ#{quizId}
+# partition whose sort key orders by score (highest first) and then by time
+# taken (fastest first), so the top K is a single query and the rank of an
+# attempt is a count of the entries sorted before it.
+
+DEFAULT_TOP = 20
+MAX_TOP = 100
+# Scores are stored inverted so an ascending sort key lists the highest first
+SCORE_CEILING = 10 ** 12
+
+
+def leaderboard_pk(quiz_id):
+    return f"LEADERBOARD#QUIZ#{quiz_id}"
+
+
+def ranking_key(score, seconds, attempt_id):
+    return f"{SCORE_CEILING - int(score):013d}#{int(seconds):010d}#{attempt_id}"
+
+
+def entry_item(quiz_id, user_id, attempt_id, score, date_started, date_finished):
+    # The attempt ID is only kept in the sort key: an attemptId attribute
+    # would add the entry to the sparse AttemptIdIndex
+    # Attempts without a start time rank as if taken in no time
+    seconds = time_taken_seconds(date_started, date_finished) or 0
+    return {
+        'PK': leaderboard_pk(quiz_id),
+        'SK': ranking_key(score, seconds, attempt_id),
+        'userId': user_id,
+        'score': score,
+        'timeTakenSeconds': seconds,
+        'dateFinished': date_finished
+    }
+
+
+def record_completion(quiz_id, user_id, attempt_id, score, date_started, date_finished):
+    # Called once an attempt has its dateFinished set
+    table.put_item(Item=entry_item(
+        quiz_id, user_id, attempt_id, score, date_started, date_finished))
+
+
+def entry_response(item, rank):
+    return {
+        'rank': rank,
+        'userId': item['userId'],
+        'attemptId': item['SK'].split('#')[2],
+        'score': item['score'],
+        'timeTakenSeconds': item['timeTakenSeconds'],
+        'dateFinished': item['dateFinished']
+    }
+
+
+@instrumented
+@encoded
+def get_leaderboard(event, context):
+    quiz_id = event['pathParameters']['quizId']
+    raw_limit = (event.get('queryStringParameters') or {}).get('limit', DEFAULT_TOP)
+
+    try:
+        limit = min(max(int(raw_limit), 1), MAX_TOP)
+    except (TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'limit must be an integer'})
+        }
+
+    response = client.query(
+        TableName=table.name,
+        KeyConditionExpression='PK = :pk',
+        ExpressionAttributeValues=codec.serialize_values({':pk': leaderboard_pk(quiz_id)}),
+        Limit=limit
+    )
+    items = codec.deserialize_items(response.get('Items', []))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'quizId': quiz_id,
+            'entries': [entry_response(item, rank) for rank, item in enumerate(items, start=1)]
+        })
+    }
+
+
+@instrumented
+@encoded
+def get_attempt_rank(event, context):
+    quiz_id = event['pathParameters']['quizId']
+    attempt_id = event['pathParameters']['attemptId']
+
+    response = table.query(
+        IndexName=ATTEMPT_ID_INDEX,
+        KeyConditionExpression=Key('attemptId').eq(attempt_id)
+    )
+    attempts = response.get('Items', [])
+
+    if not attempts or attempts[0].get('quizId') != quiz_id:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'Attempt not found'})
+        }
+
+    attempt = attempts[0]
+    if not isinstance(attempt.get('dateFinished'), str):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'Attempt is not completed'})
+        }
+
+    item = convert_decimal(entry_item(
+        quiz_id, attempt['userId'], attempt_id, attempt.get('score', 0),
+        attempt['dateStarted'], attempt['dateFinished']))
+
+    # Count the entries ranked ahead of this attempt
+    ahead = count_entries(quiz_id, before_key=item['SK'])
+    total = count_entries(quiz_id)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'quizId': quiz_id,
+            'entry': entry_response(item, ahead + 1),
+            'totalEntries': total
+        })
+    }
+
+
+def count_entries(quiz_id, before_key=None):
+    key_condition = Key('PK').eq(leaderboard_pk(quiz_id))
+    if before_key:
+        key_condition = key_condition & Key('SK').lt(before_key)
+
+    count = 0
+    query_kwargs = {
+        'KeyConditionExpression': key_condition,
+        'Select': 'COUNT'
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        count += response['Count']
+
+        if 'LastEvaluatedKey' not in response:
+            return count
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def rebuild_quiz_leaderboard(quiz_id):
+    # Replace the quiz's leaderboard with entries for every completed attempt
+    existing_keys = []
+    query_kwargs = {
+        'KeyConditionExpression': Key('PK').eq(leaderboard_pk(quiz_id)),
+        'ProjectionExpression': 'PK, SK'
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        existing_keys.extend(response.get('Items', []))
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    entries = {}
+    for attempt in iter_quiz_attempts(quiz_id):
+        if not isinstance(attempt.get('dateFinished'), str) or not attempt.get('dateStarted'):
+            continue
+        item = entry_item(
+            quiz_id, attempt['userId'], attempt['SK'].split('#')[1],
+            attempt.get('score', 0), attempt['dateStarted'], attempt['dateFinished'])
+        entries[item['SK']] = item
+
+    with table.batch_writer() as writer:
+        for key in existing_keys:
+            if key['SK'] not in entries:
+                writer.delete_item(Key=key)
+        for item in entries.values():
+            writer.put_item(Item=item)
+
+    return len(entries)
+
+
+@instrumented
+@encoded
+def rebuild_leaderboards(event, context):
+    # Rebuild the leaderboard of one quiz ({"quizId": ...}) or of every quiz
+    try:
+        data = json.loads(event.get('body') or '{}')
+        quiz_ids = [data['quizId']] if data.get('quizId') else list(iter_quiz_ids())
+
+        entries = sum(rebuild_quiz_leaderboard(quiz_id) for quiz_id in quiz_ids)
+
+        return {
+            'statusCode': 200,
+            'body': f"Leaderboard rebuild completed successfully. Rebuilt {entries} entries in {len(quiz_ids)} quizzes."
+        }
+
+    except Exception as e:
+        print(f"Error rebuilding leaderboards: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': f"Error rebuilding leaderboards: {str(e)}"
+        }
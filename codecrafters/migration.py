@@ -0,0 +1,249 @@
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Engine for one-off data migrations over the whole QuizTable.
+# The table is split into scan segments (Segment / TotalSegments) that are
+# processed in parallel, each following LastEvaluatedKey to the end. After every
+# page a segment saves its position in a MIGRATION#{name} checkpoint item, so
+# a run that is about to hit the Lambda timeout stops cleanly and the next
+# invocation carries on from there; invoking a finished migration starts it
+# over. Reads and writes can be throttled against the capacity DynamoDB
+# reports as consumed.
+#
+# process_item(client, item) gets a thread-safe low-level client (with
+# the resource layer's type conversion) and returns the response of the write
+# it made, or None when the item needed no change. Pass
+# ReturnConsumedCapacity='TOTAL' on that write to have it rate limited.
+
+DEFAULT_TOTAL_SEGMENTS = 4
+# Stop this long before the Lambda timeout to save checkpoints
+DEADLINE_MARGIN_SECONDS = 5
+
+
+class RateLimiter:
+    # Token bucket refilled with capacity units per second. Requests wait until
+    # the bucket is not in debt and then pay for what they actually consumed.
+
+    def __init__(self, units_per_second):
+        self.units_per_second = units_per_second
+        self.tokens = units_per_second or 0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.units_per_second:
+            return
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 0:
+                    return
+                missing = -self.tokens
+            time.sleep(missing / self.units_per_second)
+
+    def consume(self, units):
+        if not self.units_per_second:
+            return
+
+        with self.lock:
+            self._refill()
+            self.tokens -= units
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.units_per_second,
+            self.tokens + (now - self.updated_at) * self.units_per_second)
+        self.updated_at = now
+
+
+class Migration:
+    def __init__(self, table, name, process_item, scan_kwargs=None,
+                 total_segments=DEFAULT_TOTAL_SEGMENTS, max_workers=None,
+                 read_capacity_per_second=None, write_capacity_per_second=None,
+                 context=None):
+        self.table = table
+        self.client = table.meta.client  # clients are thread-safe, resources are not
+        self.name = name
+        self.process_item = process_item
+        self.scan_kwargs = scan_kwargs or {}
+        self.total_segments = total_segments
+        self.max_workers = max_workers or total_segments
+        self.read_limiter = RateLimiter(read_capacity_per_second)
+        self.write_limiter = RateLimiter(write_capacity_per_second)
+        self.deadline = None
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            self.deadline = (time.monotonic()
+                             + context.get_remaining_time_in_millis() / 1000
+                             - DEADLINE_MARGIN_SECONDS)
+
+        self.lock = threading.Lock()
+        self.totals = {
+            'scanned': 0,
+            'updated': 0,
+            'readCapacityUnits': 0.0,
+            'writeCapacityUnits': 0.0
+        }
+
+    def checkpoint_key(self, segment):
+        return {
+            'PK': f"MIGRATION#{self.name}",
+            'SK': f"SEGMENT#{segment:04d}"
+        }
+
+    def load_checkpoint(self, segment):
+        item = self.client.get_item(
+            TableName=self.table.name,
+            Key=self.checkpoint_key(segment),
+            ConsistentRead=True
+        ).get('Item')
+
+        # A checkpoint from a run with another segment count does not apply
+        if not item or int(item.get('totalSegments', 0)) != self.total_segments:
+            return {'lastEvaluatedKey': None, 'done': False, 'scanned': 0, 'updated': 0}
+
+        return {
+            'lastEvaluatedKey': json.loads(item['lastEvaluatedKey']) if item.get('lastEvaluatedKey') else None,
+            'done': item.get('done', False),
+            'scanned': int(item.get('scanned', 0)),
+            'updated': int(item.get('updated', 0))
+        }
+
+    def save_checkpoint(self, segment, checkpoint):
+        self.client.put_item(
+            TableName=self.table.name,
+            Item={
+                **self.checkpoint_key(segment),
+                'totalSegments': self.total_segments,
+                # Stored as JSON text, all table keys are strings
+                'lastEvaluatedKey': json.dumps(checkpoint['lastEvaluatedKey'], default=str)
+                if checkpoint['lastEvaluatedKey'] else None,
+                'done': checkpoint['done'],
+                'scanned': checkpoint['scanned'],
+                'updated': checkpoint['updated'],
+                'updatedAt': str(time.time())
+            }
+        )
+
+    def reset(self):
+        for segment in range(self.total_segments):
+            self.client.delete_item(TableName=self.table.name, Key=self.checkpoint_key(segment))
+
+    def out_of_time(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def run_segment(self, segment, checkpoint):
+        while not checkpoint['done'] and not self.out_of_time():
+            scan_kwargs = dict(
+                self.scan_kwargs,
+                TableName=self.table.name,
+                Segment=segment,
+                TotalSegments=self.total_segments,
+                ReturnConsumedCapacity='TOTAL'
+            )
+            if checkpoint['lastEvaluatedKey']:
+                scan_kwargs['ExclusiveStartKey'] = checkpoint['lastEvaluatedKey']
+
+            self.read_limiter.wait()
+            response = self.client.scan(**scan_kwargs)
+            read_units = response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+            self.read_limiter.consume(read_units)
+
+            scanned = response.get('ScannedCount', 0)
+            updated = 0
+            write_units = 0
+            for item in response.get('Items', []):
+                self.write_limiter.wait()
+                result = self.process_item(self.client, item)
+                if result is not None:
+                    updated += 1
+                    units = result.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+                    write_units += units
+                    self.write_limiter.consume(units)
+
+            checkpoint['lastEvaluatedKey'] = response.get('LastEvaluatedKey')
+            checkpoint['done'] = not checkpoint['lastEvaluatedKey']
+            checkpoint['scanned'] += scanned
+            checkpoint['updated'] += updated
+            self.save_checkpoint(segment, checkpoint)
+
+            with self.lock:
+                self.totals['scanned'] += scanned
+                self.totals['updated'] += updated
+                self.totals['readCapacityUnits'] += read_units
+                self.totals['writeCapacityUnits'] += write_units
+
+        return checkpoint
+
+    def run(self):
+        started = time.monotonic()
+        segments = range(self.total_segments)
+        checkpoints = [self.load_checkpoint(segment) for segment in segments]
+
+        # A finished migration that is invoked again starts over
+        if all(checkpoint['done'] for checkpoint in checkpoints):
+            checkpoints = [
+                {'lastEvaluatedKey': None, 'done': False, 'scanned': 0, 'updated': 0}
+                for _ in segments
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            checkpoints = list(pool.map(self.run_segment, segments, checkpoints))
+
+        elapsed = time.monotonic() - started
+        segments_done = sum(1 for checkpoint in checkpoints if checkpoint['done'])
+        report = {
+            'migration': self.name,
+            'complete': segments_done == self.total_segments,
+            'segmentsDone': segments_done,
+            'totalSegments': self.total_segments,
+            # This run only
+            'scanned': self.totals['scanned'],
+            'updated': self.totals['updated'],
+            'readCapacityUnits': round(self.totals['readCapacityUnits'], 1),
+            'writeCapacityUnits': round(self.totals['writeCapacityUnits'], 1),
+            'elapsedSeconds': round(elapsed, 2),
+            'itemsPerSecond': round(self.totals['scanned'] / elapsed, 1) if elapsed else None,
+            # All runs since the migration started
+            'totalScanned': sum(checkpoint['scanned'] for checkpoint in checkpoints),
+            'totalUpdated': sum(checkpoint['updated'] for checkpoint in checkpoints)
+        }
+        print(json.dumps(report))
+        return report
+
+
+def run_migration_handler(table, name, process_item, scan_kwargs, event, context):
+    # Shared Lambda entry point. The optional JSON body accepts totalSegments,
+    # readCapacityPerSecond, writeCapacityPerSecond and reset (start over).
+    try:
+        data = json.loads((event or {}).get('body') or '{}')
+        migration = Migration(
+            table,
+            name,
+            process_item,
+            scan_kwargs,
+            total_segments=int(data.get('totalSegments', DEFAULT_TOTAL_SEGMENTS)),
+            read_capacity_per_second=data.get('readCapacityPerSecond'),
+            write_capacity_per_second=data.get('writeCapacityPerSecond'),
+            context=context
+        )
+        if data.get('reset'):
+            migration.reset()
+
+        report = migration.run()
+
+        # 202 tells the caller to invoke again to resume from the checkpoints
+        return {
+            'statusCode': 200 if report['complete'] else 202,
+            'body': json.dumps(report)
+        }
+
+    except Exception as e:
+        print(f"Error running migration {name}: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': f"Error running migration {name}: {str(e)}"
+        }
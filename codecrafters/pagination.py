@@ -0,0 +1,106 @@
+import json
+import base64
+import binascii
+from botocore.exceptions import ClientError, ParamValidationError
+
+# Shared helpers for cursor pagination on list endpoints.
+# DynamoDB returns a LastEvaluatedKey when a query stops early; we hand it
+# back to the client as an opaque nextToken and resume from it on the next call.
+# Tokens come back from clients, so a token that is not a key of the index, or
+# that DynamoDB rejects as a start key, is reported as a 400 like a bad limit.
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+class InvalidPaginationParameter(ValueError):
+    pass
+
+
+def get_query_parameters(event):
+    # API Gateway sends None instead of {} when there is no query string
+    return event.get('queryStringParameters') or {}
+
+
+def get_limit(event, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    raw_limit = get_query_parameters(event).get('limit')
+    if raw_limit is None:
+        return default
+
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise InvalidPaginationParameter('limit must be an integer')
+
+    if limit < 1:
+        raise InvalidPaginationParameter('limit must be greater than 0')
+
+    return min(limit, maximum)
+
+
+def encode_token(last_evaluated_key):
+    if not last_evaluated_key:
+        return None
+
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    if not token:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(token.encode('ascii'))
+        key = json.loads(raw)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidPaginationParameter('nextToken is invalid')
+
+    if not isinstance(key, dict):
+        raise InvalidPaginationParameter('nextToken is invalid')
+
+    return key
+
+
+def is_key_value(value):
+    # A string or number, or the same in wire format ({"S": ...} / {"N": ...})
+    if isinstance(value, dict):
+        return len(value) == 1 and isinstance(value.get('S', value.get('N')), str)
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def check_start_key(key, key_attributes):
+    # A LastEvaluatedKey of an index holds the table and index key attributes
+    if set(key) != set(key_attributes) or not all(is_key_value(value) for value in key.values()):
+        raise InvalidPaginationParameter('nextToken is invalid')
+    return key
+
+
+def get_start_key(event, key_attributes=None):
+    key = decode_token(get_query_parameters(event).get('nextToken'))
+    if key and key_attributes:
+        check_start_key(key, key_attributes)
+    return key
+
+
+def query_page(query, start_key=None, **query_kwargs):
+    # table.query or client.query, resumed from start_key. A start key that
+    # does not belong to the query (another partition, a stale token) is
+    # rejected by DynamoDB or botocore, which is the client's mistake.
+    if not start_key:
+        return query(**query_kwargs)
+
+    try:
+        return query(ExclusiveStartKey=start_key, **query_kwargs)
+    except ParamValidationError:
+        raise InvalidPaginationParameter('nextToken is invalid')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+        raise InvalidPaginationParameter('nextToken is invalid')
+
+
+def paginate_query(table, limit, start_key=None, **query_kwargs):
+    # Issue one bounded query and return (items, nextToken)
+    response = query_page(table.query, start_key, Limit=limit, **query_kwargs)
+    return response.get('Items', []), encode_token(response.get('LastEvaluatedKey'))
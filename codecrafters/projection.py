@@ -0,0 +1,21 @@
+# Shared read layer: handlers declare which attributes they need and read only
+# those, so DynamoDB does not send back attributes (like an attempt's whole
+# questionOrder) that the handler would throw away.
+#
+# projection('PK', 'userName') returns the ProjectionExpression and
+# ExpressionAttributeNames keyword arguments for get_item, query, scan and
+# batch_get_items. Every name is aliased, so reserved words such as role are
+# safe. The '#p' prefix keeps the aliases apart from the '#n' placeholders
+# boto3 generates for Key and Attr conditions.
+#
+# Projections shrink the response payload. Read capacity is charged on the
+# size of the item as stored, so RCUs only drop when the narrower read comes
+# from an index whose own projection is narrower.
+
+
+def projection(*attributes):
+    names = {f"#p{number}": attribute for number, attribute in enumerate(attributes)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
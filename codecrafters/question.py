@@ -1,34 +1,51 @@
 import json
-import boto3
+import time
 import uuid
-from datetime import datetime
 from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.conditions import Attr
-
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
-
-table = dynamodb.Table('QuizTable')
+from botocore.exceptions import ClientError
+from http_cache import cached_response, is_not_modified, make_etag, not_modified_response
+from batch import BASE_BACKOFF_SECONDS, MAX_RETRIES
+from question_cache import read_version
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import dynamodb, table
 
 
+@instrumented
+@encoded
 def create_question(event, context):
     data = json.loads(event['body'])
     quiz_id = event['pathParameters']['quizId']
     question_id = str(uuid.uuid4())
 
-    table.put_item(
-        Item={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': f"QUESTION#{question_id}",
-            'questionText': data['questionText'],
-            'options': data['options'],  # Assuming options is a list
-            'correctAnswer': data['correctAnswer']
+    # Write the question and bump the quiz's questionCount in one transaction
+    # so the counter never drifts from the stored questions. Every question
+    # change also bumps version, which invalidates cached question banks.
+    written = write_transaction([
+        {
+            'Put': {
+                'TableName': table.name,
+                'Item': question_item(quiz_id, question_id, data)
+            }
+        },
+        {
+            'Update': {
+                'TableName': table.name,
+                'Key': {
+                    'PK': f"QUIZ#{quiz_id}",
+                    'SK': 'METADATA'
+                },
+                'UpdateExpression': 'ADD questionCount :one, version :one',
+                'ConditionExpression': 'attribute_exists(PK)',
+                'ExpressionAttributeValues': {':one': 1}
+            }
+        }
+    ])
+    if not written:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'Quiz not found'})
         }
-    )
 
     return {
         'statusCode': 201,
@@ -36,9 +53,78 @@ def create_question(event, context):
     }
 
 
+def write_transaction(transact_items):
+    # Returns False when a condition of the transaction failed. Transactions
+    # cancelled by a concurrent write to the same quiz are retried with
+    # exponential backoff, any other error is raised.
+    attempt = 0
+    while True:
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+            return True
+        except ClientError as e:
+            reasons = cancellation_reasons(e)
+            if 'ConditionalCheckFailed' in reasons:
+                return False
+            if 'TransactionConflict' not in reasons or attempt >= MAX_RETRIES:
+                raise
+            attempt += 1
+            time.sleep(BASE_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+
+
+def cancellation_reasons(error):
+    # Codes of the cancelled items of a transaction, empty for other errors
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        return set()
+    return {reason.get('Code') for reason in error.response.get('CancellationReasons', [])}
+
+
+def question_item(quiz_id, question_id, data):
+    return {
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': f"QUESTION#{question_id}",
+        'questionText': data['questionText'],
+        'options': data['options'],  # Assuming options is a list
+        'correctAnswer': data['correctAnswer']
+    }
+
+
+def validate_question(data):
+    # Returns what is wrong with a question payload, or None when it is valid
+    if not isinstance(data, dict):
+        return 'Question must be an object'
+
+    question_text = data.get('questionText')
+    if not isinstance(question_text, str) or not question_text.strip():
+        return 'questionText is required'
+
+    options = data.get('options')
+    if (not isinstance(options, list) or len(options) < 2
+            or not all(isinstance(option, str) and option.strip() for option in options)):
+        return 'options must be a list of at least two non-empty strings'
+    if len(set(options)) != len(options):
+        return 'options must be unique'
+
+    # A question has one correct option or a list of them
+    correct_answer = data.get('correctAnswer')
+    correct_answers = correct_answer if isinstance(correct_answer, list) else [correct_answer]
+    if not correct_answers or not all(answer in options for answer in correct_answers):
+        return 'correctAnswer must be one of the options'
+
+    return None
+
+
+@instrumented
+@encoded
 def get_questions_by_quiz(event, context):
     quiz_id = event['pathParameters']['quizId']
 
+    # Every question change bumps the quiz version, so reading it is enough
+    # to answer If-None-Match without querying the questions
+    etag = make_etag('questions', quiz_id, read_version(table, quiz_id))
+    if is_not_modified(event, etag):
+        return not_modified_response(etag)
+
     response = table.query(
         KeyConditionExpression=Key('PK').eq(
             f"QUIZ#{quiz_id}") & Key('SK').begins_with("QUESTION#")
@@ -54,35 +140,56 @@ def get_questions_by_quiz(event, context):
         for item in items
     ]
 
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'questions': questions})
-    }
+    return cached_response({'questions': questions}, etag)
 
 
+@instrumented
+@encoded
 def update_question(event, context):
     quiz_id = event['pathParameters']['quizId']
     question_id = event['pathParameters']['questionId']
     data = json.loads(event['body'])
 
-    # Update question in the table
-    table.update_item(
-        Key={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': f"QUESTION#{question_id}"
-        },
-        UpdateExpression='SET #qt = :qt, #opt = :opt, #ans = :ans',
-        ExpressionAttributeNames={
-            '#qt': 'questionText',
-            '#opt': 'options',
-            '#ans': 'correctAnswer'
+    # Update question in the table and bump the quiz version
+    written = write_transaction([
+        {
+            'Update': {
+                'TableName': table.name,
+                'Key': {
+                    'PK': f"QUIZ#{quiz_id}",
+                    'SK': f"QUESTION#{question_id}"
+                },
+                'UpdateExpression': 'SET #qt = :qt, #opt = :opt, #ans = :ans',
+                'ExpressionAttributeNames': {
+                    '#qt': 'questionText',
+                    '#opt': 'options',
+                    '#ans': 'correctAnswer'
+                },
+                'ExpressionAttributeValues': {
+                    ':qt': data['questionText'],
+                    ':opt': data['options'],
+                    ':ans': data['correctAnswer']
+                }
+            }
         },
-        ExpressionAttributeValues={
-            ':qt': data['questionText'],
-            ':opt': data['options'],
-            ':ans': data['correctAnswer']
+        {
+            'Update': {
+                'TableName': table.name,
+                'Key': {
+                    'PK': f"QUIZ#{quiz_id}",
+                    'SK': 'METADATA'
+                },
+                'UpdateExpression': 'ADD version :one',
+                'ConditionExpression': 'attribute_exists(PK)',
+                'ExpressionAttributeValues': {':one': 1}
+            }
+        }
+    ])
+    if not written:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'Quiz not found'})
         }
-    )
 
     return {
         'statusCode': 200,
@@ -90,17 +197,39 @@ def update_question(event, context):
     }
 
 
+@instrumented
+@encoded
 def delete_question(event, context):
     quiz_id = event['pathParameters']['quizId']
     question_id = event['pathParameters']['questionId']
 
-    # Delete the question
-    table.delete_item(
-        Key={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': f"QUESTION#{question_id}"
+    # Delete the question and decrement questionCount together. The delete is
+    # conditional so removing a missing question leaves the counter untouched
+    # and is a no-op.
+    write_transaction([
+        {
+            'Delete': {
+                'TableName': table.name,
+                'Key': {
+                    'PK': f"QUIZ#{quiz_id}",
+                    'SK': f"QUESTION#{question_id}"
+                },
+                'ConditionExpression': 'attribute_exists(PK)'
+            }
+        },
+        {
+            'Update': {
+                'TableName': table.name,
+                'Key': {
+                    'PK': f"QUIZ#{quiz_id}",
+                    'SK': 'METADATA'
+                },
+                'UpdateExpression': 'ADD questionCount :minus_one, version :one',
+                'ConditionExpression': 'attribute_exists(PK)',
+                'ExpressionAttributeValues': {':minus_one': -1, ':one': 1}
+            }
         }
-    )
+    ])
 
     return {
         'statusCode': 204,
@@ -0,0 +1,139 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from boto3.dynamodb.conditions import Key
+
+# In-process cache of quiz question banks.
+# Module state survives between invocations while Lambda keeps the container
+# warm, so a classroom working through the same quiz reads each question bank
+# once instead of once per progress call. Question create, update and delete
+# bump the version attribute on the quiz metadata; once an entry is older than
+# CACHE_TTL_SECONDS we re-read just that version and reload the bank only if
+# it changed.
+
+CACHE_TTL_SECONDS = 30
+MAX_CACHED_QUESTIONS = 5000
+MAX_CACHE_BYTES = 8 * 1024 * 1024
+
+_banks = OrderedDict()  # quizId -> _Bank, least recently used first
+_lock = threading.Lock()
+_cached_questions = 0
+_cached_bytes = 0
+
+stats = {
+    'hits': 0,
+    'versionChecks': 0,
+    'loads': 0,
+    'evictions': 0
+}
+
+
+class _Bank:
+    def __init__(self, version, questions, size):
+        self.version = version
+        self.questions = questions  # questionId -> question item, in SK order
+        self.size = size
+        self.checked_at = time.monotonic()
+
+
+def get_question(table, quiz_id, question_id):
+    return get_question_bank(table, quiz_id).get(question_id)
+
+
+def get_question_bank(table, quiz_id):
+    with _lock:
+        bank = _banks.get(quiz_id)
+        if bank and time.monotonic() - bank.checked_at < CACHE_TTL_SECONDS:
+            _banks.move_to_end(quiz_id)
+            stats['hits'] += 1
+            return bank.questions
+
+    version = read_version(table, quiz_id)
+
+    with _lock:
+        stats['versionChecks'] += 1
+        bank = _banks.get(quiz_id)
+        if bank and bank.version == version:
+            bank.checked_at = time.monotonic()
+            _banks.move_to_end(quiz_id)
+            return bank.questions
+
+    questions = _load_questions(table, quiz_id)
+    _store(quiz_id, version, questions)
+    return questions
+
+
+def invalidate(quiz_id):
+    with _lock:
+        _discard(quiz_id)
+
+
+def clear():
+    global _cached_questions, _cached_bytes
+    with _lock:
+        _banks.clear()
+        _cached_questions = 0
+        _cached_bytes = 0
+
+
+def read_version(table, quiz_id):
+    response = table.get_item(
+        Key={
+            'PK': f"QUIZ#{quiz_id}",
+            'SK': 'METADATA'
+        },
+        ProjectionExpression='#version',
+        ExpressionAttributeNames={'#version': 'version'}
+    )
+    return response.get('Item', {}).get('version')
+
+
+def _load_questions(table, quiz_id):
+    questions = OrderedDict()
+    query_kwargs = {
+        'KeyConditionExpression': Key('PK').eq(f"QUIZ#{quiz_id}")
+        & Key('SK').begins_with("QUESTION#")
+    }
+
+    while True:
+        response = table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            questions[item['SK'].split('#')[1]] = item
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with _lock:
+        stats['loads'] += 1
+    return questions
+
+
+def _store(quiz_id, version, questions):
+    global _cached_questions, _cached_bytes
+    size = sum(len(json.dumps(item, default=str)) for item in questions.values())
+
+    with _lock:
+        _discard(quiz_id)
+
+        # Banks larger than the whole cache are served but never kept
+        if len(questions) > MAX_CACHED_QUESTIONS or size > MAX_CACHE_BYTES:
+            return
+
+        while _banks and (_cached_questions + len(questions) > MAX_CACHED_QUESTIONS
+                          or _cached_bytes + size > MAX_CACHE_BYTES):
+            _discard(next(iter(_banks)))
+            stats['evictions'] += 1
+
+        _banks[quiz_id] = _Bank(version, questions, size)
+        _cached_questions += len(questions)
+        _cached_bytes += size
+
+
+def _discard(quiz_id):
+    global _cached_questions, _cached_bytes
+    bank = _banks.pop(quiz_id, None)
+    if bank:
+        _cached_questions -= len(bank.questions)
+        _cached_bytes -= bank.size
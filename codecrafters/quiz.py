@@ -1,34 +1,43 @@
 import json
-import boto3
 import uuid
-from datetime import datetime
 from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.conditions import Attr
-
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
-
-table = dynamodb.Table('QuizTable')
-
-
+from botocore.exceptions import ClientError
+from pagination import (
+    InvalidPaginationParameter, get_limit, get_query_parameters, get_start_key,
+    paginate_query)
+from projection import projection
+from http_cache import (
+    bump_catalog_version, cached_response, get_catalog_version, is_not_modified,
+    make_etag, not_modified_response)
+from quiz_summaries import MAX_QUIZ_IDS, get_quiz_summaries
+from quiz_deletion import (
+    OutOfTime, QuizDeletion, deletion_in_progress, deletion_status_response,
+    get_deletion_status, quiz_exists, start_deletion_job)
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table
+
+# Sparse GSI holding only visible quizzes. A quiz is listed while it carries
+# the quizCatalog attribute, so create_quiz and update_quiz_visibility keep it in sync.
+CATALOG_INDEX = 'VisibleQuizIndex'
+CATALOG_INDEX_KEY = ('PK', 'SK', 'quizCatalog', 'title')
+CATALOG_PARTITION = 'QUIZ'
+
+# Attributes each read needs, see projection.py
+QUIZ_ATTRIBUTES = ('SK', 'title', 'description', 'questionCount', 'version')
+
+
+@instrumented
+@encoded
 def create_quiz(event, context):
     data = json.loads(event['body'])
 
     quiz_id = str(uuid.uuid4())
 
     table.put_item(
-        Item={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': 'METADATA',
-            'title': data['title'],
-            'description': data['description'],
-            'visible': True  # Add visible attribute
-        }
+        Item=quiz_metadata_item(quiz_id, data['title'], data['description'])
     )
+    bump_catalog_version()
 
     created_quiz = {
         'quizId': quiz_id,
@@ -43,13 +52,29 @@ def create_quiz(event, context):
     }
 
 
+def quiz_metadata_item(quiz_id, title, description, question_count=0):
+    return {
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': 'METADATA',
+        'title': title,
+        'description': description,
+        'visible': True,  # Add visible attribute
+        'questionCount': question_count,  # Kept up to date by question create/delete
+        'version': 0,  # Bumped on every change to the quiz or its questions
+        'quizCatalog': CATALOG_PARTITION  # List the quiz in the visible quiz index
+    }
+
+
+@instrumented
+@encoded
 def get_quiz_by_id(event, context):
     quiz_id = event['pathParameters']['quizId']
 
     # Fetch quiz metadata
     response = table.query(
         KeyConditionExpression=Key('PK').eq(
-            f"QUIZ#{quiz_id}") & Key('SK').eq("METADATA")
+            f"QUIZ#{quiz_id}") & Key('SK').eq("METADATA"),
+        **projection(*QUIZ_ATTRIBUTES)
     )
     items = response.get('Items', [])
 
@@ -68,32 +93,54 @@ def get_quiz_by_id(event, context):
             'body': json.dumps({'message': 'Quiz metadata not found'})
         }
 
-    # Fetch question count
-    question_response = table.query(
-        KeyConditionExpression=Key('PK').eq(
-            f"QUIZ#{quiz_id}") & Key('SK').begins_with("QUESTION#")
-    )
-    question_count = len(question_response.get('Items', []))
+    # The body only changes when version does
+    etag = make_etag('quiz', quiz_id, quiz_metadata.get('version'))
+    if is_not_modified(event, etag):
+        return not_modified_response(etag)
 
-    return {
-        'statusCode': 200,
-        'body': json.dumps({
-            'quizId': quiz_id,
-            'title': quiz_metadata['title'],
-            'description': quiz_metadata['description'],
-            'questionCount': question_count
-        })
-    }
+    # questionCount is maintained by create_question and delete_question
+    question_count = int(quiz_metadata.get('questionCount', 0))
+
+    return cached_response({
+        'quizId': quiz_id,
+        'title': quiz_metadata['title'],
+        'description': quiz_metadata['description'],
+        'questionCount': question_count
+    }, etag)
 
 
+@instrumented
+@encoded
 def get_all_quizzes(event, context):
-    response = table.scan(
-        FilterExpression=Attr("SK").eq("METADATA")
-        & Attr("PK").contains("QUIZ#")
-        & Attr("visible").eq(True)  # Include only visible quizzes
-    )
+    ids = get_query_parameters(event).get('ids')
+    if ids is not None:
+        return get_quizzes_by_ids(ids)
+
+    try:
+        limit = get_limit(event)
+        start_key = get_start_key(event, CATALOG_INDEX_KEY)
+        if start_key and start_key['quizCatalog'] != CATALOG_PARTITION:
+            raise InvalidPaginationParameter('nextToken is invalid')
+
+        # One small read decides whether the page can have changed
+        etag = make_etag('catalog', get_catalog_version(), limit, start_key)
+        if is_not_modified(event, etag):
+            return not_modified_response(etag)
+
+        # Only visible quizzes are in the index, sorted by title
+        items, next_token = paginate_query(
+            table,
+            limit,
+            start_key,
+            IndexName=CATALOG_INDEX,
+            KeyConditionExpression=Key('quizCatalog').eq(CATALOG_PARTITION)
+        )
+    except InvalidPaginationParameter as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
 
-    items = response.get('Items', [])
     quizzes = []
     for item in items:
         quizzes.append({
@@ -102,12 +149,37 @@ def get_all_quizzes(event, context):
             'description': item['description']
         })
 
+    return cached_response({'quizzes': quizzes, 'nextToken': next_token}, etag)
+
+
+def get_quizzes_by_ids(ids):
+    # GET /quiz?ids=a,b,c: metadata of several quizzes in one request, in the
+    # order asked for. Hidden quizzes are included like in GET /quiz/{quizId}.
+    quiz_ids = list(dict.fromkeys(quiz_id.strip() for quiz_id in ids.split(',') if quiz_id.strip()))
+    if not quiz_ids:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'ids must list at least one quiz ID'})
+        }
+
+    if len(quiz_ids) > MAX_QUIZ_IDS:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': f"At most {MAX_QUIZ_IDS} quiz IDs can be requested at once"})
+        }
+
+    summaries = get_quiz_summaries(quiz_ids)
     return {
         'statusCode': 200,
-        'body': json.dumps({'quizzes': quizzes})
+        'body': json.dumps({
+            'quizzes': [summaries[quiz_id] for quiz_id in quiz_ids if quiz_id in summaries],
+            'missing': [quiz_id for quiz_id in quiz_ids if quiz_id not in summaries]
+        })
     }
 
 
+@instrumented
+@encoded
 def update_quiz(event, context):
     quiz_id = event['pathParameters']['quizId']
     data = json.loads(event['body'])
@@ -133,27 +205,39 @@ def update_quiz(event, context):
             'body': json.dumps({'message': 'Quiz metadata not found'})
         }
 
-    # Update the quiz data
+    # Update the fields in the body. title is the sort key of the catalog
+    # index, so it cannot be set to null or an empty string.
+    if 'title' in data and (not isinstance(data['title'], str) or not data['title']):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'title must be a non-empty string'})
+        }
+
+    fields = [field for field in ('title', 'description') if field in data]
+    if not fields:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': 'No valid attributes to update'})
+        }
+
     table.update_item(
         Key={
             'PK': f"QUIZ#{quiz_id}",
             'SK': 'METADATA'
         },
-        UpdateExpression='SET #title = :title, #description = :description',
-        ExpressionAttributeNames={
-            '#title': 'title',
-            '#description': 'description'
-        },
+        UpdateExpression=f"SET {', '.join(f'#{field} = :{field}' for field in fields)} ADD version :one",
+        ExpressionAttributeNames={f"#{field}": field for field in fields},
         ExpressionAttributeValues={
-            ':title': data.get('title'),
-            ':description': data.get('description')
+            **{f":{field}": data[field] for field in fields},
+            ':one': 1
         }
     )
+    bump_catalog_version()
 
     updated_quiz = {
         'quizId': quiz_id,
-        'title': quiz_metadata.get('title') or data.get('title'),
-        'description': quiz_metadata.get('description') or data.get('description')
+        'title': data.get('title', quiz_metadata.get('title')),
+        'description': data.get('description', quiz_metadata.get('description'))
     }
 
     return {
@@ -165,23 +249,45 @@ def update_quiz(event, context):
     }
 
 
+@instrumented
+@encoded
 def update_quiz_visibility(event, context):
     quiz_id = event['pathParameters']['quizId']
     data = json.loads(event['body'])
 
     visible = data.get('visible', True)  # Default to true if not provided
 
-    # Update the visibility attribute
-    table.update_item(
-        Key={
-            'PK': f"QUIZ#{quiz_id}",
-            'SK': 'METADATA'
-        },
-        UpdateExpression="SET visible = :visible",
-        ExpressionAttributeValues={
+    # Update the visibility attribute and add or drop the quiz from the catalog index
+    if visible:
+        update_expression = "SET visible = :visible, quizCatalog = :catalog"
+        expression_attribute_values = {
+            ':visible': visible,
+            ':catalog': CATALOG_PARTITION
+        }
+    else:
+        update_expression = "SET visible = :visible REMOVE quizCatalog"
+        expression_attribute_values = {
             ':visible': visible
         }
-    )
+
+    try:
+        table.update_item(
+            Key={
+                'PK': f"QUIZ#{quiz_id}",
+                'SK': 'METADATA'
+            },
+            UpdateExpression=update_expression,
+            ConditionExpression="attribute_exists(PK)",
+            ExpressionAttributeValues=expression_attribute_values
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'message': 'Quiz not found'})
+            }
+        raise
+    bump_catalog_version()
 
     return {
         'statusCode': 200,
@@ -189,29 +295,38 @@ def update_quiz_visibility(event, context):
     }
 
 
+@instrumented
+@encoded
 def delete_quiz(event, context):
+    # DELETE /quiz/{quizId}?cascade=true also deletes the attempts made on the
+    # quiz and their answers. ?async=true, or a deletion that does not finish
+    # in time, hands the work to the deletion worker and returns 202 with a
+    # status URL, see quiz_deletion.py
     quiz_id = event['pathParameters']['quizId']
+    parameters = get_query_parameters(event)
+    cascade = parameters.get('cascade') == 'true'
+    run_async = parameters.get('async') == 'true'
 
-    # Check if the quiz exists
-    response = table.query(
-        KeyConditionExpression=Key('PK').eq(f"QUIZ#{quiz_id}")
-    )
-    items = response.get('Items', [])
+    status = get_deletion_status(quiz_id)
+    if deletion_in_progress(status):
+        return deletion_status_response(202, status)
 
-    if not items:
+    # Check if the quiz exists
+    if not quiz_exists(quiz_id):
         return {
             'statusCode': 404,
             'body': json.dumps({'message': 'Quiz not found'})
         }
 
-    # Delete all associated questions
-    for item in items:
-        table.delete_item(
-            Key={
-                'PK': item['PK'],
-                'SK': item['SK']
-            }
-        )
+    if run_async:
+        return deletion_status_response(202, start_deletion_job(quiz_id, cascade))
+
+    deletion = QuizDeletion(quiz_id, cascade, context=context)
+    try:
+        deletion.run()
+    except OutOfTime:
+        return deletion_status_response(
+            202, start_deletion_job(quiz_id, cascade, deletion.deleted))
 
     return {
         'statusCode': 204,
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from batch import BATCH_WRITE_LIMIT, chunks
+from export import QUIZ_ATTEMPTS_INDEX
+from leaderboard import leaderboard_pk
+from http_cache import bump_catalog_version
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table
+
+# Deleting a quiz and everything stored for it.
+# Every partition is paged through with key-only queries and the keys of each
+# page are deleted 25 at a time (one BatchWriteItem call per chunk) by a small
+# pool of workers. The quiz always loses its questions, question stats and
+# leaderboard; with cascade it also loses the attempts made on it, found by
+# their quizId through QuizAttemptsIndex, and the answers of those attempts.
+#
+# Answers go before their attempt and the quiz METADATA item goes last, so a
+# deletion that stops half way can simply be started again.
+#
+# Deletions that do not finish within one request are handed to the
+# deleteQuizWorker function, which reports its progress in a
+# DELETION#QUIZ#{quizId} item read by GET /quiz/{quizId}/deletion.
+
+MAX_WORKERS = 4
+# Stop this long before the Lambda timeout to hand the rest over
+DEADLINE_MARGIN_SECONDS = 5
+WORKER_FUNCTION = os.environ.get('DELETE_QUIZ_WORKER')
+ACTIVE_DELETION_STATUSES = ('pending', 'running')
+# A job that has not reported progress for this long (longer than the worker
+# timeout) has died and can be started again
+STALE_JOB_SECONDS = 20 * 60
+DELETED_KINDS = ('answers', 'attempts', 'leaderboardEntries', 'quizItems')
+
+
+class OutOfTime(Exception):
+    pass
+
+
+def metadata_key(quiz_id):
+    return {
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': 'METADATA'
+    }
+
+
+def status_key(quiz_id):
+    return {
+        'PK': f"DELETION#QUIZ#{quiz_id}",
+        'SK': 'STATUS'
+    }
+
+
+def quiz_exists(quiz_id):
+    # Any item left in the partition counts, so an interrupted deletion that
+    # already removed the metadata can still be finished
+    response = table.query(
+        KeyConditionExpression=Key('PK').eq(f"QUIZ#{quiz_id}"),
+        ProjectionExpression='PK',
+        Limit=1
+    )
+    return bool(response.get('Items'))
+
+
+def iter_key_pages(**query_kwargs):
+    # Yields the keys of each page of a query, one list per page
+    query_kwargs['ProjectionExpression'] = 'PK, SK'
+    while True:
+        response = table.query(**query_kwargs)
+        yield [{'PK': item['PK'], 'SK': item['SK']} for item in response.get('Items', [])]
+
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def iter_partition_key_pages(pk):
+    return iter_key_pages(KeyConditionExpression=Key('PK').eq(pk))
+
+
+def attempt_answer_keys(attempt_key):
+    # The answers of an attempt live in USER#{userId}#QUIZ#{quizId}#ATTEMPT#{attemptId}
+    attempt_id = attempt_key['SK'].split('#')[1]
+    answers_pk = f"{attempt_key['PK']}#ATTEMPT#{attempt_id}"
+    return [key for page in iter_partition_key_pages(answers_pk) for key in page]
+
+
+def delete_keys(keys):
+    # A fresh batch writer per chunk: it only buffers the keys and sends them
+    # through the table's client, which is safe to share between threads
+    with table.batch_writer() as writer:
+        for key in keys:
+            writer.delete_item(Key=key)
+    return len(keys)
+
+
+class QuizDeletion:
+    def __init__(self, quiz_id, cascade=False, max_workers=MAX_WORKERS,
+                 context=None, on_progress=None):
+        self.quiz_id = quiz_id
+        self.cascade = cascade
+        self.max_workers = max_workers
+        # on_progress(kind, count) is called after every deleted page
+        self.on_progress = on_progress
+        self.deleted = dict.fromkeys(DELETED_KINDS, 0)
+        self.deadline = None
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            self.deadline = (time.monotonic()
+                             + context.get_remaining_time_in_millis() / 1000
+                             - DEADLINE_MARGIN_SECONDS)
+        self.pool = None
+
+    def out_of_time(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def run(self):
+        # Returns the number of deleted items of each kind, raises OutOfTime
+        # when the Lambda is about to time out
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            self.pool = pool
+            self.hide_quiz()
+
+            if self.cascade:
+                self.delete_attempts()
+
+            for keys in iter_partition_key_pages(leaderboard_pk(self.quiz_id)):
+                self.delete('leaderboardEntries', keys)
+
+            for keys in iter_partition_key_pages(f"QUIZ#{self.quiz_id}"):
+                self.delete('quizItems', [key for key in keys if key['SK'] != 'METADATA'])
+
+            table.delete_item(Key=metadata_key(self.quiz_id))
+            self.count('quizItems', 1)
+
+        return self.deleted
+
+    def hide_quiz(self):
+        # Take the quiz out of the catalog first so students stop starting it
+        try:
+            table.update_item(
+                Key=metadata_key(self.quiz_id),
+                UpdateExpression='SET visible = :visible REMOVE quizCatalog',
+                ConditionExpression='attribute_exists(PK)',
+                ExpressionAttributeValues={':visible': False}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return
+        bump_catalog_version()
+
+    def delete_attempts(self):
+        attempt_pages = iter_key_pages(
+            IndexName=QUIZ_ATTEMPTS_INDEX,
+            KeyConditionExpression=Key('quizId').eq(self.quiz_id) & Key('SK').begins_with('ATTEMPT#')
+        )
+        for attempt_keys in attempt_pages:
+            # Index queries are eventually consistent and may repeat a key
+            attempt_keys = list({(key['PK'], key['SK']): key for key in attempt_keys}.values())
+            answer_keys = [
+                key
+                for keys in self.pool.map(attempt_answer_keys, attempt_keys)
+                for key in keys
+            ]
+            self.delete('answers', answer_keys)
+            self.delete('attempts', attempt_keys)
+
+    def delete(self, kind, keys):
+        if self.out_of_time():
+            raise OutOfTime()
+        if not keys:
+            return
+
+        futures = [self.pool.submit(delete_keys, chunk) for chunk in chunks(keys, BATCH_WRITE_LIMIT)]
+        self.count(kind, sum(future.result() for future in futures))
+
+    def count(self, kind, deleted):
+        self.deleted[kind] += deleted
+        if self.on_progress:
+            self.on_progress(kind, deleted)
+
+
+def get_deletion_status(quiz_id):
+    return table.get_item(Key=status_key(quiz_id)).get('Item')
+
+
+def deletion_in_progress(item):
+    if not item or item['status'] not in ACTIVE_DELETION_STATUSES:
+        return False
+    idle = datetime.now() - datetime.fromisoformat(item['updatedAt'])
+    return idle.total_seconds() < STALE_JOB_SECONDS
+
+
+def deletion_status_response(status_code, item):
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({
+            'quizId': item['quizId'],
+            'status': item['status'],
+            'cascade': item['cascade'],
+            'deleted': {kind: int(count) for kind, count in item['deleted'].items()},
+            'startedAt': item['startedAt'],
+            'updatedAt': item['updatedAt'],
+            'finishedAt': item.get('finishedAt'),
+            'error': item.get('error'),
+            'statusUrl': f"/quiz/{item['quizId']}/deletion"
+        })
+    }
+
+
+def start_deletion_job(quiz_id, cascade, deleted=None):
+    # Records a pending job and hands it to the worker function.
+    # Returns the status item.
+    now = str(datetime.now())
+    item = {
+        **status_key(quiz_id),
+        'quizId': quiz_id,
+        'status': 'pending',
+        'cascade': cascade,
+        'deleted': deleted or dict.fromkeys(DELETED_KINDS, 0),
+        'startedAt': now,
+        'updatedAt': now
+    }
+    table.put_item(Item=item)
+    invoke_worker(quiz_id, cascade)
+    return item
+
+
+def invoke_worker(quiz_id, cascade):
+    if not WORKER_FUNCTION:
+        raise RuntimeError('DELETE_QUIZ_WORKER is not set')
+
+    boto3.client('lambda').invoke(
+        FunctionName=WORKER_FUNCTION,
+        InvocationType='Event',
+        Payload=json.dumps({'quizId': quiz_id, 'cascade': cascade})
+    )
+
+
+def update_status(quiz_id, status, **attributes):
+    names = {'#status': 'status'}
+    values = {':status': status, ':now': str(datetime.now())}
+    assignments = ['#status = :status', 'updatedAt = :now']
+    for name, value in attributes.items():
+        names[f"#{name}"] = name
+        values[f":{name}"] = value
+        assignments.append(f"#{name} = :{name}")
+
+    table.update_item(
+        Key=status_key(quiz_id),
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+
+def record_progress(quiz_id):
+    def on_progress(kind, deleted):
+        table.update_item(
+            Key=status_key(quiz_id),
+            UpdateExpression='SET deleted.#kind = deleted.#kind + :deleted, updatedAt = :now',
+            ExpressionAttributeNames={'#kind': kind},
+            ExpressionAttributeValues={':deleted': deleted, ':now': str(datetime.now())}
+        )
+    return on_progress
+
+
+@instrumented
+def run_deletion_job(event, context):
+    # Worker invoked asynchronously by start_deletion_job with
+    # {"quizId": ..., "cascade": ...}. A run that is about to time out
+    # invokes the worker again to carry on.
+    quiz_id = event['quizId']
+    cascade = bool(event.get('cascade'))
+
+    update_status(quiz_id, 'running')
+    deletion = QuizDeletion(
+        quiz_id, cascade, context=context, on_progress=record_progress(quiz_id))
+
+    try:
+        deletion.run()
+    except OutOfTime:
+        invoke_worker(quiz_id, cascade)
+        return {'status': 'running', 'deleted': deletion.deleted}
+    except Exception as e:
+        update_status(quiz_id, 'failed', error=str(e), finishedAt=str(datetime.now()))
+        raise
+
+    update_status(quiz_id, 'complete', finishedAt=str(datetime.now()))
+    return {'status': 'complete', 'deleted': deletion.deleted}
+
+
+@instrumented
+@encoded
+def get_quiz_deletion(event, context):
+    quiz_id = event['pathParameters']['quizId']
+
+    item = get_deletion_status(quiz_id)
+    if not item:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'message': 'No deletion found for this quiz'})
+        }
+
+    return deletion_status_response(200, item)
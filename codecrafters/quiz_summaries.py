@@ -0,0 +1,40 @@
+from batch import batch_get_items
+from projection import projection
+from db import table, client
+import codec
+
+# Title, description and question count of many quizzes at once, read from
+# their METADATA items with one deduplicated BatchGetItem per 100 quizzes.
+# Listings that show quizzes next to other items (a student's attempts, the
+# dashboard) use it instead of one GET /quiz/{quizId} per row.
+
+QUIZ_SUMMARY_ATTRIBUTES = ('PK', 'title', 'description', 'questionCount')
+# Largest ids list GET /quiz?ids= accepts, one BatchGetItem call
+MAX_QUIZ_IDS = 100
+
+
+def get_quiz_summaries(quiz_ids):
+    # {quizId: summary} for the quizzes that exist
+    unique_ids = list(dict.fromkeys(quiz_id for quiz_id in quiz_ids if quiz_id))
+    if not unique_ids:
+        return {}
+
+    projected = projection(*QUIZ_SUMMARY_ATTRIBUTES)
+    items = batch_get_items(
+        client,
+        table.name,
+        [codec.serialize_item({'PK': f"QUIZ#{quiz_id}", 'SK': 'METADATA'}) for quiz_id in unique_ids],
+        projection_expression=projected.get('ProjectionExpression'),
+        expression_attribute_names=projected.get('ExpressionAttributeNames')
+    )
+
+    summaries = {}
+    for item in codec.deserialize_items(items):
+        quiz_id = item['PK'].split('#', 1)[1]
+        summaries[quiz_id] = {
+            'quizId': quiz_id,
+            'title': item.get('title'),
+            'description': item.get('description'),
+            'questionCount': int(item.get('questionCount', 0))
+        }
+    return summaries
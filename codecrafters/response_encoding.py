@@ -0,0 +1,129 @@
+import os
+import gzip
+import base64
+from functools import wraps
+from http_cache import get_header
+
+try:
+    import brotli
+except ImportError:  # Not part of the Lambda runtime, gzip is used without it
+    brotli = None
+
+# Compression of handler responses. Every handler is wrapped with @encoded:
+# when the client accepts gzip or br (Accept-Encoding, q-values honoured) and
+# the body is at least MIN_COMPRESSED_BYTES long, the body is compressed and
+# returned base64 encoded with isBase64Encoded, which API Gateway turns back
+# into bytes because binaryMediaTypes is */* (serverless.yml). That setting
+# also makes API Gateway base64 encode request bodies, so @encoded decodes
+# them before the handler sees the event.
+#
+# Smaller bodies are sent as they are: below about 1 KB the gzip header and
+# the base64 round trip cost more than they save. See
+# benchmarks/response_compression.py for the CPU time and bytes per level.
+
+MIN_COMPRESSED_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '5'))
+
+
+def gzip_compress(body, level=None):
+    # mtime=0 gives the same bytes for the same body
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def brotli_compress(body, level=None):
+    return brotli.compress(body, quality=BROTLI_QUALITY if level is None else level,
+                           mode=brotli.MODE_TEXT)
+
+
+# Preferred first when the client weighs them the same
+ENCODERS = {'gzip': gzip_compress}
+if brotli is not None:
+    ENCODERS = {'br': brotli_compress, **ENCODERS}
+
+
+def choose_encoding(accept_encoding):
+    # The supported coding with the highest q-value, or None for identity
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for entry in accept_encoding.split(','):
+        coding, _, parameters = entry.strip().partition(';')
+        coding = coding.strip().lower()
+        weight = 1.0
+        parameter, _, value = parameters.strip().partition('=')
+        if parameter.strip().lower() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in ENCODERS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def encode_response(event, response):
+    # Only API Gateway responses, not results of direct invocations
+    if not isinstance(response, dict) or 'statusCode' not in response or not isinstance(event, dict):
+        return response
+
+    headers = response.get('headers') or {}
+    response['headers'] = headers
+    # Caches must keep the compressed and the plain body apart
+    headers['Vary'] = 'Accept-Encoding'
+
+    etag = headers.get('ETag')
+    if response.get('statusCode') == 304:
+        # Confirm the ETag in the form the client holds, weak if it got a compressed body
+        if etag and f"W/{etag}" in (get_header(event, 'If-None-Match') or ''):
+            headers['ETag'] = f"W/{etag}"
+        return response
+
+    body = response.get('body')
+    if not isinstance(body, str) or response.get('isBase64Encoded') or 'Content-Encoding' in headers:
+        return response
+
+    raw = body.encode('utf-8')
+    if len(raw) < MIN_COMPRESSED_BYTES:
+        return response
+
+    encoding = choose_encoding(get_header(event, 'Accept-Encoding'))
+    if encoding is None:
+        return response
+
+    compressed = ENCODERS[encoding](raw)
+    if len(compressed) >= len(raw):
+        return response
+
+    headers['Content-Encoding'] = encoding
+    headers.setdefault('Content-Type', 'application/json')
+    # A compressed body is no longer byte for byte the one the ETag names
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = f"W/{etag}"
+
+    response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
+
+
+def decode_request(event):
+    if isinstance(event, dict) and event.get('isBase64Encoded') and event.get('body'):
+        event = dict(event, body=base64.b64decode(event['body']).decode('utf-8'),
+                     isBase64Encoded=False)
+    return event
+
+
+def encoded(handler):
+    @wraps(handler)
+    def wrapper(event, context):
+        event = decode_request(event)
+        return encode_response(event, handler(event, context))
+
+    return wrapper
@@ -1,20 +1,18 @@
 import json
-import boto3
 import uuid
 from datetime import datetime
 from boto3.dynamodb.conditions import Key
 from boto3.dynamodb.conditions import Attr
-
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
-
-table = dynamodb.Table('QuizTable')
+from quiz import quiz_metadata_item
+from user import register_role, role_index_key
+from http_cache import bump_catalog_version
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table
 
 
+@instrumented
+@encoded
 def seed_data(event, context):
     # To create the table locally use the below
     # aws dynamodb create-table --table-name QuizTable --attribute-definitions AttributeName=quizId,AttributeType=S --key-schema AttributeName=quizId,KeyType=HASH --endpoint-url http://localhost:8000 --billing-mode PAY_PER_REQUEST
@@ -42,8 +40,9 @@ def seed_data(event, context):
             "role": "teacher",
         },
     ]
-    # Insert Users
+    # Insert Users, registering their roles for get_all_users first
     for user in users:
+        register_role(role_index_key(user["role"])["userRole"])
         table.put_item(
             Item={
                 "PK": f"USER#{user['userId']}",
@@ -51,7 +50,8 @@ def seed_data(event, context):
                 "userName": user["userName"],
                 "fullName": user["fullName"],
                 "email": user["email"],
-                "role": user["role"]
+                "role": user["role"],
+                **role_index_key(user["role"])
             }
         )
 
@@ -68,16 +68,12 @@ def seed_data(event, context):
             "description": "A quiz on AWS core services.",
         },
     ]
-    # Insert Quizzes
+    # Insert Quizzes, listed in the quiz catalog like quizzes from create_quiz
     for quiz in quizzes:
         table.put_item(
-            Item={
-                "PK": f"QUIZ#{quiz['quizId']}",
-                "SK": f"METADATA",
-                "title": quiz["title"],
-                "description": quiz["description"],
-            }
+            Item=quiz_metadata_item(quiz["quizId"], quiz["title"], quiz["description"])
         )
+    bump_catalog_version()
 
     # Sample Quizzes
     questions = [
@@ -103,6 +99,17 @@ def seed_data(event, context):
             }
         )
 
+    # Keep questionCount on the quiz metadata in sync with the seeded questions
+    for question in questions:
+        table.update_item(
+            Key={
+                "PK": f"QUIZ#{question['quizId']}",
+                "SK": "METADATA",
+            },
+            UpdateExpression="ADD questionCount :one",
+            ExpressionAttributeValues={":one": 1},
+        )
+
     # Sample UserAnswers
     userAnswers = list(
         map(
@@ -0,0 +1,195 @@
+import json
+from collections import Counter
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from export import iter_quiz_ids, iter_quiz_attempts, iter_attempt_answers
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table, client
+import question_cache
+import codec
+
+# Per-question answer statistics, so students can compare themselves with other
+# participants. Each question has a QUIZ#{quizId} / STATS#QUESTION#{questionId}
+# item holding answer and pass counters plus a histogram of the chosen options.
+# Only the options of the question get their own counter, anything else a
+# client sends is counted under OTHER_OPTION, so the item stays small.
+# Answer handlers bump the counters with atomic ADD updates, so reading the
+# statistics of a quiz costs one query over its STATS# items.
+
+
+def stats_key(quiz_id, question_id):
+    return {
+        'PK': f"QUIZ#{quiz_id}",
+        'SK': f"STATS#QUESTION#{question_id}"
+    }
+
+
+OTHER_OPTION = '#other'
+
+
+def chosen_options(user_answer, question_options):
+    # Answers are a single option or a list of options
+    answers = user_answer if isinstance(user_answer, list) else [user_answer]
+    known = {option for option in question_options or () if isinstance(option, str) and option}
+    return list(dict.fromkeys(
+        answer if isinstance(answer, str) and answer in known else OTHER_OPTION
+        for answer in answers))
+
+
+def record_answer(quiz_id, question_id, question_options, user_answer, status):
+    # Count a newly recorded answer. Called once per stored answer, after the
+    # answer write succeeded, so retries of the same answer are not counted.
+    options = chosen_options(user_answer, question_options)
+    names = {
+        '#attempts': 'attempts',
+        '#passes': 'passes',
+        '#optionCounts': 'optionCounts'
+    }
+    clauses = ['#attempts :one', '#passes :passed']
+    for number, option in enumerate(options):
+        names[f"#option{number}"] = option
+        clauses.append(f"#optionCounts.#option{number} :one")
+
+    update_kwargs = {
+        'Key': stats_key(quiz_id, question_id),
+        'UpdateExpression': f"ADD {', '.join(clauses)}",
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {
+            ':one': 1,
+            ':passed': 1 if status == 'pass' else 0
+        }
+    }
+
+    try:
+        table.update_item(**update_kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+
+        # First answer for this question: the optionCounts map has to exist
+        # before nested counters can be added to it
+        table.update_item(
+            Key=stats_key(quiz_id, question_id),
+            UpdateExpression='SET #optionCounts = if_not_exists(#optionCounts, :empty)',
+            ExpressionAttributeNames={'#optionCounts': 'optionCounts'},
+            ExpressionAttributeValues={':empty': {}}
+        )
+        table.update_item(**update_kwargs)
+
+
+@instrumented
+@encoded
+def get_question_stats(event, context):
+    quiz_id = event['pathParameters']['quizId']
+
+    items = []
+    query_kwargs = {
+        'TableName': table.name,
+        'KeyConditionExpression': 'PK = :pk AND begins_with(SK, :prefix)',
+        'ExpressionAttributeValues': codec.serialize_values({
+            ':pk': f"QUIZ#{quiz_id}",
+            ':prefix': "STATS#QUESTION#"
+        })
+    }
+    while True:
+        response = client.query(**query_kwargs)
+        items.extend(codec.deserialize_items(response.get('Items', [])))
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    questions = []
+    for item in items:
+        attempts = item.get('attempts', 0)
+        passes = item.get('passes', 0)
+        questions.append({
+            'questionId': item['SK'].split('#')[2],
+            'attempts': attempts,
+            'passes': passes,
+            'passRate': round(passes / attempts, 4) if attempts else None,
+            'optionCounts': item.get('optionCounts', {})
+        })
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'quizId': quiz_id, 'questions': questions})
+    }
+
+
+def rebuild_quiz_stats(quiz_id):
+    # Recount every stored answer of the quiz and overwrite its STATS# items.
+    # Answers recorded while the rebuild runs may be lost, so run it while the
+    # quiz is not being taken.
+    attempts = Counter()
+    passes = Counter()
+    option_counts = {}
+    questions = question_cache.get_question_bank(table, quiz_id)
+
+    for attempt in iter_quiz_attempts(quiz_id):
+        attempt_id = attempt['SK'].split('#')[1]
+        for answer in iter_attempt_answers(attempt['userId'], quiz_id, attempt_id):
+            question_id = answer['SK'].split('#')[1]
+            attempts[question_id] += 1
+            if answer.get('status') == 'pass':
+                passes[question_id] += 1
+            histogram = option_counts.setdefault(question_id, Counter())
+            question_options = questions.get(question_id, {}).get('options')
+            for option in chosen_options(answer.get('userAnswer'), question_options):
+                histogram[option] += 1
+
+    # Drop statistics of questions that no longer have any answers
+    stale_keys = []
+    query_kwargs = {
+        'KeyConditionExpression': Key('PK').eq(f"QUIZ#{quiz_id}")
+        & Key('SK').begins_with("STATS#QUESTION#"),
+        'ProjectionExpression': 'PK, SK'
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        stale_keys.extend(
+            item for item in response.get('Items', [])
+            if item['SK'].split('#')[2] not in attempts)
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with table.batch_writer() as writer:
+        for key in stale_keys:
+            writer.delete_item(Key=key)
+
+        for question_id, count in attempts.items():
+            writer.put_item(Item={
+                **stats_key(quiz_id, question_id),
+                'attempts': count,
+                'passes': passes[question_id],
+                'optionCounts': dict(option_counts[question_id])
+            })
+
+    return len(attempts)
+
+
+@instrumented
+@encoded
+def rebuild_question_stats(event, context):
+    # Rebuild the statistics of one quiz ({"quizId": ...}) or of every quiz
+    try:
+        data = json.loads(event.get('body') or '{}')
+
+        quiz_ids = [data['quizId']] if data.get('quizId') else list(iter_quiz_ids())
+
+        questions = sum(rebuild_quiz_stats(quiz_id) for quiz_id in quiz_ids)
+
+        return {
+            'statusCode': 200,
+            'body': f"Question stats rebuild completed successfully. Rebuilt {questions} questions in {len(quiz_ids)} quizzes."
+        }
+
+    except Exception as e:
+        print(f"Error rebuilding question stats: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': f"Error rebuilding question stats: {str(e)}"
+        }
@@ -1,25 +1,75 @@
 import json
-import boto3
 import uuid
 from datetime import datetime
 from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.conditions import Attr
-from attempt import convert_decimal
+from pagination import (
+    InvalidPaginationParameter, check_start_key, get_limit, get_query_parameters,
+    get_start_key, encode_token, paginate_query, query_page)
+from projection import projection
+from response_encoding import encoded
+from instrumentation import instrumented
+from db import table, convert_decimal
+
+# Sparse GSI of users by role, sorted by userName. Only user METADATA items
+# carry the userRole attribute, so listing the students reads the students and
+# nothing else. create_user and update_user keep it in sync with role; users
+# without a role are indexed under NO_ROLE so that every user can be listed.
+ROLE_INDEX = 'UserRoleIndex'
+ROLE_INDEX_KEY = ('PK', 'SK', 'userRole', 'userName')
+NO_ROLE = '#none'
+# Every userRole value ever written, which get_all_users goes through when no
+# role is asked for. Roles are only added, a role nobody has any more lists
+# no users.
+ROLE_REGISTRY_KEY = {'PK': 'CATALOG#USER', 'SK': 'ROLES'}
+
+# Attributes each read needs, see projection.py
+USER_ATTRIBUTES = ('PK', 'SK', 'userName', 'fullName', 'email', 'role')
+STUDENT_ATTRIBUTES = ('PK', 'userName')
+
+
+def role_index_key(role):
+    # userRole is an index key and must be a non-empty string
+    if isinstance(role, str) and role:
+        return {'userRole': role}
+    return {'userRole': NO_ROLE}
+
+
+def register_role(user_role):
+    # Written before the user, so the registry never misses a role in use
+    table.update_item(
+        Key=ROLE_REGISTRY_KEY,
+        UpdateExpression='ADD #roles :role',
+        ExpressionAttributeNames={'#roles': 'roles'},
+        ExpressionAttributeValues={':role': {user_role}}
+    )
 
-# True for now as we need to test it in locally first
-if False:
-    dynamodb = boto3.resource(
-        'dynamodb', endpoint_url='http://localhost:8000/')
-else:
-    dynamodb = boto3.resource('dynamodb')
 
-table = dynamodb.Table('QuizTable')
+def registered_roles():
+    response = table.get_item(
+        Key=ROLE_REGISTRY_KEY,
+        ProjectionExpression='#roles',
+        ExpressionAttributeNames={'#roles': 'roles'}
+    )
+    # Users without a role come last
+    return sorted(response.get('Item', {}).get('roles', ()), key=lambda role: (role == NO_ROLE, role))
+
 
+def user_key_condition(role, prefix):
+    key_condition = Key('userRole').eq(role)
+    if prefix:
+        # Case sensitive, like userName itself
+        key_condition &= Key('userName').begins_with(prefix)
+    return key_condition
 
+
+@instrumented
+@encoded
 def create_user(event, context):
     data = json.loads(event['body'])
 
     user_id = str(uuid.uuid4())
+    index_key = role_index_key(data['role'])
+    register_role(index_key['userRole'])
 
     table.put_item(
         Item={
@@ -28,7 +78,8 @@ def create_user(event, context):
             'userName': data['userName'],
             "fullName": data['fullName'],
             "email": data['email'],
-            "role": data['role']
+            "role": data['role'],
+            **index_key
         }
     )
 
@@ -47,12 +98,15 @@ def create_user(event, context):
     }
 
 
+@instrumented
+@encoded
 def get_user_by_id(event, context):
     user_id = event['pathParameters']['userId']
 
     response = table.query(
         KeyConditionExpression=Key('PK').eq(
-            f"USER#{user_id}") & Key('SK').eq("METADATA")
+            f"USER#{user_id}") & Key('SK').eq("METADATA"),
+        **projection(*USER_ATTRIBUTES)
     )
 
     items = response.get('Items', [])
@@ -84,6 +138,8 @@ def get_user_by_id(event, context):
     }
 
 
+@instrumented
+@encoded
 def get_user_by_username(event, context):
     username = event['pathParameters']['userName']
 
@@ -91,7 +147,8 @@ def get_user_by_username(event, context):
     response = table.query(
         IndexName='UserNameIndex',  # Use the GSI name
         KeyConditionExpression=Key('userName').eq(
-            username) & Key('SK').eq("METADATA")
+            username) & Key('SK').eq("METADATA"),
+        **projection(*USER_ATTRIBUTES)
     )
 
     items = response.get('Items', [])
@@ -117,13 +174,55 @@ def get_user_by_username(event, context):
     }
 
 
+@instrumented
+@encoded
 def get_all_users(event, context):
-    response = table.scan(
-        FilterExpression=Attr("SK").eq("METADATA")
-        & Attr("PK").contains("USER#")
-    )
+    # Users with the role in ?role=, or the users of every role one role
+    # after the other, sorted by userName. ?prefix= keeps the usernames
+    # starting with it.
+    parameters = get_query_parameters(event)
+    role = parameters.get('role')
+    roles = [role] if role else registered_roles()
+
+    try:
+        limit = get_limit(event)
+        start_key = get_start_key(event)
+        # The position is a key of the index, which holds the role it stopped
+        # in, or only the role to start at
+        if start_key and set(start_key) != {'userRole'}:
+            check_start_key(start_key, ROLE_INDEX_KEY)
+        if start_key and start_key.get('userRole') not in roles:
+            raise InvalidPaginationParameter('nextToken is invalid')
+
+        first_role = roles.index(start_key['userRole']) if start_key else 0
+        items = []
+        next_key = None
+        for position in range(first_role, len(roles)):
+            # A token that only names a role starts at the beginning of it
+            response = query_page(
+                table.query,
+                start_key if start_key and 'PK' in start_key else None,
+                IndexName=ROLE_INDEX,
+                KeyConditionExpression=user_key_condition(roles[position], parameters.get('prefix')),
+                Limit=limit - len(items),
+                **projection(*USER_ATTRIBUTES)
+            )
+            start_key = None
+            items.extend(response.get('Items', []))
+
+            next_key = response.get('LastEvaluatedKey')
+            if next_key:
+                break
+            if len(items) >= limit:
+                if position + 1 < len(roles):
+                    next_key = {'userRole': roles[position + 1]}
+                break
+    except InvalidPaginationParameter as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
 
-    items = response.get('Items', [])
     users = []
     for item in items:
         users.append({
@@ -136,17 +235,20 @@ def get_all_users(event, context):
 
     return {
         'statusCode': 200,
-        'body': json.dumps({'users': users})
+        'body': json.dumps({'users': users, 'nextToken': encode_token(next_key)})
     }
 
 
+@instrumented
+@encoded
 def update_user(event, context):
     user_id = event['pathParameters']['userId']
     data = json.loads(event['body'])
 
     # Check if the user exists
     response = table.query(
-        KeyConditionExpression=Key('PK').eq(f"USER#{user_id}")
+        KeyConditionExpression=Key('PK').eq(f"USER#{user_id}"),
+        **projection(*USER_ATTRIBUTES)
     )
     items = response.get('Items', [])
 
@@ -165,13 +267,16 @@ def update_user(event, context):
             'body': json.dumps({'message': 'User metadata not found'})
         }
 
-    # Update the user data
+    # Update the user data, moving the user to the index entry of the new role
+    user_role = role_index_key(data.get('role'))['userRole']
+    register_role(user_role)
+
     table.update_item(
         Key={
             'PK': f"USER#{user_id}",
             'SK': 'METADATA'
         },
-        UpdateExpression='SET #userName = :userName, #fullName = :fullName, #email = :email, #role = :role',
+        UpdateExpression='SET #userName = :userName, #fullName = :fullName, #email = :email, #role = :role, userRole = :userRole',
         ExpressionAttributeNames={
             '#userName': 'userName',
             '#fullName': 'fullName',
@@ -182,7 +287,8 @@ def update_user(event, context):
             ':userName': data.get('userName'),
             ':fullName': data.get('fullName'),
             ':email': data.get('email'),
-            ':role': data.get('role')
+            ':role': data.get('role'),
+            ':userRole': user_role
         }
     )
 
@@ -203,12 +309,15 @@ def update_user(event, context):
     }
 
 
+@instrumented
+@encoded
 def delete_user(event, context):
     user_id = event['pathParameters']['userId']
 
     # Check if the user exists
     response = table.query(
-        KeyConditionExpression=Key('PK').eq(f"USER#{user_id}")
+        KeyConditionExpression=Key('PK').eq(f"USER#{user_id}"),
+        **projection('SK')
     )
     items = response.get('Items', [])
 
@@ -241,14 +350,31 @@ def delete_user(event, context):
     }
 
 
+@instrumented
+@encoded
 def list_students(event, context):
-    # Scan the table for all users with role = "student"
-    response = table.scan(
-        FilterExpression=Attr("SK").eq("METADATA")
-        & Attr('role').eq('student')
-    )
-
-    students = response.get('Items', [])
+    # One page of students from the role index, sorted by userName.
+    # ?prefix= keeps the usernames starting with it.
+    try:
+        limit = get_limit(event)
+        start_key = get_start_key(event, ROLE_INDEX_KEY)
+        if start_key and start_key.get('userRole') != 'student':
+            raise InvalidPaginationParameter('nextToken is invalid')
+
+        students, next_token = paginate_query(
+            table,
+            limit,
+            start_key,
+            IndexName=ROLE_INDEX,
+            KeyConditionExpression=user_key_condition(
+                'student', get_query_parameters(event).get('prefix')),
+            **projection(*STUDENT_ATTRIBUTES)
+        )
+    except InvalidPaginationParameter as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
     students = convert_decimal(students)
 
     return {
@@ -257,7 +383,8 @@ def list_students(event, context):
             'students': [
                 {'userId': student['PK'].split(
                     '#')[1], 'userName': student['userName']}
-                for student in students if student['PK'].startswith('USER#')
-            ]
+                for student in students
+            ],
+            'nextToken': next_token
         })
     }
@@ -108,9 +108,18 @@ async function handleHomepage() {
 
 async function getQuizzes() {
     try {
-        const response = await fetch(`${baseUrl}/${stage}/quiz`);
-        if (!response.ok) throw new Error('Failed to fetch quizzes');
-        return await response.json();
+        // The quiz list is paginated, follow nextToken until the last page
+        const quizzes = [];
+        let nextToken = null;
+        do {
+            const query = nextToken ? `?nextToken=${encodeURIComponent(nextToken)}` : '';
+            const response = await fetch(`${baseUrl}/${stage}/quiz${query}`);
+            if (!response.ok) throw new Error('Failed to fetch quizzes');
+            const page = await response.json();
+            quizzes.push(...page.quizzes);
+            nextToken = page.nextToken;
+        } while (nextToken);
+        return { quizzes };
     } catch (error) {
         console.error('Error fetching quizzes:', error);
         throw error;
@@ -274,6 +283,9 @@ async function handleQuestionPage() {
     });
 }
 
+// Next question returned by answerAndAdvance, null once the quiz is completed
+let nextQuestionData = null;
+
 async function handleSubmit() {
     const selectedOption = document.querySelector('.btn-option.selected');
     if (!selectedOption) {
@@ -288,7 +300,20 @@ async function handleSubmit() {
     const questionId = sessionStorage.getItem('currentQuestionId'); // Assume this is stored when a question is displayed
 
     try {
-        const evaluation = await submitAnswer(userId, selectedQuizId, userAttemptId, questionId, userAnswer);
+        const evaluation = await answerAndAdvance(userId, selectedQuizId, userAttemptId, questionId, userAnswer);
+
+        // The answer was already recorded (a retried request) or the question is no
+        // longer the current one: show where the attempt is now
+        if (!evaluation || evaluation.message === 'User answer already recorded') {
+            if (evaluation && evaluation.nextQuestion === null) {
+                window.location.href = 'results.html'; // No more questions
+            } else {
+                await loadAndDisplayQuestion();
+            }
+            return;
+        }
+
+        nextQuestionData = evaluation.nextQuestion;
         displayEvaluation(evaluation, userAttemptId);
 
         // Change button state to "Next"
@@ -301,15 +326,10 @@ async function handleSubmit() {
 }
 
 async function handleNext() {
-    const userId = sessionStorage.getItem('userId');
-    const selectedQuizId = sessionStorage.getItem('selectedQuizId');
-    const userAttemptId = sessionStorage.getItem('userAttemptId');
-
     try {
-        const response = await moveToNextQuestion(userId, selectedQuizId, userAttemptId);
-
-        if (response.questionId) {
-            loadAndDisplayQuestion(response);
+        // The next question was already returned together with the answer evaluation
+        if (nextQuestionData) {
+            await loadAndDisplayQuestion(nextQuestionData);
 
             // Change button state back to "Submit"
             const dynamicButton = document.getElementById('btn-dynamic');
@@ -419,6 +439,22 @@ async function submitAnswer(userId, quizId, attemptId, questionId, userAnswer) {
     }
 }
 
+async function answerAndAdvance(userId, quizId, attemptId, questionId, userAnswer) {
+    try {
+        const response = await fetch(`${baseUrl}/${stage}/quiz/progress/answer`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ userId, quizId, attemptId, questionId, userAnswer }),
+        });
+        if (response.status === 400) return null; // Not the current question of the attempt
+        if (!response.ok) throw new Error('Failed to submit answer');
+        return await response.json();
+    } catch (error) {
+        console.error('Error submitting answer:', error);
+        throw error;
+    }
+}
+
 function displayEvaluation(evaluation, userAttemptId) {
     const correctAnswers = evaluation.correctAnswers; // Backend should return this in the response
     document.querySelectorAll('.btn-option').forEach((button) => {
@@ -498,8 +534,7 @@ async function handleUserAttemptsPage() {
         if (userRole === 'teacher') {
             await setupStudentDropdown();
         } else if (userRole === 'student') {
-            const attempts = await fetchAttempts(userId);
-            displayAttempts(attempts);
+            displayAttempts(userId, await fetchAttempts(userId));
         }
     } catch (error) {
         console.error('Error loading user attempts:', error);
@@ -511,10 +546,17 @@ async function setupStudentDropdown() {
     dropdown.style.display = 'block'; // Ensure the dropdown is visible for teachers
 
     try {
-        const response = await fetch(`${baseUrl}/${stage}/user/students`);
-        if (!response.ok) throw new Error('Failed to fetch student list');
-
-        const { students } = await response.json();
+        // The student list is paginated, follow nextToken until the last page
+        const students = [];
+        let nextToken = null;
+        do {
+            const query = `?limit=100${nextToken ? `&nextToken=${encodeURIComponent(nextToken)}` : ''}`;
+            const response = await fetch(`${baseUrl}/${stage}/user/students${query}`);
+            if (!response.ok) throw new Error('Failed to fetch student list');
+            const page = await response.json();
+            students.push(...page.students);
+            nextToken = page.nextToken;
+        } while (nextToken);
 
         // Populate dropdown with student names
         dropdown.innerHTML = `
@@ -525,52 +567,61 @@ async function setupStudentDropdown() {
         // Add event listener to fetch attempts for selected student
         dropdown.addEventListener('change', async (event) => {
             const userId = event.target.value; // Selected student's userId
-            const attempts = await fetchAttempts(userId);
-            displayAttempts(attempts);
+            displayAttempts(userId, await fetchAttempts(userId));
         });
     } catch (error) {
         console.error('Error fetching student list:', error);
     }
 }
 
-async function displayAttempts(attempts) {
+async function displayAttempts(userId, page, append = false) {
     const container = document.getElementById('attempts-container');
-    container.innerHTML = '';
-
-    const promises = attempts.map(async (attempt) => {
-        const quiz = await fetchQuizById(attempt.quizId);
+    if (!append) container.innerHTML = '';
+    container.querySelector('.load-more-attempts')?.remove();
 
+    // The attempts already carry their quiz title, no request per quiz
+    page.attempts.forEach((attempt) => {
         const attemptDiv = document.createElement('div');
         attemptDiv.classList.add('attempt-entry');
 
         attemptDiv.innerHTML = `
-            <h3>${quiz.title}</h3>
+            <h3>${attempt.quizTitle ?? 'Deleted quiz'}</h3>
             <p>Date Started: ${formatDateTime(attempt.dateStarted)}</p>
             <p>Score: ${attempt.score}</p>
-            <p>Time Taken: ${attempt.timeTaken.minutes} minutes ${attempt.timeTaken.seconds} seconds</p>
+            <p>Time Taken: ${attempt.timeTaken ? `${attempt.timeTaken.minutes} minutes ${attempt.timeTaken.seconds} seconds` : 'N/A'}</p>
             <button class="view-answers" data-attempt-id="${attempt.attemptId}">View Answers</button>
         `;
 
         container.appendChild(attemptDiv);
+        setupAnswerButtons(attemptDiv);
     });
-    await Promise.all(promises);
-    setupAnswerButtons();
+
+    // Attempts come a page at a time, most recent first
+    if (page.nextToken) {
+        const loadMoreButton = document.createElement('button');
+        loadMoreButton.classList.add('load-more-attempts');
+        loadMoreButton.textContent = 'Load more attempts';
+        loadMoreButton.addEventListener('click', async () => {
+            displayAttempts(userId, await fetchAttempts(userId, page.nextToken), true);
+        });
+        container.appendChild(loadMoreButton);
+    }
 }
 
-async function fetchAttempts(userId) {
+async function fetchAttempts(userId, nextToken = null) {
     try {
-        const response = await fetch(`${baseUrl}/${stage}/attempts/${userId}`);
+        const query = nextToken ? `?nextToken=${encodeURIComponent(nextToken)}` : '';
+        const response = await fetch(`${baseUrl}/${stage}/attempts/${userId}${query}`);
         if (!response.ok) throw new Error('Failed to fetch attempts');
-        const { attempts } = await response.json();
-        return attempts;
+        return await response.json();
     } catch (error) {
         console.error('Error fetching attempts:', error);
-        return [];
+        return { attempts: [], nextToken: null };
     }
 }
 
-function setupAnswerButtons() {
-    const buttons = document.querySelectorAll('.view-answers');
+function setupAnswerButtons(element) {
+    const buttons = element.querySelectorAll('.view-answers');
     buttons.forEach((button) => {
         button.addEventListener('click', async (event) => {
             const attemptId = event.target.dataset.attemptId;
@@ -729,7 +780,8 @@ function addQuestion() {
 
 async function loadQuiz(quizId) {
     try {
-        const response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}`);
+        // The editor always revalidates, an unchanged quiz costs a 304
+        const response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}`, { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to fetch quiz data');
 
         const quiz = await response.json();
@@ -742,7 +794,7 @@ async function loadQuiz(quizId) {
 
 async function loadQuestions(quizId) {
     try {
-        const response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}/questions`);
+        const response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}/questions`, { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to fetch questions');
 
         const { questions } = await response.json();
@@ -771,26 +823,57 @@ async function saveQuiz() {
         return;
     }
 
+    const { questions, errorCount } = collectQuestions();
+
     try {
-        const quizPayload = { title, description };
-        const quizMethod = quizId ? 'PUT' : 'POST';
-        const quizEndpoint = quizId ? `${baseUrl}/${stage}/quiz/${quizId}` : `${baseUrl}/${stage}/quiz`;
+        if (questions.length === 0) {
+            // Nothing to add, only save the quiz itself
+            const quizResponse = await fetch(quizId ? `${baseUrl}/${stage}/quiz/${quizId}` : `${baseUrl}/${stage}/quiz`, {
+                method: quizId ? 'PUT' : 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ title, description }),
+            });
+            if (!quizResponse.ok) throw new Error('Failed to save quiz');
 
-        // Save or update the quiz
-        const quizResponse = await fetch(quizEndpoint, {
-            method: quizMethod,
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(quizPayload),
-        });
+            alert(`Quiz saved successfully! 0 questions saved. ${errorCount} errors.`);
+            window.location.href = 'teacher-dashboard.html';
+            return;
+        }
+
+        let response;
+
+        if (quizId) {
+            // Update the quiz, then add all questions in one request
+            const quizResponse = await fetch(`${baseUrl}/${stage}/quiz/${quizId}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ title, description }),
+            });
+            if (!quizResponse.ok) throw new Error('Failed to save quiz');
 
-        if (!quizResponse.ok) throw new Error('Failed to save quiz');
-        const quizData = await quizResponse.json();
-        const currentQuizId = quizId || quizData.quizId;
+            response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}/questions`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ questions }),
+            });
+        } else {
+            // Create the quiz together with all its questions
+            response = await fetch(`${baseUrl}/${stage}/quiz/bulk`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ title, description, questions }),
+            });
+        }
 
-        // Save questions
-        const { successCount, errorCount } = await saveQuestions(currentQuizId);
+        const result = await response.json();
+        if (!response.ok) {
+            const details = (result.errors || [])
+                .map((error) => `Question ${error.index + 1}: ${error.message}`)
+                .join('\n');
+            throw new Error(`${result.message}${details ? `\n${details}` : ''}`);
+        }
 
-        alert(`Quiz saved successfully! ${successCount} questions saved. ${errorCount} errors.`);
+        alert(`Quiz saved successfully! ${result.created} questions saved. ${errorCount + result.failed.length} errors.`);
         window.location.href = 'teacher-dashboard.html';
     } catch (error) {
         console.error('Error saving quiz:', error);
@@ -798,9 +881,9 @@ async function saveQuiz() {
     }
 }
 
-async function saveQuestions(quizId) {
+function collectQuestions() {
     const questionEntries = Array.from(document.querySelectorAll('.question-entry'));
-    let successCount = 0;
+    const questions = [];
     let errorCount = 0;
 
     for (const [index, entry] of questionEntries.entries()) {
@@ -818,28 +901,14 @@ async function saveQuestions(quizId) {
             continue;
         }
 
-        const questionPayload = {
+        questions.push({
             questionText,
             options,
             correctAnswer: options[correctOptionIndex],
-        };
-
-        try {
-            const response = await fetch(`${baseUrl}/${stage}/quiz/${quizId}/question`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(questionPayload),
-            });
-
-            if (!response.ok) throw new Error(`Failed to save question ${index + 1}`);
-            successCount++;
-        } catch (error) {
-            console.error(`Error saving question ${index + 1}:`, error);
-            errorCount++;
-        }
+        });
     }
 
-    return { successCount, errorCount };
+    return { questions, errorCount };
 }
 
 function addDeleteQuizListener() {